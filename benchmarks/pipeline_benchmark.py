@@ -0,0 +1,207 @@
+"""
+Benchmark del pipeline ENAHO sobre datos sintéticos
+
+Mide por separado las etapas de ENAHOPipeline (carga, preprocesamiento,
+empalme, indicadores y almacenamiento): tiempo de reloj, tiempo de CPU y
+pico de memoria asignada (tracemalloc). Los resultados se comparan con una
+línea base guardada en benchmarks/baselines/{preset}.json.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.pipeline_benchmark --preset pequeño
+    python -m benchmarks.pipeline_benchmark --preset año --guardar-baseline
+    python -m benchmarks.pipeline_benchmark --escala 10 --tolerancia 0.3
+
+Sale con código 1 si alguna etapa es más lenta o usa más memoria que la
+línea base por encima de la tolerancia.
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from src.indicators import IndicatorCalculator
+from src.main import ENAHOPipeline
+from src.synthetic import SyntheticENAHO
+
+BASELINES_PATH = Path(__file__).parent / "baselines"
+
+# Escala respecto de un año real (src.synthetic.HOGARES_POR_AÑO hogares)
+PRESETS = {
+    'pequeño': 0.05,
+    'año': 1.0,
+    '10x': 10.0
+}
+
+# Diferencias absolutas por debajo de estas se consideran ruido de medición
+MIN_DIFERENCIA = {'segundos': 0.1, 'pico_mb': 1.0}
+
+ETAPAS = ['carga', 'preprocesamiento', 'empalme', 'indicadores', 'almacenamiento']
+
+
+class Cronometro:
+    def __init__(self, memoria=True):
+        """
+        Args:
+            memoria (bool): Medir el pico de memoria con tracemalloc (agrega
+                costo a los tiempos, por eso se compara siempre en el mismo modo)
+        """
+        self.memoria = memoria
+        self.etapas = {}
+
+    def medir(self, etapa, funcion, *args, **kwargs):
+        """Ejecuta funcion(*args, **kwargs) midiendo la etapa."""
+        gc.collect()
+        if self.memoria:
+            tracemalloc.start()
+        inicio, cpu = time.perf_counter(), time.process_time()
+        try:
+            resultado = funcion(*args, **kwargs)
+        finally:
+            medicion = {
+                'segundos': round(time.perf_counter() - inicio, 4),
+                'cpu_segundos': round(time.process_time() - cpu, 4)
+            }
+            if self.memoria:
+                medicion['pico_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+                tracemalloc.stop()
+        anterior = self.etapas.get(etapa)
+        # Con varias repeticiones se guarda la mejor
+        if anterior is None or medicion['segundos'] < anterior['segundos']:
+            self.etapas[etapa] = medicion
+        return resultado
+
+
+def preparar_datos(directorio, escala, años, seed=0):
+    """Genera los .dta sintéticos si no existen para esa escala."""
+    marca = Path(directorio) / "synthetic.json"
+    config = {'escala': escala, 'años': años, 'seed': seed}
+    if marca.exists() and json.loads(marca.read_text()) == config:
+        return
+    print(f"Generando datos sintéticos (escala {escala}) en {directorio}")
+    SyntheticENAHO(escala=escala, seed=seed).escribir(directorio, años)
+    marca.write_text(json.dumps(config))
+
+
+def ejecutar(directorio, año, cronometro, por_lotes=True):
+    """Ejecuta una vez todas las etapas del pipeline para un año."""
+    pipeline = ENAHOPipeline(directorio, indicadores_por_lotes=por_lotes)
+    pipeline.manifest = None
+
+    crudos = cronometro.medir('carga', pipeline.loader.cargar_datos_año, año)
+
+    def preprocesar():
+        return {
+            modulo: pipeline.preprocessor.preprocesar_datos(df, modulo)
+            for modulo, df in crudos.items() if df is not None
+        }
+    procesados = cronometro.medir('preprocesamiento', preprocesar)
+    del crudos
+
+    empalmados = cronometro.medir(
+        'empalme', pipeline.preprocessor.empalmar_modulos_año, procesados, motor=pipeline.motor_empalme
+    )
+    del procesados
+
+    calculator = IndicatorCalculator(empalmados)
+    indicadores = cronometro.medir('indicadores', calculator.calculate_all, batched=por_lotes)
+
+    def guardar():
+        pipeline.storage.save_merged_data(empalmados, año)
+        pipeline.storage.save_indicators(indicadores, año, llaves=calculator.indicator_keys())
+    cronometro.medir('almacenamiento', guardar)
+    return {'filas': len(empalmados), 'columnas': empalmados.shape[1]}
+
+
+def comparar(resultado, baseline, tolerancia):
+    """
+    Compara cada etapa con la línea base.
+
+    Returns:
+        list: Regresiones (etapa, métrica, actual, base, razón)
+    """
+    regresiones = []
+    print(f"\n{'etapa':<18}{'métrica':<14}{'actual':>10}{'base':>10}{'razón':>8}")
+    for etapa in ETAPAS:
+        actual = resultado['etapas'].get(etapa, {})
+        base = baseline['etapas'].get(etapa, {})
+        for metrica in ('segundos', 'pico_mb'):
+            if metrica not in actual or not base.get(metrica):
+                continue
+            razon = actual[metrica] / base[metrica]
+            regresion = (razon > 1 + tolerancia
+                         and actual[metrica] - base[metrica] > MIN_DIFERENCIA[metrica])
+            marca = ' !' if regresion else ''
+            print(f"{etapa:<18}{metrica:<14}{actual[metrica]:>10.3f}{base[metrica]:>10.3f}{razon:>8.2f}{marca}")
+            if marca:
+                regresiones.append((etapa, metrica, actual[metrica], base[metrica], razon))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline ENAHO con datos sintéticos")
+    parser.add_argument('--preset', choices=list(PRESETS), default='pequeño')
+    parser.add_argument('--escala', type=float, help="Escala explícita (reemplaza al preset)")
+    parser.add_argument('--año', type=int, default=2024)
+    parser.add_argument('--repeticiones', type=int, default=3,
+                        help="Ejecuciones completas; se guarda el mejor tiempo por etapa")
+    parser.add_argument('--directorio', help="Carpeta de trabajo (por defecto en el temporal)")
+    parser.add_argument('--sin-memoria', action='store_true', help="No medir memoria con tracemalloc")
+    parser.add_argument('--por-funciones', action='store_true',
+                        help="Calcular indicadores con sus funciones en lugar del modo por lotes")
+    parser.add_argument('--guardar-baseline', action='store_true')
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help="Aumento relativo permitido antes de marcar una regresión")
+    args = parser.parse_args(argv)
+
+    escala = args.escala if args.escala is not None else PRESETS[args.preset]
+    nombre = args.preset if args.escala is None else f"escala_{escala:g}"
+    directorio = Path(args.directorio or Path(tempfile.gettempdir()) / "enaho_benchmark" / nombre)
+    preparar_datos(directorio, escala, [args.año])
+
+    cronometro = Cronometro(memoria=not args.sin_memoria)
+    for _ in range(args.repeticiones):
+        tamaño = ejecutar(directorio, args.año, cronometro, por_lotes=not args.por_funciones)
+
+    resultado = {
+        'preset': nombre,
+        'escala': escala,
+        'memoria': not args.sin_memoria,
+        'por_lotes': not args.por_funciones,
+        'datos_empalmados': tamaño,
+        'etapas': cronometro.etapas,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'fecha': datetime.now().isoformat(timespec='seconds')
+    }
+    print(json.dumps(resultado['etapas'], indent=2, ensure_ascii=False))
+
+    ruta_baseline = BASELINES_PATH / f"{nombre}.json"
+    if args.guardar_baseline:
+        BASELINES_PATH.mkdir(parents=True, exist_ok=True)
+        ruta_baseline.write_text(json.dumps(resultado, indent=2, ensure_ascii=False) + "\n")
+        print(f"Línea base guardada en {ruta_baseline}")
+        return 0
+
+    if not ruta_baseline.exists():
+        print(f"No hay línea base en {ruta_baseline}; use --guardar-baseline")
+        return 0
+    baseline = json.loads(ruta_baseline.read_text())
+    if baseline.get('memoria') != resultado['memoria'] or baseline.get('por_lotes') != resultado['por_lotes']:
+        print("Advertencia: la línea base se midió en otro modo; la comparación no es directa")
+    regresiones = comparar(resultado, baseline, args.tolerancia)
+    if regresiones:
+        print(f"\n{len(regresiones)} regresiones sobre la tolerancia de {args.tolerancia:.0%}")
+        return 1
+    print("\nSin regresiones respecto de la línea base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+# Plan de tipos de datos por módulo (nombres de columnas ya limpios).
+# 'default' aplica a todos los módulos; cada módulo puede sobrescribirlo.
+# Los tipos con mayúscula (Int8, UInt8, ...) son enteros nullable de pandas.
+# Los factores de expansión se mantienen en float64: en float32 las sumas
+# expandidas a nivel nacional pierden precisión.
+DTYPE_PLAN = {
+    'default': {
+        'conglome': 'category',
+        'vivienda': 'category',
+        'hogar': 'category',
+        'codperso': 'category',
+        'ubigeo': 'int32',
+        'año': 'int16',
+        'mes': 'int8',
+        'dominio': 'Int8',
+        'estrato': 'Int8'
+    },
+    'vivienda': {
+        'p101': 'UInt8',
+        'p102': 'UInt8',
+        'p103': 'UInt8',
+        'p104': 'UInt8',
+        'p105': 'UInt8',
+        'factor07_viv': 'float64',
+        'factora07_viv': 'float64'
+    },
+    'personas': {
+        'p203': 'UInt8',
+        'p204': 'UInt8',
+        'p205': 'UInt8',
+        'p207': 'UInt8',
+        'p208a': 'UInt8',
+        'factor07_per': 'float64',
+        'factora07_per': 'float64'
+    },
+    'educacion': {
+        'p301a': 'UInt8',
+        'p306': 'UInt8',
+        'p307': 'UInt8',
+        'factor07_edu': 'float64',
+        'factora07_edu': 'float64'
+    },
+    'empleo_ingresos': {
+        'ocu500': 'UInt8',
+        'factor07_emp': 'float64',
+        'factora07_emp': 'float64'
+    },
+    'sumarias': {
+        'mieperho': 'UInt8',
+        'pobreza': 'UInt8',
+        'factor07_sum': 'float64',
+        'factora07_sum': 'float64'
+    }
+}
+
+# Cambios de tipo por año: {año: {módulo: {columna: dtype}}}
+DTYPE_PLAN_YEARS = {}
+
+# Carpeta con los planes generados a partir de un escaneo de los .dta
+GENERATED_PLANS_PATH = Path(__file__).parent / 'dtype_plans'
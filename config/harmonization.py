@@ -0,0 +1,31 @@
+from config.factors_mapping import FACTORS_MAPPING
+
+# Versión del registro: cambiarla invalida los años ya procesados (entra en
+# la huella de configuración del pipeline)
+HARMONIZATION_VERSION = 1
+
+# Registro de armonización entre años. Por módulo ('default' aplica a
+# todos), variable destino -> regla:
+#   'fuente': nombre (o lista de candidatos, en orden) de la variable en el
+#             .dta, ya en minúsculas; por defecto el propio destino
+#   'recodificar': {valor original: valor armonizado}
+#   'dtype': tipo destino (se aplica solo si la conversión no pierde datos)
+#   'años': (desde, hasta) años en que aplica la regla (inclusive)
+# Los nombres se pasan siempre a minúsculas antes de aplicar las reglas
+# ('aÑo' -> 'año').
+HARMONIZATION = {
+    'default': {
+        'año': {'fuente': ['año', 'ano', 'anio']}
+    }
+}
+
+# Factores de expansión con sufijo por módulo (config/factors_mapping.py)
+for _modulo, _factores in FACTORS_MAPPING.items():
+    HARMONIZATION.setdefault(_modulo, {}).update({
+        destino: {'fuente': origen} for origen, destino in _factores.items()
+    })
+
+# Cambios por año: {año: {módulo: {variable destino: regla}}}; reemplazan a
+# la regla general de esa variable. Ejemplo:
+#   2004: {'educacion': {'p301a': {'recodificar': {12: 11}}}}
+HARMONIZATION_YEARS = {}
@@ -31,4 +31,14 @@ CRITICAL_VARS = {
     'personas': ['p203', 'p204', 'p205', 'p207'],
     'educacion': ['p306', 'p307'],
     'empleo_ingresos': ['ocu500']
-}
\ No newline at end of file
+}
+
+# Variables de identificación temporal y geográfica comunes a todos los módulos
+ID_VARS = ['año', 'mes', 'ubigeo', 'dominio', 'estrato']
+
+# Códigos INEI de valor faltante en variables numéricas
+MISSING_CODES = [999, 9999, 99999, 999999, 9999999, 99999999]
+
+# Variables a nivel hogar que se copian a la tabla de hogares (se toman de
+# la primera persona de cada hogar; las ausentes se omiten)
+HOUSEHOLD_VARS = ID_VARS + ['mieperho', 'gashog2d', 'inghog2d', 'pobreza', 'factor07_sum']
@@ -5,18 +5,27 @@ Indicadores base predefinidos para ENAHO
 import pandas as pd
 import numpy as np
 
-def calcular_tamano_hogar(df, factor_col='factor07_sum'):
+from src.groupby_engine import Aggregation, IndicatorSpec
+from src.indicator_graph import DerivedVariable
+from src.indicators_config import AREAS, DEPARTAMENTOS, GRUPOS_EDAD, SEXOS
+
+def calcular_tamano_hogar(df, factor_col='factor07_sum', hogares=None):
     """
     Calcula el tamaño promedio del hogar.
+    Con la tabla de hogares del año, toma la primera fila de cada hogar por
+    desplazamiento en lugar de agrupar a todas las personas.
     """
     # Identify available factor column
     available_factors = [col for col in df.columns if 'factor07' in col]
-    if available_factors:
+    if factor_col not in df.columns and available_factors:
         factor_col = available_factors[0]
     
     if 'mieperho' not in df.columns:
         return None
     
+    if hogares is not None:
+        return hogares.primeras(df, ['conglome', 'vivienda', 'hogar', 'mieperho', factor_col])
+    
     resultado = df.groupby(['conglome', 'vivienda', 'hogar']).agg({
         'mieperho': 'first',
         factor_col: 'first'
@@ -24,7 +33,7 @@ def calcular_tamano_hogar(df, factor_col='factor07_sum'):
     
     return resultado
 
-def calcular_jefatura_hogar(df, factor_col='factor07_sum'):
+def calcular_jefatura_hogar(df, factor_col='factor07_sum', hogares=None):
     """
     Calcula porcentaje de jefatura de hogar por sexo.
     Asume que p203 = 1 es jefe de hogar y p207 es sexo.
@@ -32,8 +41,8 @@ def calcular_jefatura_hogar(df, factor_col='factor07_sum'):
     if 'p203' not in df.columns or 'p207' not in df.columns:
         return None
     
-    # Filtrar jefes de hogar
-    jefes = df[df['p203'] == 1].copy()
+    # Filtrar jefes de hogar (con la tabla de hogares, por su desplazamiento)
+    jefes = hogares.jefes(df) if hogares is not None else df[df['p203'] == 1].copy()
     
     # Agrupar y calcular
     resultado = jefes.groupby(['año', 'dominio', 'p207']).agg({
@@ -50,9 +59,62 @@ def calcular_jefatura_hogar(df, factor_col='factor07_sum'):
     
     return resultado[['año', 'dominio', 'p207', 'porcentaje_jefatura']]
 
+def _empleado(df):
+    """1 si la persona está ocupada (ocu500 en 1-3), 0 si no."""
+    return df['ocu500'].isin([1, 2, 3]).astype(int)
+
+def _es_jefe(df):
+    """1 para jefes de hogar y nulo para el resto."""
+    return np.where((df['p203'] == 1).fillna(False), 1.0, np.nan)
+
+def _residente(df):
+    """
+    Residente habitual del hogar, como en los notebooks: informante válido
+    (codinfor distinto de 00), miembro del hogar (p204 == 1), sin
+    trabajadores del hogar ni pensionistas (p203 distinto de 8 y 9) y
+    encuestado desde abril (mes >= 4).
+    """
+    codinfor = pd.to_numeric(df['codinfor'], errors='coerce')
+    return (
+        (codinfor != 0) & (df['p204'] == 1) & ~df['p203'].isin([8, 9])
+        & (pd.to_numeric(df['mes'], errors='coerce') >= 4)
+    )
+
+def _dpto(df):
+    """Nombre del departamento a partir del ubigeo (numérico o texto)."""
+    ubigeo = df['ubigeo']
+    if pd.api.types.is_numeric_dtype(ubigeo):
+        ubigeo = ubigeo.astype('Int64')
+    codigo = ubigeo.astype('string').str.strip().str.zfill(6).str[:2]
+    return codigo.map(DEPARTAMENTOS)
+
+def _area(df):
+    """Área de residencia (Urbano/Rural) según el estrato."""
+    estrato = pd.to_numeric(df['estrato'], errors='coerce').astype('float64')
+    condiciones = [estrato.between(inicio, fin) for inicio, fin in AREAS.values()]
+    return pd.Series(np.select(condiciones, list(AREAS), default=None), index=df['estrato'].index)
+
+def _sexo(df):
+    return pd.to_numeric(df['p207'], errors='coerce').map(SEXOS)
+
+def _grupo_edad(df):
+    edad = pd.to_numeric(df['p208a'], errors='coerce').astype('float64')
+    limites = list(GRUPOS_EDAD) + [np.inf]
+    return pd.cut(edad, bins=limites, labels=list(GRUPOS_EDAD.values()), right=False)
+
+def _media_ponderada(df, columna, factor_col, llaves):
+    """Media de columna ponderada por factor_col y suma del factor por grupo."""
+    ponderado = df[columna] * df[factor_col]
+    sumas = df.assign(_ponderado=ponderado).groupby(llaves).agg({
+        '_ponderado': 'sum',
+        factor_col: 'sum'
+    }).reset_index()
+    sumas[columna] = sumas['_ponderado'] / sumas[factor_col]
+    return sumas[llaves + [columna, factor_col]]
+
 def calcular_anios_educacion(df, factor_col='factor07_per'):
     """
-    Calcula años promedio de educación.
+    Calcula años promedio de educación (media ponderada por el factor).
     Asume que p301a contiene los años de educación.
     """
     if 'p301a' not in df.columns:
@@ -61,28 +123,22 @@ def calcular_anios_educacion(df, factor_col='factor07_per'):
     # Filtrar valores válidos
     educacion_df = df[df['p301a'].between(0, 20)].copy()
     
-    resultado = educacion_df.groupby(['año', 'dominio', 'p207']).agg({
-        'p301a': 'mean',
-        factor_col: 'sum'
-    }).reset_index()
+    resultado = _media_ponderada(educacion_df, 'p301a', factor_col, ['año', 'dominio', 'p207'])
     
     return resultado.rename(columns={'p301a': 'anios_educacion_promedio'})
 
 def calcular_tasa_empleo(df, factor_col='factor07_emp'):
     """
-    Calcula tasa de empleo.
+    Calcula tasa de empleo (proporción ponderada por el factor).
     Asume que ocu500 indica condición de ocupación.
     """
-    if 'ocu500' not in df.columns:
-        return None
+    if 'empleado' not in df.columns:
+        if 'ocu500' not in df.columns:
+            return None
+        # Crear variable binaria de empleo (sin modificar los datos recibidos)
+        df = df.assign(empleado=_empleado(df))
     
-    # Crear variable binaria de empleo
-    df['empleado'] = df['ocu500'].isin([1, 2, 3]).astype(int)
-    
-    resultado = df.groupby(['año', 'dominio', 'p207']).agg({
-        'empleado': 'mean',
-        factor_col: 'sum'
-    }).reset_index()
+    resultado = _media_ponderada(df, 'empleado', factor_col, ['año', 'dominio', 'p207'])
     
     return resultado.rename(columns={'empleado': 'tasa_empleo'})
 
@@ -92,4 +148,61 @@ BASE_INDICATORS = {
     'jefatura_hogar': calcular_jefatura_hogar,
     'anios_educacion': calcular_anios_educacion,
     'tasa_empleo': calcular_tasa_empleo
-}
\ No newline at end of file
+}
+
+# Columnas que lee cada indicador base (proyección de columnas del loader)
+BASE_INDICATOR_COLUMNS = {
+    'tamano_hogar': ['conglome', 'vivienda', 'hogar', 'mieperho', 'factor07_sum'],
+    'jefatura_hogar': ['año', 'dominio', 'p203', 'p207', 'factor07_sum'],
+    'anios_educacion': ['año', 'dominio', 'p207', 'p301a', 'factor07_per'],
+    'tasa_empleo': ['año', 'dominio', 'p207', 'empleado', 'factor07_emp']
+}
+
+# Variables derivadas y filtros compartidos entre indicadores. Se calculan
+# una vez por corrida y sus columnas de entrada se leen del loader.
+BASE_DERIVED_VARIABLES = {
+    'empleado': DerivedVariable(_empleado, ['ocu500']),
+    'es_jefe': DerivedVariable(_es_jefe, ['p203']),
+    'residente': DerivedVariable(_residente, ['codinfor', 'p204', 'p203', 'mes'], filtro=True),
+    'p301a_valido': DerivedVariable(lambda df: df['p301a'].between(0, 20), ['p301a'], filtro=True),
+    # Desagregaciones de las tablas publicadas (IndicatorCalculator.crosstab)
+    'dpto': DerivedVariable(_dpto, ['ubigeo']),
+    'área': DerivedVariable(_area, ['estrato']),
+    'sexo': DerivedVariable(_sexo, ['p207']),
+    'grupo_edad': DerivedVariable(_grupo_edad, ['p208a'])
+}
+# Declaraciones para el modo por lotes de IndicatorCalculator.calculate_all
+BASE_INDICATOR_SPECS = {
+    'tamano_hogar': IndicatorSpec(
+        keys=['conglome', 'vivienda', 'hogar'],
+        aggregations={
+            'mieperho': Aggregation('first', 'mieperho'),
+            'factor07_sum': Aggregation('first', 'factor07_sum')
+        }
+    ),
+    'jefatura_hogar': IndicatorSpec(
+        keys=['año', 'dominio', 'p207'],
+        # es_jefe es nulo para quienes no son jefes: solo quedan grupos con jefes
+        aggregations={
+            'porcentaje_jefatura': Aggregation(
+                'ratio', 'es_jefe', weight='factor07_sum',
+                denominator_keys=['año', 'dominio'], scale=100
+            )
+        }
+    ),
+    'anios_educacion': IndicatorSpec(
+        keys=['año', 'dominio', 'p207'],
+        filters=['p301a_valido'],
+        aggregations={
+            'anios_educacion_promedio': Aggregation('mean', 'p301a', weight='factor07_per'),
+            'factor07_per': Aggregation('sum', weight='factor07_per')
+        }
+    ),
+    'tasa_empleo': IndicatorSpec(
+        keys=['año', 'dominio', 'p207'],
+        aggregations={
+            'tasa_empleo': Aggregation('mean', 'empleado', weight='factor07_emp'),
+            'factor07_emp': Aggregation('sum', weight='factor07_emp')
+        }
+    )
+}
@@ -0,0 +1,35 @@
+"""
+Datos compartidos por las pruebas: un año sintético (src/synthetic.py)
+escrito como .dta, cargado y preprocesado como en el pipeline.
+"""
+
+import sys
+import os
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.synthetic import SyntheticENAHO
+from src.data_loader import ENAHOLoader
+from src.preprocessor import ENAHOPreprocessor
+
+AÑO_PRUEBA = 2024
+
+
+@pytest.fixture(scope='session')
+def modulos_sinteticos(tmp_path_factory):
+    """módulo -> DataFrame preprocesado de un año sintético pequeño."""
+    base = tmp_path_factory.mktemp('enaho')
+    SyntheticENAHO(hogares=300, ancho=0, seed=1).escribir_año(base, AÑO_PRUEBA)
+    loader = ENAHOLoader(base / "data" / "1. raw")
+    preprocessor = ENAHOPreprocessor()
+    return {
+        modulo: preprocessor.preprocesar_datos(df, modulo)
+        for modulo, df in loader.cargar_datos_año(AÑO_PRUEBA).items() if df is not None
+    }
+
+
+@pytest.fixture(scope='session')
+def datos_sinteticos(modulos_sinteticos):
+    """Año sintético empalmado con el motor pandas."""
+    return ENAHOPreprocessor().empalmar_modulos_año(dict(modulos_sinteticos))
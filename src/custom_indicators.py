@@ -29,5 +29,27 @@ CUSTOM_INDICATORS = {
     'mi_indicador': mi_indicador_personalizado
 }
 
+# Columnas que lee cada indicador personalizado (opcional, para la proyección)
+CUSTOM_INDICATOR_COLUMNS = {
+    'mi_indicador': ['año', 'dominio', 'factor07_sumaria']
+}
+
 # Ejemplo de uso:
-# calculator.register_indicator('nuevo_indicador', calcular_nuevo_indicador)
\ No newline at end of file
+# calculator.register_indicator('nuevo_indicador', calcular_nuevo_indicador)
+# Ejecución aislada (un proceso por indicador, con límites y tiempos):
+# calculator.calculate_sandboxed(workers=4, timeout=600, memoria_mb=4000)
+# print(calculator.sandbox_report)
+# Variables derivadas y filtros compartidos (opcional). Se calculan una vez
+# por corrida y pueden nombrarse en CUSTOM_INDICATOR_COLUMNS:
+# from src.indicator_graph import DerivedVariable
+# CUSTOM_DERIVED_VARIABLES = {
+#     'pobre': DerivedVariable(lambda df: df['pobreza'].isin([1, 2]).astype(int), ['pobreza'])
+# }
+# CUSTOM_INDICATOR_FILTERS = {'mi_indicador': ['residente']}
+#
+# Registro declarativo (sin función):
+# calculator.register_indicator(
+#     'empleo_residentes', keys=['año', 'dominio'],
+#     aggregations={'tasa': Aggregation('mean', 'empleado', weight='factor07_emp')},
+#     filters=['residente']
+# )
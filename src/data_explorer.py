@@ -1,66 +1,405 @@
-import pandas as pd
-import os
+"""
+Catálogo de los archivos .dta crudos de ENAHO
+
+De cada .dta se leen solo la cabecera y la metadata (nombres, tipos y
+formatos Stata, etiquetas de variables, etiquetas de valores y número de
+filas), sin decodificar los datos. Los archivos se leen en paralelo y el
+resultado se guarda en un índice SQLite consultable. Cada archivo se
+identifica por tamaño y fecha de modificación, de modo que un nuevo
+escaneo solo vuelve a leer los archivos nuevos o modificados.
+
+Uso:
+
+    python -m src.data_explorer "data/1. raw" escanear
+    python -m src.data_explorer "data/1. raw" buscar p301a
+"""
+import argparse
+import re
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
+
+import pandas as pd
+import pyreadstat
+
 from config.modules_config import MODULES_MAPPING
 
-def explorar_datos(base_path):
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS archivos (
+    ruta TEXT PRIMARY KEY,
+    año INTEGER,
+    modulo TEXT,
+    archivo TEXT,
+    tamaño INTEGER,
+    mtime INTEGER,
+    filas INTEGER,
+    columnas INTEGER,
+    etiqueta TEXT,
+    codificacion TEXT,
+    escaneado TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS variables (
+    ruta TEXT,
+    año INTEGER,
+    modulo TEXT,
+    posicion INTEGER,
+    variable TEXT,
+    original TEXT,
+    tipo TEXT,
+    formato TEXT,
+    ancho INTEGER,
+    etiqueta TEXT,
+    conjunto_etiquetas TEXT,
+    PRIMARY KEY (ruta, posicion)
+);
+CREATE TABLE IF NOT EXISTS etiquetas_valor (
+    ruta TEXT,
+    conjunto TEXT,
+    valor REAL,
+    etiqueta TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_variables_nombre ON variables (variable);
+CREATE INDEX IF NOT EXISTS idx_variables_año ON variables (año, modulo);
+CREATE INDEX IF NOT EXISTS idx_etiquetas_ruta ON etiquetas_valor (ruta, conjunto);
+"""
+
+# Nombres de archivo de módulos no configurados: enaho01a-2023-300a.dta, etc.
+PATRON_ENAHO = re.compile(r'^enaho\d+[a-z]?-(\d{4})-(\w+?)\.dta$', re.IGNORECASE)
+PATRON_SUMARIA = re.compile(r'^sumaria-(\d{4})(?:-(\w+))?\.dta$', re.IGNORECASE)
+
+
+def identificar_modulo(nombre_archivo, año=None):
     """
-    Explora la estructura de datos y verifica la disponibilidad de archivos.
+    Identifica el tipo de módulo a partir del nombre del archivo.
+
+    Los archivos de MODULES_MAPPING devuelven su nombre configurado; el
+    resto de módulos ENAHO devuelve 'modulo_{código}' (p. ej.
+    'modulo_300a') y las variantes de sumaria 'sumarias_{sufijo}'.
+
+    Returns:
+        str: Tipo de módulo o 'desconocido'
     """
+    nombre = Path(nombre_archivo).name.lower()
+    coincidencia = PATRON_ENAHO.match(nombre) or PATRON_SUMARIA.match(nombre)
+    if año is None and coincidencia:
+        año = coincidencia.group(1)
+    if año is not None:
+        for tipo_modulo, patron in MODULES_MAPPING.items():
+            if nombre == patron.format(año=año).lower():
+                return tipo_modulo
 
-    años = range(2004, 2024)
-    modulos_encontrados = {}
+    if coincidencia is None:
+        return 'desconocido'
+    if coincidencia.re is PATRON_SUMARIA:
+        return f"sumarias_{coincidencia.group(2)}" if coincidencia.group(2) else 'sumarias'
+    return f"modulo_{coincidencia.group(2)}"
 
-    for año in años:
-        año_path = Path(base_path) / str(año) / 'DTA'
-        if not año_path.exists():
-            print(f"Año {año}: Directorio no encontrado.")
-            continue
 
-        archivos = list(año_path.glob('*.dta'))
-        modulos_encontrados[año] = []
-
-        for archivo in archivos:
-            tipo_modulo = identificar_modulo(archivo.name)
-            tamaño_archivo = archivo.stat().st_size / (1024 * 1024)  # Tamaño en MB
-            modulos_encontrados[año].append({
-                'archivo': archivo.name,
-                'tipo_modulo': tipo_modulo,
-                'tamaño_MB': tamaño_archivo
-            })
-
-            if len(modulos_encontrados[año] <= 3):
-                try:
-                    df = pd.read_stata(archivo, nrows=5)
-                    print(f"\n {archivo.name}: {len(df.columns)} columnas")
-                    print(f" Columnas: {df.columns.tolist()}")
-                except:
-                    print(f" No se pudo leer {archivo.name}")
-    return modulos_encontrados
+def normalizar_variable(nombre):
+    """Nombre de variable en minúsculas ('aÑo' -> 'año'), como en el loader."""
+    return str(nombre).lower().strip()
+
 
-def identificar_modulo(nombre_archivo):
+def leer_cabecera(ruta):
     """
-    Identifica el tipo de módulo basado en el nombre del archivo.
+    Lee la cabecera y metadata de un .dta (sin los datos).
+
+    Returns:
+        dict: 'filas', 'etiqueta', 'codificacion', 'variables' (lista de
+            dicts) y 'etiquetas_valor' ({conjunto: {valor: etiqueta}}), o
+            'error' si el archivo no se pudo leer
     """
-    if 'sumaria' in nombre_archivo:
-        return 'sumarias'
-    elif 'enaho01' in nombre_archivo:
-        #Extraer el número después del año
-
-        partes = nombre_archivo.split('_')
-        if len(partes) >= 3:
-            codigo_modulo = partes[2].split('.')[0]
-            return MODULES_MAPPING.get(codigo_modulo, 'desconocido')
-        return 'desconocido'
+    try:
+        _, meta = pyreadstat.read_dta(str(ruta), metadataonly=True)
+    except Exception as e:
+        return {'error': f"{type(e).__name__}: {e}"}
+    etiquetas = meta.column_labels or [None] * len(meta.column_names)
+    variables = []
+    for posicion, (original, etiqueta) in enumerate(zip(meta.column_names, etiquetas)):
+        variables.append({
+            'posicion': posicion,
+            'variable': normalizar_variable(original),
+            'original': original,
+            'tipo': meta.readstat_variable_types.get(original),
+            'formato': meta.original_variable_types.get(original),
+            'ancho': meta.variable_storage_width.get(original),
+            'etiqueta': etiqueta,
+            'conjunto_etiquetas': meta.variable_to_label.get(original)
+        })
+    return {
+        'filas': meta.number_rows,
+        'etiqueta': meta.file_label,
+        'codificacion': meta.file_encoding,
+        'variables': variables,
+        'etiquetas_valor': meta.value_labels or {}
+    }
+
+
+class DataCatalog:
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path (str|Path): Archivo SQLite del catálogo
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.executescript(ESQUEMA)
+
+    @contextmanager
+    def _conectar(self):
+        """Conexión que confirma la transacción al salir y se cierra."""
+        conexion = sqlite3.connect(self.db_path)
+        try:
+            with conexion:
+                yield conexion
+        finally:
+            conexion.close()
+
+    def archivos_base(self, base_path, años=None):
+        """
+        Archivos .dta bajo {base_path}/{año}/DTA.
+
+        Returns:
+            list: [(año, Path)]
+        """
+        base_path = Path(base_path)
+        if años is None:
+            años = sorted(int(d.name) for d in base_path.iterdir() if d.is_dir() and d.name.isdigit())
+        encontrados = []
+        for año in años:
+            año_path = base_path / str(año) / 'DTA'
+            if año_path.exists():
+                encontrados += [(año, ruta) for ruta in sorted(año_path.glob('*.dta'))]
+        return encontrados
+
+    def scan(self, base_path, años=None, workers=4):
+        """
+        Actualiza el catálogo: lee las cabeceras de los archivos nuevos o
+        modificados (en paralelo) y elimina los archivos que ya no existen.
+
+        Args:
+            base_path (str|Path): Carpeta con un subdirectorio por año
+            años (list|None): Años a escanear (None = todos los encontrados)
+            workers (int): Procesos que leen cabeceras
+
+        Returns:
+            dict: Número de archivos 'nuevos', 'actualizados', 'sin_cambios',
+                'eliminados' y 'errores'
+        """
+        encontrados = self.archivos_base(base_path, años)
+        with self._conectar() as conexion:
+            # Los archivos que fallaron se vuelven a intentar en cada escaneo
+            previos = {
+                ruta: (tamaño, mtime) if error is None else None
+                for ruta, tamaño, mtime, error in conexion.execute(
+                    "SELECT ruta, tamaño, mtime, error FROM archivos"
+                )
+            }
+
+        resumen = {'nuevos': 0, 'actualizados': 0, 'sin_cambios': 0, 'eliminados': 0, 'errores': 0}
+        pendientes = []
+        vigentes = set()
+        for año, ruta in encontrados:
+            clave = str(ruta.resolve())
+            stat = ruta.stat()
+            vigentes.add(clave)
+            if previos.get(clave) == (stat.st_size, stat.st_mtime_ns):
+                resumen['sin_cambios'] += 1
+                continue
+            resumen['actualizados' if clave in previos else 'nuevos'] += 1
+            pendientes.append((año, ruta, clave, stat))
+
+        if workers > 1 and len(pendientes) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pendientes))) as executor:
+                cabeceras = list(executor.map(leer_cabecera, [p[1] for p in pendientes]))
+        else:
+            cabeceras = [leer_cabecera(p[1]) for p in pendientes]
+
+        with self._conectar() as conexion:
+            # Archivos catalogados que ya no existen en los años escaneados
+            eliminados = [
+                ruta for ruta, año in conexion.execute("SELECT ruta, año FROM archivos")
+                if ruta not in vigentes and (años is None or año in años)
+            ]
+            for ruta in eliminados + [p[2] for p in pendientes]:
+                self._borrar(conexion, ruta)
+            resumen['eliminados'] = len(eliminados)
+
+            for (año, ruta, clave, stat), cabecera in zip(pendientes, cabeceras):
+                if 'error' in cabecera:
+                    resumen['errores'] += 1
+                    print(f"No se pudo leer {ruta.name}: {cabecera['error']}")
+                self._insertar(conexion, año, ruta, clave, stat, cabecera)
+
+        print(f"Catálogo {self.db_path.name}: {resumen['nuevos']} nuevos, "
+              f"{resumen['actualizados']} actualizados, {resumen['sin_cambios']} sin cambios, "
+              f"{resumen['eliminados']} eliminados")
+        return resumen
+
+    def _borrar(self, conexion, ruta):
+        for tabla in ('archivos', 'variables', 'etiquetas_valor'):
+            conexion.execute(f"DELETE FROM {tabla} WHERE ruta = ?", (ruta,))
+
+    def _insertar(self, conexion, año, ruta, clave, stat, cabecera):
+        modulo = identificar_modulo(ruta.name, año)
+        variables = cabecera.get('variables', [])
+        conexion.execute(
+            "INSERT INTO archivos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (clave, año, modulo, ruta.name, stat.st_size, stat.st_mtime_ns,
+             cabecera.get('filas'), len(variables), cabecera.get('etiqueta'),
+             cabecera.get('codificacion'), datetime.now().isoformat(timespec='seconds'),
+             cabecera.get('error'))
+        )
+        conexion.executemany(
+            "INSERT INTO variables VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(clave, año, modulo, v['posicion'], v['variable'], v['original'], v['tipo'],
+              v['formato'], v['ancho'], v['etiqueta'], v['conjunto_etiquetas'])
+             for v in variables]
+        )
+        conexion.executemany(
+            "INSERT INTO etiquetas_valor VALUES (?, ?, ?, ?)",
+            [(clave, conjunto, valor, etiqueta)
+             for conjunto, etiquetas in cabecera.get('etiquetas_valor', {}).items()
+             for valor, etiqueta in etiquetas.items()]
+        )
+
+    def query(self, sql, parametros=()):
+        """Ejecuta una consulta SQL sobre el catálogo. Returns: DataFrame"""
+        with self._conectar() as conexion:
+            return pd.read_sql_query(sql, conexion, params=parametros)
+
+    def buscar(self, variable, modulo=None):
+        """
+        Años, módulos y tipos en que aparece una variable (acepta comodines
+        SQL '%' y '_').
+
+        Returns:
+            DataFrame: año, modulo, archivo, variable, original, tipo,
+                formato, ancho, etiqueta
+        """
+        sql = """
+            SELECT v.año, v.modulo, a.archivo, v.variable, v.original, v.tipo,
+                   v.formato, v.ancho, v.etiqueta
+            FROM variables v JOIN archivos a ON a.ruta = v.ruta
+            WHERE v.variable LIKE ?
+        """
+        parametros = [normalizar_variable(variable)]
+        if modulo is not None:
+            sql += " AND v.modulo = ?"
+            parametros.append(modulo)
+        return self.query(sql + " ORDER BY v.año, v.modulo", parametros)
+
+    def variables(self, año=None, modulo=None):
+        """Variables de un año y/o módulo, en el orden del archivo. Returns: DataFrame"""
+        condiciones, parametros = [], []
+        if año is not None:
+            condiciones.append("año = ?")
+            parametros.append(año)
+        if modulo is not None:
+            condiciones.append("modulo = ?")
+            parametros.append(modulo)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return self.query(
+            f"SELECT año, modulo, posicion, variable, original, tipo, formato, ancho, etiqueta "
+            f"FROM variables {where} ORDER BY año, modulo, posicion", parametros
+        )
+
+    def archivos(self, año=None):
+        """Archivos catalogados (filas, columnas, tamaño). Returns: DataFrame"""
+        where, parametros = ("WHERE año = ?", [año]) if año is not None else ("", [])
+        return self.query(
+            f"SELECT año, modulo, archivo, filas, columnas, tamaño, etiqueta, error "
+            f"FROM archivos {where} ORDER BY año, modulo", parametros
+        )
+
+    def etiquetas_valor(self, variable, año, modulo=None):
+        """
+        Etiquetas de valores de una variable en un año.
+
+        Returns:
+            dict: valor -> etiqueta
+        """
+        sql = """
+            SELECT e.valor, e.etiqueta FROM variables v
+            JOIN etiquetas_valor e ON e.ruta = v.ruta AND e.conjunto = v.conjunto_etiquetas
+            WHERE v.variable = ? AND v.año = ?
+        """
+        parametros = [normalizar_variable(variable), año]
+        if modulo is not None:
+            sql += " AND v.modulo = ?"
+            parametros.append(modulo)
+        tabla = self.query(sql, parametros)
+        return dict(zip(tabla['valor'], tabla['etiqueta']))
+
+
+def explorar_datos(base_path, años=None, catalog_path=None, workers=4):
+    """
+    Explora la estructura de datos y verifica la disponibilidad de archivos
+    a partir del catálogo de cabeceras (que se actualiza antes).
+
+    Args:
+        base_path (str|Path): Carpeta con un subdirectorio por año
+        años (list|None): Años a explorar (None = todos los encontrados)
+        catalog_path (str|Path|None): Archivo SQLite del catálogo (por
+            defecto cache/catalogo.sqlite junto a base_path)
+        workers (int): Procesos que leen cabeceras
+
+    Returns:
+        dict: año -> lista de {'archivo', 'tipo_modulo', 'tamaño_MB',
+            'filas', 'columnas'}
+    """
+    catalog_path = catalog_path or Path(base_path).parent / 'cache' / 'catalogo.sqlite'
+    catalogo = DataCatalog(catalog_path)
+    catalogo.scan(base_path, años, workers)
+
+    modulos_encontrados = {}
+    for fila in catalogo.archivos().itertuples(index=False):
+        if años is not None and fila.año not in años:
+            continue
+        modulos_encontrados.setdefault(fila.año, []).append({
+            'archivo': fila.archivo,
+            'tipo_modulo': fila.modulo,
+            'tamaño_MB': fila.tamaño / (1024 * 1024),
+            'filas': fila.filas,
+            'columnas': fila.columnas
+        })
+    return modulos_encontrados
+
+
+def main(argv=None):
+    """Comando para escanear y consultar el catálogo."""
+    parser = argparse.ArgumentParser(description="Catálogo de cabeceras de los .dta de ENAHO")
+    parser.add_argument("base_path", help="Carpeta con un subdirectorio por año")
+    parser.add_argument("--catalogo", default=None, help="Archivo SQLite del catálogo")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    escanear = sub.add_parser("escanear", help="Actualizar el catálogo")
+    escanear.add_argument("--años", type=int, nargs='*', default=None)
+    escanear.add_argument("--workers", type=int, default=4)
+    buscar = sub.add_parser("buscar", help="Años y tipos de una variable")
+    buscar.add_argument("variable")
+    sub.add_parser("archivos", help="Listar archivos catalogados")
+
+    args = parser.parse_args(argv)
+    if args.comando == "escanear":
+        estructura = explorar_datos(args.base_path, args.años, args.catalogo, args.workers)
+        for año, modulos in estructura.items():
+            print(f"\nAño {año}:")
+            for modulo in modulos:
+                print(f" - {modulo['archivo']}: {modulo['tipo_modulo']} ({modulo['tamaño_MB']:.2f} MB, "
+                      f"{modulo['filas']} filas x {modulo['columnas']} columnas)")
+        return 0
+
+    catalogo = DataCatalog(args.catalogo or Path(args.base_path).parent / 'cache' / 'catalogo.sqlite')
+    tabla = catalogo.buscar(args.variable) if args.comando == "buscar" else catalogo.archivos()
+    print(tabla.to_string(index=False))
+    return 0
+
 
-#Ejecutar la exploración
 if __name__ == "__main__":
-    base_path = "../data/raw"
-    estructura_datos = explorar_datos(base_path)
-    print(estructura_datos)
-
-    for año, modulos in estructura_datos.items():
-        print(f"\nAño {año}:")
-        for modulo in modulos:
-            print(f" - {modulo['archivo']}: {modulo['tipo_modulo']} ({modulo['tamaño_MB']:.2f} MB)")
- 
+    sys.exit(main())
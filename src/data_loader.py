@@ -3,58 +3,203 @@ import numpy as np
 import pyreadstat
 from pathlib import Path
 import warnings
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+import pyarrow as pa
 warnings.filterwarnings('ignore')
 
 # Mapeos específicos por módulo
 from config.factors_mapping import FACTORS_MAPPING
-from config.modules_config import MODULES_MAPPING
+from config.modules_config import MODULES_MAPPING, KEY_COLUMNS, CRITICAL_VARS, ID_VARS
+from src.dtype_plan import plan_tipos, aplicar_plan_tipos
+from src.harmonization import compilar_armonizacion
 
 class ENAHOLoader:
-    def __init__(self, base_path):
+    def __init__(self, base_path, columnas=None, cache=None, aplicar_plan=False, chunksize=100000):
+        """
+        Args:
+            base_path (str|Path): Carpeta con un subdirectorio por año
+            columnas (dict|iterable|None): Proyección de columnas. Un dict
+                módulo -> columnas, o un conjunto global que se intersecta con
+                las columnas de cada módulo. None carga el archivo completo.
+            cache (RawModuleCache|None): Caché Parquet de módulos crudos
+            aplicar_plan (bool): Leer por bloques de filas aplicando el plan de
+                tipos (config/dtypes_config.py) a cada bloque
+            chunksize (int): Filas por bloque al aplicar el plan de tipos
+        """
         self.base_path = Path(base_path)
+        self.columnas = columnas
+        self.cache = cache
+        self.aplicar_plan = aplicar_plan
+        self.chunksize = chunksize
+        # PipelineProfiler opcional: un span por módulo cargado
+        self.profiler = None
+
+    def nombres_limpios(self, columnas, tipo_modulo, año=None):
+        """
+        Devuelve el mapeo nombre original -> nombre armonizado de un módulo
+        (minúsculas y reglas de config/harmonization.py).
+        """
+        return compilar_armonizacion(tipo_modulo, año, columnas).renombres
+
+    def limpiar_columnas(self, df, tipo_modulo, año=None, armonizacion=None):
+        """
+        Armoniza nombres, códigos y tipos de un módulo en un solo paso.
+
+        Args:
+            armonizacion (Harmonizer|None): Armonización ya compilada (al
+                leer por bloques se compila una vez para todos)
+        """
+        armonizacion = armonizacion or compilar_armonizacion(tipo_modulo, año, df.columns)
+        return armonizacion.apply(df)
+
+    def columnas_proyeccion(self, tipo_modulo, extra=None):
+        """
+        Conjunto mínimo de columnas (nombres limpios) a leer para un módulo:
+        llaves, variables críticas, factores de expansión y `extra`.
+        """
+        columnas = set(KEY_COLUMNS.get(tipo_modulo, []))
+        columnas.update(CRITICAL_VARS.get(tipo_modulo, []))
+        factores = FACTORS_MAPPING.get(tipo_modulo, {})
+        columnas.update(factores.values())
+        columnas.update(ID_VARS)
+        if extra:
+            columnas.update(extra)
+        return columnas
+
+    def columnas_modulo(self, tipo_modulo, columnas=None):
+        """
+        Resuelve las columnas pedidas para un módulo (None = todas).
+        """
+        if columnas is None:
+            columnas = self.columnas
+        if columnas is None:
+            return None
+        if isinstance(columnas, dict):
+            columnas = columnas.get(tipo_modulo)
+            if columnas is None:
+                return None
+        # Las llaves son obligatorias para el empalme
+        return set(columnas) | set(KEY_COLUMNS.get(tipo_modulo, []))
+
+    def _resolver_usecols(self, ruta_archivo, año, tipo_modulo, columnas):
+        """
+        Traduce nombres limpios a los nombres originales del .dta leyendo
+        solo la metadata del archivo.
+        """
+        _, meta = pyreadstat.read_dta(str(ruta_archivo), metadataonly=True)
+        return self._seleccionar(meta.column_names, año, tipo_modulo, columnas)
+
+    def _seleccionar(self, originales, año, tipo_modulo, columnas):
+        """Nombres originales cuyo nombre limpio está en `columnas`."""
+        mapeo = self.nombres_limpios(originales, tipo_modulo, año)
+        return [original for original, limpio in mapeo.items() if limpio in columnas]
+
+    def _leer_desde_cache(self, ruta_archivo, año, tipo_modulo, columnas):
+        """
+        Lee un módulo a través de la caché Parquet. En un fallo convierte el
+        .dta completo una sola vez y devuelve la proyección pedida.
+        """
+        originales = self.cache.columns(ruta_archivo, tipo_modulo, año)
+        usecols = None
+        if originales is not None and columnas is not None:
+            usecols = self._seleccionar(originales, año, tipo_modulo, columnas)
+        df = self.cache.get(ruta_archivo, tipo_modulo, año, usecols)
+        if df is not None:
+            return df
 
-    def limpiar_columnas(self, df, tipo_modulo):
+        df = pd.read_stata(str(ruta_archivo), convert_categoricals=False)
+        self.cache.put(ruta_archivo, tipo_modulo, año, df)
+        if columnas is not None:
+            df = df[self._seleccionar(df.columns, año, tipo_modulo, columnas)]
+        return df
+
+
+    def _bloques(self, ruta_archivo, año, tipo_modulo, columnas):
         """
-        Limpia nombres de columnas con manejo específico por módulo.
+        Genera un módulo por bloques de filas (nombres de columna originales).
         """
-        df = df.copy()
-        df.columns = df.columns.str.lower().str.strip()
+        if self.cache is not None:
+            originales = self.cache.columns(ruta_archivo, tipo_modulo, año)
+            usecols = None
+            if originales is not None and columnas is not None:
+                usecols = self._seleccionar(originales, año, tipo_modulo, columnas)
+            bloques = self.cache.iter_batches(ruta_archivo, tipo_modulo, año, usecols, self.chunksize)
+            if bloques is None:
+                # Fallo: se convierte el archivo completo una sola vez
+                df = pd.read_stata(str(ruta_archivo), convert_categoricals=False)
+                self.cache.put(ruta_archivo, tipo_modulo, año, df)
+                if columnas is not None:
+                    df = df[self._seleccionar(df.columns, año, tipo_modulo, columnas)]
+                bloques = [df]
+            yield from bloques
+            return
 
-        # Renombrar factores específicos por módulo
-        if tipo_modulo in FACTORS_MAPPING:
-            for old_name, new_name in FACTORS_MAPPING[tipo_modulo].items():
-                if old_name in df.columns:
-                    df = df.rename(columns={old_name: new_name})
+        usecols = None if columnas is None else self._resolver_usecols(ruta_archivo, año, tipo_modulo, columnas)
+        for bloque, _ in pyreadstat.read_file_in_chunks(
+            pyreadstat.read_dta, str(ruta_archivo), chunksize=self.chunksize, usecols=usecols
+        ):
+            yield bloque
 
-        # Estandarizar nombres especiales
-        rename_dict = {
-            'aÑo': 'año',
-            'añO': 'año',
-            'AÑO': 'año'
-        }
-        df = df.rename(columns=rename_dict)
+    def _leer_con_plan(self, ruta_archivo, año, tipo_modulo, columnas):
+        """
+        Lee un módulo por bloques aplicando el plan de tipos a cada bloque,
+        de modo que el módulo completo nunca existe con los tipos anchos
+        (float64/object) de la lectura. Las categorías se crean al final.
+        """
+        plan = plan_tipos(tipo_modulo, año)
+        partes = []
+        omitidas = set()
+        armonizacion = None
+        for bloque in self._bloques(ruta_archivo, año, tipo_modulo, columnas):
+            armonizacion = armonizacion or compilar_armonizacion(tipo_modulo, año, bloque.columns)
+            bloque = self.limpiar_columnas(bloque, tipo_modulo, año, armonizacion)
+            omitidas.update(aplicar_plan_tipos(bloque, plan, categorias=False))
+            partes.append(bloque)
 
+        df = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+        aplicar_plan_tipos(df, {col: t for col, t in plan.items() if t == 'category'})
+        if omitidas:
+            print(f"Plan de tipos {tipo_modulo}: se mantienen sin convertir {sorted(omitidas)}")
         return df
 
+    def ruta_modulo(self, año, tipo_modulo):
+        """Ruta del archivo .dta de un módulo para un año."""
+        nombre_archivo = MODULES_MAPPING.get(tipo_modulo, '').format(año=año)
+        return self.base_path / str(año) / 'DTA' / nombre_archivo
+
+    def cargar_modulo(self, año, tipo_modulo, columnas=None):
+        """
+        Carga un módulo específico para un año dado.
 
-    def cargar_modulo(self, año, tipo_modulo):
-        """Carga un módulo específico para un año dado."""
+        Si hay proyección de columnas (argumento `columnas` o la del loader),
+        solo se leen del disco esas columnas más las llaves del módulo.
+        """
         año_path = self.base_path / str(año) / 'DTA'
         
         if not año_path.exists():
             print(f"Carpeta no encontrada: {año_path}")
             return None
             
-        # Construir nombre del archivo
-        nombre_archivo = MODULES_MAPPING.get(tipo_modulo, '').format(año=año)
-        ruta_archivo = año_path / nombre_archivo
+        ruta_archivo = self.ruta_modulo(año, tipo_modulo)
         
         print(f"Intentando cargar: {ruta_archivo}")  # Debug
         
         if ruta_archivo.exists():
             try:
-                df = pd.read_stata(str(ruta_archivo), convert_categoricals=False)
-                df = self.limpiar_columnas(df, tipo_modulo)
+                columnas = self.columnas_modulo(tipo_modulo, columnas)
+                if self.aplicar_plan:
+                    df = self._leer_con_plan(ruta_archivo, año, tipo_modulo, columnas)
+                else:
+                    if self.cache is not None:
+                        df = self._leer_desde_cache(ruta_archivo, año, tipo_modulo, columnas)
+                    elif columnas is None:
+                        df = pd.read_stata(str(ruta_archivo), convert_categoricals=False)
+                    else:
+                        usecols = self._resolver_usecols(ruta_archivo, año, tipo_modulo, columnas)
+                        df, _ = pyreadstat.read_dta(str(ruta_archivo), usecols=usecols)
+                        print(f"Proyección {tipo_modulo}: {len(usecols)} columnas")
+                    df = self.limpiar_columnas(df, tipo_modulo, año)
                 print(f"Módulo {tipo_modulo} cargado exitosamente")
                 return df
             except Exception as e:
@@ -64,16 +209,76 @@ class ENAHOLoader:
         return None
 
 
-    def cargar_datos_año(self, año):
-        """Carga todos los módulos configurados para un año específico."""
+    def cargar_datos_año(self, año, columnas=None, workers=1):
+        """
+        Carga todos los módulos configurados para un año específico.
+
+        Con workers > 1 cada módulo se lee en un proceso distinto y vuelve al
+        proceso principal como tabla Arrow (buffers columnares) en lugar de
+        un DataFrame serializado con pickle.
+        """
+        if workers > 1:
+            return self._cargar_datos_año_paralelo(año, columnas, workers)
+
         modulos = {}
         
         for tipo_modulo in MODULES_MAPPING.keys():
             try:
-                df = self.cargar_modulo(año, tipo_modulo)
+                with self._span(tipo_modulo, año) as span:
+                    df = self.cargar_modulo(año, tipo_modulo, columnas)
+                    if span is not None:
+                        span.leido(self.ruta_modulo(año, tipo_modulo))
+                        span.salida(df)
                 modulos[tipo_modulo] = df
             except Exception as e:
                 print(f"Error cargando módulo {tipo_modulo}: {e}")
                 modulos[tipo_modulo] = None
         
         return modulos
+
+
+    def _span(self, tipo_modulo, año):
+        """Span de carga de un módulo (nada si no hay profiler)."""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.span(f"carga:{tipo_modulo}", categoria='modulo', modulo=tipo_modulo, año=año)
+
+    def _cargar_datos_año_paralelo(self, año, columnas, workers):
+        """Carga los módulos de un año en un pool de procesos."""
+        modulos = {}
+        with ProcessPoolExecutor(max_workers=min(workers, len(MODULES_MAPPING))) as executor:
+            futuros = {
+                tipo_modulo: executor.submit(_cargar_modulo_arrow, self, año, tipo_modulo, columnas)
+                for tipo_modulo in MODULES_MAPPING.keys()
+            }
+            for tipo_modulo, futuro in futuros.items():
+                try:
+                    datos, hits, misses = futuro.result()
+                    if isinstance(datos, pa.Table):
+                        datos = datos.to_pandas()
+                    modulos[tipo_modulo] = datos
+                    if self.cache is not None:
+                        self.cache.hits += hits
+                        self.cache.misses += misses
+                except Exception as e:
+                    print(f"Error cargando módulo {tipo_modulo}: {e}")
+                    modulos[tipo_modulo] = None
+        return modulos
+
+
+def _cargar_modulo_arrow(loader, año, tipo_modulo, columnas):
+    """
+    Carga un módulo en un proceso hijo y lo devuelve como tabla Arrow junto
+    con los aciertos y fallos de caché del proceso.
+    """
+    cache = loader.cache
+    antes = (cache.hits, cache.misses) if cache else (0, 0)
+    df = loader.cargar_modulo(año, tipo_modulo, columnas)
+    hits, misses = (cache.hits - antes[0], cache.misses - antes[1]) if cache else (0, 0)
+    if df is None:
+        return None, hits, misses
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False), hits, misses
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Columnas object con tipos mezclados: se devuelve el DataFrame
+        return df, hits, misses
@@ -0,0 +1,240 @@
+"""
+Plan de tipos de datos por módulo y año: consulta, aplicación y generación
+automática a partir de un escaneo de los archivos .dta
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyreadstat
+
+from config.dtypes_config import DTYPE_PLAN, DTYPE_PLAN_YEARS, GENERATED_PLANS_PATH
+from config.modules_config import MODULES_MAPPING, KEY_COLUMNS, MISSING_CODES
+
+# Tipos enteros en orden de tamaño: (numpy, nullable)
+_ENTEROS_SIN_SIGNO = [('uint8', 'UInt8'), ('uint16', 'UInt16'), ('uint32', 'UInt32')]
+_ENTEROS_CON_SIGNO = [('int8', 'Int8'), ('int16', 'Int16'), ('int32', 'Int32'), ('int64', 'Int64')]
+
+
+def plan_tipos(tipo_modulo, año=None):
+    """
+    Plan de tipos efectivo de un módulo para un año.
+
+    Prioridad (de menor a mayor): plan generado del año, 'default', plan
+    del módulo y cambios declarados para el año.
+
+    Returns:
+        dict: columna -> dtype
+    """
+    plan = {}
+    if año is not None:
+        generado = GENERATED_PLANS_PATH / f"{tipo_modulo}_{año}.json"
+        if generado.exists():
+            with open(generado, 'r', encoding='utf-8') as f:
+                plan.update(json.load(f))
+    plan.update(DTYPE_PLAN.get('default', {}))
+    plan.update(DTYPE_PLAN.get(tipo_modulo, {}))
+    if año is not None:
+        plan.update(DTYPE_PLAN_YEARS.get(año, {}).get(tipo_modulo, {}))
+    return plan
+
+
+def _cabe_en_entero(valores, dtype):
+    """Indica si valores (float, con NaN) son enteros dentro del rango de dtype."""
+    validos = valores[~np.isnan(valores)]
+    if len(validos) == 0:
+        return True
+    info = np.iinfo(np.dtype(dtype.lower()))
+    return bool(
+        (validos == np.floor(validos)).all()
+        and validos.min() >= info.min
+        and validos.max() <= info.max
+    )
+
+
+def castear_serie(serie, dtype):
+    """
+    Convierte una serie al dtype del plan si la conversión no pierde datos.
+
+    Returns:
+        Series|None: Serie convertida, o None si la conversión no es segura
+            (p. ej. códigos missing fuera de rango antes del preprocesamiento)
+    """
+    if str(serie.dtype) == dtype:
+        return serie
+    if dtype == 'category':
+        return serie.astype('category')
+    if dtype in ('object', 'str', 'string'):
+        return serie
+
+    if serie.dtype.kind in 'iufb':
+        numeros = serie
+    else:
+        numeros = pd.to_numeric(serie, errors='coerce')
+        # Textos no numéricos: no se fuerza la conversión
+        if numeros.isna().sum() > serie.isna().sum():
+            return None
+
+    if dtype.startswith('float'):
+        return numeros.astype(dtype)
+
+    valores = numeros.to_numpy(dtype=np.float64, na_value=np.nan)
+    if not _cabe_en_entero(valores, dtype):
+        return None
+    if dtype[0].islower() and np.isnan(valores).any():
+        # Entero numpy con faltantes: se usa su equivalente nullable
+        dtype = dtype[0].upper() + dtype[1:] if dtype.startswith('int') else 'U' + dtype[1:].capitalize()
+    return numeros.astype(dtype)
+
+
+def aplicar_plan_tipos(df, plan, categorias=True):
+    """
+    Aplica un plan de tipos en el lugar a las columnas presentes.
+
+    Args:
+        df (DataFrame): Datos a convertir
+        plan (dict): columna -> dtype
+        categorias (bool): Si es False se omiten las columnas 'category'
+            (útil por bloques, para convertirlas una vez al final)
+
+    Returns:
+        list: Columnas cuya conversión no fue segura y se dejaron igual
+    """
+    omitidas = []
+    for col, dtype in plan.items():
+        if col not in df.columns or (dtype == 'category' and not categorias):
+            continue
+        convertida = castear_serie(df[col], dtype)
+        if convertida is None:
+            omitidas.append(col)
+        elif convertida is not df[col]:
+            df[col] = convertida
+    return omitidas
+
+
+def inferir_tipo(resumen, columna, tipo_modulo):
+    """
+    Elige el dtype de una columna a partir del resumen de un escaneo.
+
+    Args:
+        resumen (dict): texto, entero, min, max, nulos, missing, unicos, filas
+    """
+    if columna in KEY_COLUMNS.get(tipo_modulo, []):
+        return 'category'
+    if resumen['texto']:
+        if resumen['unicos'] is not None and resumen['unicos'] < 0.5 * max(resumen['filas'], 1):
+            return 'category'
+        return 'object'
+    if not resumen['entero'] or resumen['min'] is None:
+        return 'float64' if columna.startswith('fac') else 'float32'
+
+    nullable = resumen['nulos'] or resumen['missing']
+    candidatos = _ENTEROS_SIN_SIGNO if resumen['min'] >= 0 else _ENTEROS_CON_SIGNO
+    for numpy_dtype, nullable_dtype in candidatos:
+        info = np.iinfo(numpy_dtype)
+        if info.min <= resumen['min'] and resumen['max'] <= info.max:
+            return nullable_dtype if nullable else numpy_dtype
+    return 'float64'
+
+
+def escanear_modulo(loader, año, tipo_modulo, chunksize=100000):
+    """
+    Recorre un .dta por bloques de filas y resume cada columna (sin
+    mantener el archivo completo en memoria). Los códigos missing no
+    cuentan para el rango de valores.
+
+    Returns:
+        dict: columna (nombre limpio) -> dtype sugerido
+    """
+    ruta = loader.ruta_modulo(año, tipo_modulo)
+    _, meta = pyreadstat.read_dta(str(ruta), metadataonly=True)
+    nombres = loader.nombres_limpios(meta.column_names, tipo_modulo, año)
+    resumen = {
+        nombres[col]: {
+            'texto': meta.readstat_variable_types.get(col) == 'string',
+            'entero': True, 'min': None, 'max': None,
+            'nulos': False, 'missing': False, 'unicos': set(), 'filas': 0
+        }
+        for col in meta.column_names
+    }
+
+    for bloque, _ in pyreadstat.read_file_in_chunks(pyreadstat.read_dta, str(ruta), chunksize=chunksize):
+        bloque = bloque.rename(columns=nombres)
+        for col, info in resumen.items():
+            serie = bloque[col]
+            info['filas'] += len(serie)
+            info['nulos'] |= bool(serie.isna().any())
+            if info['texto']:
+                if info['unicos'] is not None:
+                    info['unicos'].update(serie.dropna().unique())
+                    if len(info['unicos']) > 0.5 * max(meta.number_rows or 0, 1):
+                        info['unicos'] = None
+                continue
+            valores = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+            es_missing = np.isin(valores, MISSING_CODES)
+            info['missing'] |= bool(es_missing.any())
+            validos = valores[~np.isnan(valores) & ~es_missing]
+            if len(validos) == 0:
+                continue
+            info['entero'] &= bool((validos == np.floor(validos)).all())
+            minimo, maximo = float(validos.min()), float(validos.max())
+            info['min'] = minimo if info['min'] is None else min(info['min'], minimo)
+            info['max'] = maximo if info['max'] is None else max(info['max'], maximo)
+
+    plan = {}
+    for col, info in resumen.items():
+        if info['texto'] and info['unicos'] is not None:
+            info['unicos'] = len(info['unicos'])
+        plan[col] = inferir_tipo(info, col, tipo_modulo)
+    return plan
+
+
+def generar_plan_tipos(loader, años, modulos=None, destino=GENERATED_PLANS_PATH, chunksize=100000):
+    """
+    Genera y guarda planes de tipos escaneando los .dta crudos.
+
+    Args:
+        loader (ENAHOLoader): Loader que conoce las rutas de los módulos
+        años (iterable): Años a escanear
+        modulos (list|None): Módulos a escanear (None = todos)
+        destino (Path): Carpeta donde se guardan los JSON {módulo}_{año}.json
+
+    Returns:
+        dict: Rutas de los planes generados por (módulo, año)
+    """
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    generados = {}
+    for año in años:
+        for tipo_modulo in modulos or MODULES_MAPPING.keys():
+            if not loader.ruta_modulo(año, tipo_modulo).exists():
+                print(f"Archivo no encontrado: {tipo_modulo} {año}")
+                continue
+            plan = escanear_modulo(loader, año, tipo_modulo, chunksize)
+            ruta = destino / f"{tipo_modulo}_{año}.json"
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(plan, f, indent=2, ensure_ascii=False)
+            generados[(tipo_modulo, año)] = ruta
+            print(f"Plan de tipos {tipo_modulo} {año}: {len(plan)} columnas -> {ruta}")
+    return generados
+
+
+def main(argv=None):
+    """Genera planes de tipos desde la línea de comandos."""
+    from src.data_loader import ENAHOLoader
+
+    parser = argparse.ArgumentParser(description="Genera planes de tipos escaneando los .dta")
+    parser.add_argument("raw_path", help="Carpeta de datos crudos (contiene {año}/DTA)")
+    parser.add_argument("años", nargs="+", type=int)
+    parser.add_argument("--modulo", action="append", default=None)
+    parser.add_argument("--destino", default=str(GENERATED_PLANS_PATH))
+    args = parser.parse_args(argv)
+
+    generar_plan_tipos(ENAHOLoader(args.raw_path), args.años, args.modulo, args.destino)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
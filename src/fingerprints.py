@@ -0,0 +1,79 @@
+"""
+Huellas (fingerprints) estables de archivos, configuración y código
+"""
+import hashlib
+import inspect
+import json
+from pathlib import Path
+
+
+def file_fingerprint(path, content_hash=False):
+    """
+    Calcula la huella de un archivo.
+    
+    Args:
+        path (str|Path): Ruta del archivo
+        content_hash (bool): Si es True se usa el hash SHA-1 del contenido en
+            lugar de ruta, tamaño y fecha de modificación
+            
+    Returns:
+        dict: ruta, tamaño, mtime y clave (hex) del archivo
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    info = {
+        "ruta": str(path),
+        "tamaño": stat.st_size,
+        "mtime": stat.st_mtime_ns
+    }
+    
+    if content_hash:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(bloque)
+        info["clave"] = digest.hexdigest()
+    else:
+        texto = f"{info['ruta']}|{info['tamaño']}|{info['mtime']}"
+        info["clave"] = hashlib.sha1(texto.encode('utf-8')).hexdigest()
+    return info
+
+
+def config_fingerprint(*objetos):
+    """
+    Huella de objetos de configuración serializables (dicts, listas, sets).
+    
+    Returns:
+        str: Hash SHA-1 hex de la representación JSON canónica
+    """
+    def _normalizar(obj):
+        if isinstance(obj, dict):
+            return {str(k): _normalizar(v) for k, v in obj.items()}
+        if isinstance(obj, (set, frozenset)):
+            return sorted(_normalizar(v) for v in obj)
+        if isinstance(obj, (list, tuple)):
+            return [_normalizar(v) for v in obj]
+        return obj
+
+    texto = json.dumps([_normalizar(o) for o in objetos], sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+def function_fingerprint(func):
+    """
+    Huella del código de una función (o de un módulo completo): su código
+    fuente o, si no está disponible, el bytecode y las constantes.
+
+    
+    Returns:
+        str: Hash SHA-1 hex
+    """
+    try:
+        codigo = inspect.getsource(func)
+    except (OSError, TypeError):
+        code = getattr(func, '__code__', None)
+        if code is None:
+            codigo = repr(func)
+        else:
+            codigo = code.co_code.hex() + repr(code.co_consts)
+    return hashlib.sha1(codigo.encode('utf-8')).hexdigest()
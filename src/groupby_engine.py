@@ -0,0 +1,294 @@
+"""
+Motor de agregación por grupos compartido entre indicadores
+
+Los indicadores declaran sus llaves de agrupación, filtros y agregaciones
+ponderadas (IndicatorSpec). El motor factoriza cada conjunto de llaves una
+sola vez y calcula todas las sumas, conteos y promedios pedidos con
+`np.bincount` sobre los códigos de grupo.
+"""
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class Aggregation:
+    """
+    Agregación de un indicador.
+
+    how:
+        'sum'   suma de column * weight (sin column: suma de pesos)
+        'mean'  promedio de column ponderado por weight (simple si no hay weight)
+        'count' número de valores no nulos de column (sin column: filas)
+        'first' primer valor no nulo de column en el grupo
+        'ratio' suma ponderada de column / suma ponderada de denominator
+                (sin denominator: suma de pesos), con denominadores agrupados
+                por denominator_keys (por defecto las llaves del indicador)
+    """
+    how: str
+    column: Optional[str] = None
+    weight: Optional[str] = None
+    denominator: Optional[str] = None
+    denominator_keys: Optional[List[str]] = None
+    scale: float = 1.0
+
+    def inputs(self):
+        """Columnas que lee la agregación."""
+        return [c for c in (self.column, self.weight, self.denominator) if c is not None]
+
+
+@dataclass
+class IndicatorSpec:
+    """
+    Declaración de un indicador para el motor de agregación.
+
+    Args:
+        keys: Llaves de agrupación
+        aggregations: nombre de salida -> Aggregation (en orden de salida)
+        filter: Función df -> máscara booleana de filas a considerar
+        derived: nombre -> función df -> valores, para variables derivadas
+        columns: Columnas que leen `filter` y `derived`
+        filters: Columnas booleanas (p. ej. filtros registrados en el grafo
+            de variables derivadas) que deben cumplirse todas
+    """
+    keys: List[str]
+    aggregations: Dict[str, Aggregation]
+    filter: Optional[Callable] = None
+    derived: Dict[str, Callable] = field(default_factory=dict)
+    columns: List[str] = field(default_factory=list)
+    filters: List[str] = field(default_factory=list)
+
+    def required_columns(self):
+        """Columnas del dataset que necesita el indicador."""
+        columnas = list(self.keys) + list(self.columns) + list(self.filters)
+        for agg in self.aggregations.values():
+            columnas += [c for c in agg.inputs() if c not in self.derived]
+            columnas += list(agg.denominator_keys or [])
+        return list(dict.fromkeys(columnas))
+
+
+class GroupCodes:
+    """Códigos de grupo de un conjunto de llaves."""
+
+    def __init__(self, keys, codes, n_groups, key_codes, key_uniques, radix):
+        self.keys = keys
+        self.codes = codes              # int64 por fila, -1 si alguna llave es nula
+        self.n_groups = n_groups
+        self.key_codes = key_codes      # por grupo: código de cada llave (n_groups x len(keys))
+        self.key_uniques = key_uniques  # valores distintos de cada llave
+        self.radix = radix
+
+    def groups(self, seleccion=None):
+        """DataFrame con los valores de las llaves de cada grupo."""
+        idx = np.arange(self.n_groups) if seleccion is None else seleccion
+        return pd.DataFrame({
+            key: pd.Series(self.key_uniques[i].take(self.key_codes[idx, i]))
+            for i, key in enumerate(self.keys)
+        })
+
+
+class GroupByEngine:
+    def __init__(self, data):
+        """
+        Args:
+            data (DataFrame|LazyMergedFrame): Datos empalmados
+        """
+        self.data = data
+        self.n_rows = len(data)
+        self._key_codes = {}
+        self._group_codes = {}
+        self._values = {}
+
+    def key_codes(self, key):
+        """Factoriza (ordenado) una columna llave una sola vez."""
+        if key not in self._key_codes:
+            codes, uniques = pd.factorize(self.data[key], sort=True)
+            self._key_codes[key] = (codes.astype(np.int64), uniques)
+        return self._key_codes[key]
+
+    def group_codes(self, keys):
+        """Códigos de grupo (ordenados como groupby) de un conjunto de llaves."""
+        keys = tuple(keys)
+        if keys not in self._group_codes:
+            combinado = np.zeros(self.n_rows, dtype=np.int64)
+            valido = np.ones(self.n_rows, dtype=bool)
+            radix, uniques = [], []
+            for key in keys:
+                codes, valores = self.key_codes(key)
+                n = max(len(valores), 1)
+                combinado = combinado * n + codes
+                valido &= codes >= 0
+                radix.append(n)
+                uniques.append(valores)
+
+            distintos, inversa = np.unique(combinado[valido], return_inverse=True)
+            codes = np.full(self.n_rows, -1, dtype=np.int64)
+            codes[valido] = inversa
+
+            key_codes = np.empty((len(distintos), len(keys)), dtype=np.int64)
+            resto = distintos.copy()
+            for i in range(len(keys) - 1, -1, -1):
+                key_codes[:, i] = resto % radix[i]
+                resto //= radix[i]
+            self._group_codes[keys] = GroupCodes(keys, codes, len(distintos), key_codes, uniques, radix)
+        return self._group_codes[keys]
+
+    def values(self, column, spec=None):
+        """Valores float64 de una columna o variable derivada (NaN = nulo)."""
+        if spec is not None and column in spec.derived:
+            clave = (id(spec), column)
+            if clave not in self._values:
+                valores = spec.derived[column](self.data)
+                self._values[clave] = _a_float(valores)
+            return self._values[clave]
+        if column not in self._values:
+            self._values[column] = _a_float(self.data[column])
+        return self._values[column]
+
+    def _sum(self, codes, n_groups, valores=None, pesos=None):
+        """Suma por grupo de valores * pesos, ignorando nulos y filas fuera (-1)."""
+        incluir = codes >= 0
+        producto = np.ones(self.n_rows)
+        if valores is not None:
+            incluir &= ~np.isnan(valores)
+            producto = valores
+        if pesos is not None:
+            incluir &= ~np.isnan(pesos)
+            producto = producto * pesos
+        return np.bincount(codes[incluir], weights=producto[incluir], minlength=n_groups)
+
+    def _count(self, codes, n_groups, valores=None):
+        incluir = codes >= 0
+        if valores is not None:
+            incluir &= ~np.isnan(valores)
+        return np.bincount(codes[incluir], minlength=n_groups).astype(np.float64)
+
+    def _first(self, codes, n_groups, column):
+        serie = self.data[column]
+        incluir = (codes >= 0) & serie.notna().to_numpy()
+        filas = np.flatnonzero(incluir)
+        grupos, primera = np.unique(codes[filas], return_index=True)
+        valores = serie.iloc[filas[primera]]
+        valores.index = grupos
+        return valores.reindex(range(n_groups)).reset_index(drop=True)
+
+    def evaluate(self, spec):
+        """
+        Calcula un indicador declarado.
+
+        Returns:
+            DataFrame|None: Llaves y agregaciones por grupo, o None si faltan
+                columnas en los datos
+        """
+        if not self.available(spec):
+            return None
+        return self.evaluate_groups(spec)[0]
+
+    def available(self, spec):
+        """Indica si los datos tienen todas las columnas del indicador."""
+        return all(c in self.data.columns for c in spec.required_columns())
+
+    def spec_codes(self, spec):
+        """Grupos del indicador y códigos por fila (-1 = fila filtrada)."""
+        grupos = self.group_codes(spec.keys)
+        codes = grupos.codes
+        if spec.filter is not None or spec.filters:
+            mascara = np.ones(self.n_rows, dtype=bool)
+            if spec.filter is not None:
+                mascara &= np.asarray(spec.filter(self.data), dtype=bool)
+            for nombre in spec.filters:
+                mascara &= self.data[nombre].fillna(False).to_numpy(dtype=bool)
+            codes = np.where(mascara, codes, -1)
+        return grupos, codes
+
+    def evaluate_groups(self, spec):
+        """
+        Calcula un indicador declarado y devuelve también sus grupos.
+
+        Returns:
+            tuple: (DataFrame, GroupCodes, códigos por fila, grupos de salida)
+        """
+        grupos, codes = self.spec_codes(spec)
+        filas = self._count(codes, grupos.n_groups)
+        resultado = {}
+        presentes = filas > 0
+        for nombre, agg in spec.aggregations.items():
+            valores = self.values(agg.column, spec) if agg.column else None
+            pesos = self.values(agg.weight) if agg.weight else None
+
+            if agg.how == 'sum':
+                resultado[nombre] = self._sum(codes, grupos.n_groups, valores, pesos) * agg.scale
+            elif agg.how == 'count':
+                resultado[nombre] = self._count(codes, grupos.n_groups, valores)
+            elif agg.how == 'mean':
+                numerador = self._sum(codes, grupos.n_groups, valores, pesos)
+                base = self._sum(codes, grupos.n_groups, np.where(np.isnan(valores), np.nan, 1.0), pesos)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    resultado[nombre] = numerador / base * agg.scale
+            elif agg.how == 'first':
+                resultado[nombre] = self._first(codes, grupos.n_groups, agg.column)
+            elif agg.how == 'ratio':
+                numerador = self._sum(codes, grupos.n_groups, valores, pesos)
+                resultado[nombre] = numerador / self._denominators(grupos, codes, agg, spec) * agg.scale
+                # Solo grupos con algún valor no nulo en el numerador
+                presentes &= self._count(codes, grupos.n_groups, valores) > 0
+            else:
+                raise ValueError(f"Agregación '{agg.how}' no soportada")
+
+        seleccion = np.flatnonzero(presentes)
+        salida = grupos.groups(seleccion)
+        for nombre, valores in resultado.items():
+            if isinstance(valores, pd.Series):
+                salida[nombre] = valores.iloc[seleccion].reset_index(drop=True)
+            else:
+                salida[nombre] = valores[seleccion]
+        return salida, grupos, codes, seleccion
+
+    def _denominators(self, grupos, codes, agg, spec):
+        """Denominador de un ratio para cada grupo del numerador."""
+        den = self.group_codes(list(agg.denominator_keys or spec.keys))
+        filtrado = spec.filter is not None or spec.filters
+        den_codes = np.where(codes >= 0, den.codes, -1) if filtrado else den.codes
+        valores = self.values(agg.denominator, spec) if agg.denominator else None
+        pesos = self.values(agg.weight) if agg.weight else None
+        sumas = self._sum(den_codes, den.n_groups, valores, pesos)
+        return sumas[self.parent_groups(grupos, den)]
+
+    def parent_groups(self, grupos, padre):
+        """
+        Grupo de `padre` (llaves contenidas en las de `grupos`) al que
+        pertenece cada grupo de `grupos`.
+
+        Returns:
+            ndarray: Índice de grupo padre por grupo
+        """
+        combinado = np.zeros(grupos.n_groups, dtype=np.int64)
+        for key in padre.keys:
+            i = grupos.keys.index(key)
+            combinado = combinado * grupos.radix[i] + grupos.key_codes[:, i]
+        padre_combinado = np.zeros(padre.n_groups, dtype=np.int64)
+        for i in range(len(padre.keys)):
+            padre_combinado = padre_combinado * padre.radix[i] + padre.key_codes[:, i]
+        posicion = np.searchsorted(padre_combinado, combinado)
+        return np.minimum(posicion, max(padre.n_groups - 1, 0))
+
+    def evaluate_all(self, specs):
+        """
+        Calcula varios indicadores compartiendo la factorización de llaves
+        y las columnas convertidas.
+
+        Returns:
+            dict: nombre -> DataFrame|None
+        """
+        return {nombre: self.evaluate(spec) for nombre, spec in specs.items()}
+
+
+def _a_float(valores):
+    """Convierte una serie o arreglo a float64 con NaN para nulos."""
+    if isinstance(valores, pd.Series):
+        if isinstance(valores.dtype, pd.CategoricalDtype):
+            valores = valores.astype(object)
+        return pd.to_numeric(valores, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(valores, dtype=np.float64)
@@ -0,0 +1,123 @@
+"""
+Armonización de variables entre años, aplicada al cargar cada módulo
+
+Las reglas de config/harmonization.py (nombre de origen, recodificación y
+tipo destino por variable y año) se compilan una vez por módulo, año y
+conjunto de columnas en un solo paso: un renombre de todas las columnas,
+una recodificación por valor distinto y un casteo seguro.
+"""
+import numpy as np
+import pandas as pd
+
+from config.harmonization import HARMONIZATION, HARMONIZATION_YEARS, HARMONIZATION_VERSION
+from src.dtype_plan import aplicar_plan_tipos
+
+
+def reglas_armonizacion(tipo_modulo, año=None):
+    """
+    Reglas efectivas de un módulo para un año.
+
+    Prioridad (de menor a mayor): 'default', reglas del módulo y cambios
+    declarados para el año. Se descartan las reglas cuyo rango 'años' no
+    incluye al año.
+
+    Returns:
+        dict: variable destino -> regla
+    """
+    reglas = {}
+    reglas.update(HARMONIZATION.get('default', {}))
+    reglas.update(HARMONIZATION.get(tipo_modulo, {}))
+    if año is not None:
+        reglas.update(HARMONIZATION_YEARS.get(año, {}).get(tipo_modulo, {}))
+        reglas = {
+            destino: regla for destino, regla in reglas.items()
+            if 'años' not in regla or regla['años'][0] <= año <= regla['años'][1]
+        }
+    return reglas
+
+
+def recodificar(serie, mapeo):
+    """
+    Recodifica una serie procesando cada valor distinto una sola vez; los
+    valores sin entrada en `mapeo` se mantienen.
+    """
+    codigos, valores = pd.factorize(serie)
+    nuevos = np.array([mapeo.get(v, v) for v in valores], dtype=object)
+    resultado = nuevos.take(codigos) if len(nuevos) else np.empty(len(serie), dtype=object)
+    resultado[codigos == -1] = np.nan
+    return pd.Series(resultado, index=serie.index, name=serie.name).infer_objects()
+
+
+class Harmonizer:
+    """Armonización compilada de un módulo, año y conjunto de columnas."""
+
+    def __init__(self, renombres, recodificaciones, tipos, conflictos):
+        self.renombres = renombres            # nombre original -> nombre armonizado
+        self.recodificaciones = recodificaciones  # nombre armonizado -> mapeo
+        self.tipos = tipos                    # nombre armonizado -> dtype
+        self.conflictos = conflictos          # destinos que ya existían en el archivo
+
+    def apply(self, df):
+        """
+        Renombra, recodifica y castea un DataFrame en el lugar.
+
+        Returns:
+            DataFrame: El mismo `df`, armonizado
+        """
+        df.columns = [self.renombres.get(c, c) for c in df.columns]
+        for columna, mapeo in self.recodificaciones.items():
+            if columna in df.columns:
+                df[columna] = recodificar(df[columna], mapeo)
+        if self.tipos:
+            omitidas = aplicar_plan_tipos(df, self.tipos)
+            if omitidas:
+                print(f"Armonización: tipos sin convertir en {sorted(omitidas)}")
+        return df
+
+
+def compilar_armonizacion(tipo_modulo, año, columnas):
+    """
+    Compila las reglas de un módulo y año para las columnas de un archivo.
+
+    Args:
+        columnas (iterable): Nombres originales de las columnas del .dta
+
+    Returns:
+        Harmonizer
+    """
+    columnas = list(columnas)
+    limpios = {original: str(original).lower().strip() for original in columnas}
+    presentes = set(limpios.values())
+    reglas = reglas_armonizacion(tipo_modulo, año)
+
+    # nombre limpio de origen -> destino
+    destinos, conflictos = {}, []
+    for destino, regla in reglas.items():
+        fuentes = regla.get('fuente', destino)
+        fuentes = [fuentes] if isinstance(fuentes, str) else list(fuentes)
+        fuente = next((f for f in fuentes if f in presentes), None)
+        if fuente is None or fuente == destino:
+            continue
+        if destino in presentes:
+            conflictos.append(destino)
+            continue
+        destinos[fuente] = destino
+
+    renombres = {original: destinos.get(limpio, limpio) for original, limpio in limpios.items()}
+    finales = set(renombres.values())
+    recodificaciones = {
+        destino: regla['recodificar'] for destino, regla in reglas.items()
+        if regla.get('recodificar') and destino in finales
+    }
+    tipos = {
+        destino: regla['dtype'] for destino, regla in reglas.items()
+        if regla.get('dtype') and destino in finales
+    }
+    if conflictos:
+        print(f"Armonización {tipo_modulo} {año}: {conflictos} ya existen; no se renombra su fuente")
+    return Harmonizer(renombres, recodificaciones, tipos, conflictos)
+
+
+def version_armonizacion():
+    """Registro completo y su versión, para la huella de configuración."""
+    return {'version': HARMONIZATION_VERSION, 'reglas': HARMONIZATION, 'años': HARMONIZATION_YEARS}
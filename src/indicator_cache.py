@@ -0,0 +1,129 @@
+"""
+Memoización de resultados de indicadores
+
+La clave de un resultado combina la huella de los datos de entrada (año,
+columnas que lee el indicador y versión del pipeline, o el contenido de
+esas columnas si no hay contexto), la huella del código del indicador y
+sus argumentos. Hay dos niveles: un LRU en memoria y un nivel en disco
+con un Parquet por resultado y expulsión por tamaño.
+"""
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from src.fingerprints import config_fingerprint
+
+
+class IndicatorResultCache:
+    def __init__(self, path=None, max_items=64, max_size_mb=2000):
+        """
+        Args:
+            path (str|Path|None): Carpeta del nivel en disco (None = solo memoria)
+            max_items (int): Resultados máximos en el nivel en memoria
+            max_size_mb (float): Tamaño máximo del nivel en disco
+        """
+        self.path = Path(path) if path is not None else None
+        self.max_items = max_items
+        self.max_size_mb = max_size_mb
+        self._memoria = OrderedDict()
+        self.stats_por_indicador = {}
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(data_fingerprint, code_fingerprint, kwargs=None):
+        """Clave de un resultado."""
+        return config_fingerprint(data_fingerprint, code_fingerprint, kwargs or {})
+
+    def _contar(self, nombre, evento):
+        stats = self.stats_por_indicador.setdefault(
+            nombre, {"hits_memoria": 0, "hits_disco": 0, "misses": 0}
+        )
+        stats[evento] += 1
+
+    def get(self, key, nombre=None):
+        """
+        Busca un resultado en memoria y luego en disco.
+
+        Returns:
+            DataFrame|None: Copia del resultado o None si no está
+        """
+        if key in self._memoria:
+            self._memoria.move_to_end(key)
+            self._contar(nombre, "hits_memoria")
+            return self._memoria[key].copy()
+
+        if self.path is not None:
+            archivo = self.path / f"{key}.parquet"
+            if archivo.exists():
+                resultado = pd.read_parquet(archivo)
+                os.utime(archivo)  # marca de uso para la expulsión LRU
+                self._guardar_memoria(key, resultado)
+                self._contar(nombre, "hits_disco")
+                return resultado.copy()
+
+        self._contar(nombre, "misses")
+        return None
+
+    def put(self, key, resultado):
+        """Guarda un resultado en memoria y, si es posible, en disco."""
+        if resultado is None:
+            return
+        self._guardar_memoria(key, resultado.copy())
+        if self.path is None:
+            return
+        archivo = self.path / f"{key}.parquet"
+        tmp_path = archivo.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            resultado.to_parquet(tmp_path, index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError) as e:
+            print(f"No se pudo guardar en disco el resultado {key[:8]}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        os.replace(tmp_path, archivo)
+        self._evict(keep=archivo)
+
+    def _guardar_memoria(self, key, resultado):
+        self._memoria[key] = resultado
+        self._memoria.move_to_end(key)
+        while len(self._memoria) > self.max_items:
+            self._memoria.popitem(last=False)
+
+    def size_mb(self):
+        """Tamaño del nivel en disco en MB."""
+        if self.path is None:
+            return 0.0
+        return sum(f.stat().st_size for f in self.path.glob("*.parquet")) / (1024 * 1024)
+
+    def _evict(self, keep=None):
+        """Elimina los resultados en disco menos usados hasta respetar el tamaño."""
+        entradas = sorted(self.path.glob("*.parquet"), key=lambda f: f.stat().st_mtime)
+        total = sum(f.stat().st_size for f in entradas)
+        limite = self.max_size_mb * 1024 * 1024
+        for entrada in entradas:
+            if total <= limite:
+                break
+            if entrada == keep:
+                continue
+            total -= entrada.stat().st_size
+            entrada.unlink(missing_ok=True)
+
+    def clear(self, disco=False):
+        """Vacía el nivel en memoria (y el de disco si disco=True)."""
+        self._memoria.clear()
+        if disco and self.path is not None:
+            for entrada in self.path.glob("*.parquet"):
+                entrada.unlink(missing_ok=True)
+
+    def stats(self):
+        """Estadísticas totales de la caché."""
+        totales = {"hits_memoria": 0, "hits_disco": 0, "misses": 0}
+        for stats in self.stats_por_indicador.values():
+            for evento, n in stats.items():
+                totales[evento] += n
+        totales["en_memoria"] = len(self._memoria)
+        totales["disco_mb"] = round(self.size_mb(), 2)
+        return totales
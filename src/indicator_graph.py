@@ -0,0 +1,178 @@
+"""
+Grafo de dependencias de indicadores: variables derivadas y filtros
+
+Las variables derivadas (p. ej. 'empleado') y los filtros (p. ej. la
+condición de residente) se registran una vez con las columnas que leen.
+Los filtros son variables derivadas booleanas. El grafo resuelve qué
+columnas originales necesita cada indicador (para la proyección del
+loader) y DerivedFrame calcula cada variable una sola vez por corrida.
+"""
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+
+from src.fingerprints import config_fingerprint, function_fingerprint
+
+
+@dataclass
+class DerivedVariable:
+    """
+    Variable derivada a nivel de registro.
+
+    Args:
+        function: Función df -> valores (Series o arreglo); df da acceso a
+            columnas originales y a otras variables derivadas
+        inputs: Columnas o variables derivadas que lee la función
+        filtro: Si es True la variable es una máscara booleana de filas
+    """
+    function: Callable
+    inputs: List[str] = field(default_factory=list)
+    filtro: bool = False
+
+
+class IndicatorGraph:
+    def __init__(self):
+        self.variables = {}
+
+    def add(self, name, variable):
+        """Registra una variable derivada validando que no haya ciclos."""
+        previa = self.variables.get(name)
+        self.variables[name] = variable
+        try:
+            self.order([name])
+        except ValueError:
+            if previa is None:
+                del self.variables[name]
+            else:
+                self.variables[name] = previa
+            raise
+
+    def order(self, names):
+        """
+        Variables derivadas necesarias para `names`, en orden topológico.
+
+        Raises:
+            ValueError: Si hay un ciclo entre variables derivadas
+        """
+        orden, visitadas, en_curso = [], set(), set()
+
+        def visitar(nombre, camino):
+            if nombre not in self.variables or nombre in visitadas:
+                return
+            if nombre in en_curso:
+                raise ValueError(f"Ciclo en variables derivadas: {' -> '.join(camino + [nombre])}")
+            en_curso.add(nombre)
+            for entrada in self.variables[nombre].inputs:
+                visitar(entrada, camino + [nombre])
+            en_curso.discard(nombre)
+            visitadas.add(nombre)
+            orden.append(nombre)
+
+        for nombre in names:
+            visitar(nombre, [])
+        return orden
+
+    def source_columns(self, names):
+        """
+        Columnas originales que se necesitan para calcular `names`
+        (columnas o variables derivadas).
+
+        Returns:
+            list
+        """
+        derivadas = set(self.order(names))
+        columnas = [n for n in names if n not in derivadas]
+        for nombre in derivadas:
+            columnas += [c for c in self.variables[nombre].inputs if c not in self.variables]
+        return list(dict.fromkeys(columnas))
+
+    def fingerprint(self, names):
+        """Huella del código de las variables derivadas de las que dependen `names`."""
+        return config_fingerprint({
+            nombre: [function_fingerprint(self.variables[nombre].function),
+                     self.variables[nombre].inputs]
+            for nombre in self.order(names)
+        })
+
+
+class DerivedFrame:
+    """
+    Vista de los datos con las variables derivadas del grafo. Cada
+    variable se calcula en el primer acceso y queda en caché para el resto
+    de la corrida (todos los indicadores la comparten).
+    """
+
+    def __init__(self, data, graph):
+        self.data = data
+        self.graph = graph
+        self._valores = {}
+        self.calculadas = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def columns(self):
+        """Columnas originales y variables derivadas calculables."""
+        originales = list(self.data.columns)
+        disponibles = set(originales)
+        derivadas = []
+        for nombre in self.graph.order(list(self.graph.variables)):
+            if all(c in disponibles for c in self.graph.variables[nombre].inputs):
+                disponibles.add(nombre)
+                derivadas.append(nombre)
+        return pd.Index(originales + [d for d in derivadas if d not in self.data.columns])
+
+    def __contains__(self, nombre):
+        return nombre in self.columns
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.column(key)
+        return self.materialize(list(key))
+
+    def column(self, nombre):
+        """Columna original o variable derivada (calculada una vez)."""
+        if nombre in self.graph.variables and nombre not in self.data.columns:
+            if nombre not in self._valores:
+                variable = self.graph.variables[nombre]
+                valores = variable.function(self)
+                if not isinstance(valores, pd.Series):
+                    valores = pd.Series(np.asarray(valores), index=pd.RangeIndex(len(self.data)))
+                if variable.filtro:
+                    valores = valores.fillna(False).astype(bool)
+                valores.name = nombre
+                self._valores[nombre] = valores.reset_index(drop=True)
+                self.calculadas += 1
+            return self._valores[nombre]
+        serie = self.data[nombre]
+        return serie.reset_index(drop=True) if not isinstance(serie.index, pd.RangeIndex) else serie
+
+    def mask(self, filtros):
+        """Máscara booleana de las filas que cumplen todos los filtros."""
+        mascara = np.ones(len(self.data), dtype=bool)
+        for nombre in filtros:
+            mascara &= self.column(nombre).to_numpy(dtype=bool)
+        return mascara
+
+    def materialize(self, columnas=None):
+        """DataFrame con las columnas pedidas (las inexistentes se omiten)."""
+        if columnas is None:
+            columnas = list(self.columns)
+        disponibles = set(self.columns)
+        columnas = [c for c in columnas if c in disponibles]
+        originales = [c for c in columnas if c not in self.graph.variables or c in self.data.columns]
+        if hasattr(self.data, 'materialize'):
+            base = self.data.materialize(originales)
+        else:
+            base = self.data[originales].reset_index(drop=True)
+        for c in columnas:
+            if c not in base.columns:
+                base[c] = self.column(c)
+        return base[columnas]
+
+    def cached_variables(self):
+        """Variables derivadas ya calculadas en esta corrida."""
+        return list(self._valores)
@@ -0,0 +1,310 @@
+"""
+Almacén columnar de indicadores ENAHO
+
+Los resultados de todos los indicadores y años se guardan en un solo
+dataset Parquet en formato largo, particionado por indicador y año
+(indicador=/año=). Cada fila es una celda: las llaves del grupo (como
+texto, una columna por llave), la medida y su valor. Un índice pequeño
+(_index.parquet) registra qué celdas indicador/año existen y con qué
+versión del código se calcularon; sus rutas son relativas a la carpeta
+del almacén, que puede moverse o sincronizarse.
+"""
+import os
+import time
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config.modules_config import ID_VARS, KEY_COLUMNS
+
+INDEX_COLUMNS = ['indicador', 'año', 'version', 'filas', 'medidas', 'llaves', 'fecha', 'ruta']
+
+ARCHIVO_PARTICION = "part-0.parquet"
+
+
+def _texto_llave(serie):
+    """Valores de una llave como texto (enteros sin decimales)."""
+    if serie.dtype.kind == 'f':
+        enteros = serie.dropna()
+        if (enteros == np.floor(enteros)).all():
+            return serie.astype('Int64').astype('string')
+    return serie.astype('string')
+
+
+class IndicatorStore:
+    def __init__(self, path):
+        """
+        Args:
+            path (str|Path): Carpeta del dataset de indicadores
+        """
+        self.path = Path(path)
+        self.index_path = self.path / "_index.parquet"
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _partitioning(self):
+        return ds.partitioning(
+            pa.schema([('indicador', pa.string()), ('año', pa.int16())]), flavor='hive'
+        )
+
+    def to_long(self, df, llaves=None):
+        """
+        Convierte el resultado de un indicador a formato largo.
+
+        Args:
+            df (DataFrame): Resultado (llaves + medidas)
+            llaves (list|None): Columnas llave; por defecto las que no son
+                float y las variables de identificación (el resto son medidas)
+
+        Returns:
+            DataFrame: llaves (texto) + medida + valor. La llave 'año' se
+                omite porque es la partición.
+        """
+        if llaves is None:
+            conocidas = set(ID_VARS).union(*KEY_COLUMNS.values())
+            llaves = [c for c in df.columns if df[c].dtype.kind != 'f' or c in conocidas]
+        medidas = [c for c in df.columns if c not in llaves]
+        llaves = [c for c in llaves if c != 'año']
+        base = pd.DataFrame({c: _texto_llave(df[c]) for c in llaves}, index=df.index)
+        partes = []
+        for medida in medidas:
+            parte = base.copy()
+            parte['medida'] = medida
+            parte['valor'] = pd.to_numeric(df[medida], errors='coerce').astype('float64')
+            partes.append(parte)
+        if not partes:
+            return base.assign(medida=pd.Series(dtype='string'), valor=pd.Series(dtype='float64'))
+        largo = pd.concat(partes, ignore_index=True)
+        largo['medida'] = largo['medida'].astype('string')
+        return largo
+
+    def _particion(self, nombre, año):
+        return self.path / f"indicador={nombre}" / f"año={año}"
+
+    def _ruta(self, fila):
+        """Archivo de una fila del índice, resuelto desde la carpeta del almacén."""
+        ruta = Path(fila['ruta'])
+        if not ruta.is_absolute():
+            ruta = self.path / ruta
+        if not ruta.exists():
+            # Índices anteriores guardaban la ruta absoluta o relativa al
+            # directorio de trabajo de la corrida
+            ruta = self._particion(fila['indicador'], fila['año']) / ARCHIVO_PARTICION
+        return ruta
+
+    def _escribir(self, nombre, año, df, version=None, llaves=None):
+        """
+        Escribe la partición de un indicador en un año: primero en una
+        carpeta temporal y luego se intercambia con la anterior, de modo que
+        un lector nunca encuentra la partición a medio escribir o ausente.
+
+        Returns:
+            tuple: (Path del archivo escrito, fila del índice)
+        """
+        largo = self.to_long(df, llaves)
+        destino = self._particion(nombre, año)
+        staging = self.path / f".staging-{nombre}-{año}-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        nuevo = staging / "nuevo"
+        nuevo.mkdir(parents=True)
+        try:
+            tabla = pa.Table.from_pandas(largo, preserve_index=False)
+            tabla = tabla.append_column('version', pa.array([version] * len(tabla), pa.string()))
+            pq.write_table(tabla, nuevo / ARCHIVO_PARTICION, compression='snappy')
+
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            if destino.exists():
+                os.replace(destino, staging / "anterior")
+            os.replace(nuevo, destino)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        archivo = destino / ARCHIVO_PARTICION
+        return archivo, {
+            'indicador': nombre,
+            'año': int(año),
+            'version': version,
+            'filas': len(df),
+            'medidas': ",".join(largo['medida'].unique()) if len(largo) else "",
+            'llaves': ",".join(c for c in largo.columns if c not in ('medida', 'valor')),
+            'fecha': datetime.now().isoformat(),
+            'ruta': archivo.relative_to(self.path).as_posix()
+        }
+
+    def write(self, nombre, año, df, version=None, llaves=None):
+        """
+        Inserta o reemplaza (upsert) los resultados de un indicador en un año.
+
+        Returns:
+            Path: Archivo de la partición escrita
+        """
+        archivo, fila = self._escribir(nombre, año, df, version, llaves)
+        self._update_index([fila])
+        return archivo
+
+    def write_many(self, resultados, año, versiones=None, llaves=None):
+        """
+        Guarda varios indicadores de un año (se omiten los None) y actualiza
+        el índice una sola vez.
+
+        Args:
+            versiones (dict|None): nombre -> versión del código
+            llaves (dict|None): nombre -> columnas llave
+
+        Returns:
+            dict: nombre -> ruta (str)
+        """
+        versiones = versiones or {}
+        llaves = llaves or {}
+        rutas, filas = {}, []
+        for nombre, df in resultados.items():
+            if df is None:
+                continue
+            archivo, fila = self._escribir(nombre, año, df, versiones.get(nombre), llaves.get(nombre))
+            rutas[nombre] = str(archivo)
+            filas.append(fila)
+        if filas:
+            self._update_index(filas)
+        return rutas
+
+    def index(self):
+        """Índice de celdas indicador/año guardadas."""
+        if not self.index_path.exists():
+            return pd.DataFrame({c: pd.Series(dtype=object) for c in INDEX_COLUMNS})
+        return pd.read_parquet(self.index_path)
+
+    @contextmanager
+    def _index_lock(self, espera=30):
+        """Bloqueo del índice entre procesos (archivo creado en exclusiva)."""
+        lock_path = self.path / "_index.lock"
+        inicio = time.time()
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if time.time() - inicio > espera:
+                    # Bloqueo huérfano de un proceso interrumpido
+                    lock_path.unlink(missing_ok=True)
+                    inicio = time.time()
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            lock_path.unlink(missing_ok=True)
+
+    def _update_index(self, filas):
+        with self._index_lock():
+            self._write_index(filas)
+
+    def _write_index(self, filas):
+        nuevas = pd.DataFrame(filas, columns=INDEX_COLUMNS)
+        indice = self.index()
+        if len(indice):
+            llaves = set(zip(nuevas['indicador'], nuevas['año']))
+            indice = indice[[
+                (i, a) not in llaves for i, a in zip(indice['indicador'], indice['año'])
+            ]]
+            nuevas = pd.concat([indice, nuevas], ignore_index=True)
+        nuevas = nuevas.sort_values(['indicador', 'año']).reset_index(drop=True)
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        nuevas.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.index_path)
+
+    def cells(self, indicadores=None, años=None):
+        """Celdas (indicador, año, versión) disponibles según el índice."""
+        indice = self.index()
+        if indicadores is not None:
+            indice = indice[indice['indicador'].isin(indicadores)]
+        if años is not None:
+            indice = indice[indice['año'].isin(años)]
+        return indice[['indicador', 'año', 'version']].reset_index(drop=True)
+
+    def delete(self, nombre, año=None):
+        """Elimina un indicador (o solo un año) del almacén y del índice."""
+        destino = self.path / f"indicador={nombre}"
+        if año is not None:
+            destino = destino / f"año={año}"
+        shutil.rmtree(destino, ignore_errors=True)
+        with self._index_lock():
+            indice = self.index()
+            quitar = indice['indicador'] == nombre
+            if año is not None:
+                quitar &= indice['año'] == año
+            tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+            indice[~quitar].to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self.index_path)
+
+    def dataset(self, indicadores=None, años=None):
+        """
+        Dataset Arrow de las celdas pedidas, con esquema unificado.
+
+        Returns:
+            pyarrow.dataset.Dataset|None
+        """
+        indice = self.index()
+        if indicadores is not None:
+            indice = indice[indice['indicador'].isin(indicadores)]
+        if años is not None:
+            indice = indice[indice['año'].isin(años)]
+        rutas = [str(r) for r in (self._ruta(fila) for _, fila in indice.iterrows()) if r.exists()]
+        if not rutas:
+
+            return None
+        particiones = self._partitioning()
+        dataset = ds.dataset(rutas, format='parquet', partitioning=particiones,
+                             partition_base_dir=str(self.path))
+        schema = pa.unify_schemas(
+            [f.physical_schema for f in dataset.get_fragments()] + [particiones.schema],
+            promote_options='permissive'
+        )
+        return ds.dataset(rutas, schema=schema, format='parquet', partitioning=particiones,
+                          partition_base_dir=str(self.path))
+
+    def load(self, indicadores=None, años=None, columns=None, filters=None):
+        """
+        Lee celdas de varios indicadores y años en una sola lectura columnar.
+
+        Args:
+            indicadores (list|None): Indicadores (None = todos)
+            años (list|None): Años (None = todos)
+            columns (list|None): Columnas a leer (None = todas)
+            filters: Expresión de pyarrow.dataset o lista [(col, op, valor)]
+
+        Returns:
+            DataFrame: Formato largo (indicador, año, llaves, medida, valor, version)
+        """
+        dataset = self.dataset(indicadores, años)
+        if dataset is None:
+            return pd.DataFrame(columns=['indicador', 'año', 'medida', 'valor', 'version'])
+        if filters is not None and not isinstance(filters, ds.Expression):
+            filters = pq.filters_to_expression(filters)
+        if columns is not None:
+            columns = [c for c in columns if c in dataset.schema.names]
+        return dataset.to_table(columns=columns, filter=filters).to_pandas()
+
+    def load_wide(self, nombre, años=None):
+        """
+        Resultado de un indicador en formato ancho (llaves + medidas).
+
+        Returns:
+            DataFrame|None
+        """
+        largo = self.load([nombre], años)
+        if largo.empty:
+            return None
+        llaves = ['año'] + [
+            c for c in largo.columns
+            if c not in ('indicador', 'año', 'medida', 'valor', 'version') and largo[c].notna().any()
+        ]
+        ancho = largo.pivot_table(index=llaves, columns='medida', values='valor',
+                                  aggfunc='first', dropna=False, observed=True)
+        ancho.columns.name = None
+        return ancho.reset_index()
@@ -4,34 +4,253 @@ Sistema principal de cálculo de indicadores ENAHO
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Callable, Optional
+from typing import Dict, Callable, Optional, Iterable
+import hashlib
 import importlib.util
+import inspect
 import sys
+import time
+
+from src.groupby_engine import GroupByEngine, IndicatorSpec
+from src.survey import SurveyDesign, ESTIMADORES
+from src.replicates import ReplicateDesign
+from src.streaming import StreamingEvaluator
+from src.indicator_cache import IndicatorResultCache
+from src.fingerprints import config_fingerprint, function_fingerprint
+from src.indicator_graph import DerivedFrame, DerivedVariable, IndicatorGraph
+from src.sandbox import SandboxedRunner
+from src.indicators_config import ANALISIS
+
+
+def _mascara_filas(data, n_rows, filter):
+    """Máscara de filas de un filtro: función, máscara o nombres de filtros."""
+    if filter is None:
+        return np.ones(n_rows, dtype=bool)
+    if callable(filter):
+        filter = filter(data)
+    elif isinstance(filter, (list, tuple)) and all(isinstance(f, str) for f in filter):
+        mascara = np.ones(n_rows, dtype=bool)
+        for nombre in filter:
+            mascara &= data[nombre].fillna(False).to_numpy(dtype=bool)
+        return mascara
+    return np.asarray(pd.Series(filter).fillna(False), dtype=bool)
+
+
+def weighted_crosstab(engine: GroupByEngine, variable: Optional[str] = None,
+                      weight: str = 'factor07_sum', rows: str = 'dpto',
+                      columns: Iterable[str] = ('área',), filter=None,
+                      nombre: Optional[str] = None, por: str = 'año',
+                      total_filas: str = 'Nacional', total: str = 'Total'):
+    """
+    Tabla ponderada filas x desagregaciones con todos sus marginales, en el
+    formato largo de resultados_enaho.csv
+    (variable, dpto, analisis, desagregacion, año, valor).
+    
+    Con `variable`, cada celda es su media ponderada (una tasa si es 0/1).
+    Sin variable, es la participación del peso de la categoría en su fila,
+    como pd.crosstab(..., values=peso, aggfunc='sum', normalize='index').
+    Las celdas y los marginales (fila `total_filas` y análisis `total`) de
+    cada desagregación salen de un solo bincount sobre códigos factorizados.
+    
+    Args:
+        engine: Motor de agregación sobre los datos (comparte la factorización)
+        variable: Columna a promediar (None = participaciones)
+        weight: Columna de factor de expansión
+        rows: Columna de las filas de la tabla
+        columns: Desagregaciones (columnas de la tabla)
+        filter: Función df -> máscara, máscara o lista de filtros registrados
+        nombre: Nombre en la columna 'variable' (por defecto `variable`)
+        por: Columna que separa tablas (p. ej. año); se omite si no existe
+        
+    Returns:
+        DataFrame en formato largo
+    """
+    pesos = engine.values(weight)
+    valido = ~np.isnan(pesos) & _mascara_filas(engine.data, engine.n_rows, filter)
+    if variable is not None:
+        valores = engine.values(variable)
+        valido &= ~np.isnan(valores)
+        numerador = pesos * np.where(np.isnan(valores), 0.0, valores)
+    else:
+        numerador = pesos
+    
+    if por in engine.data.columns:
+        tablas, por_uniques = engine.key_codes(por)
+        valido &= tablas >= 0
+    else:
+        tablas, por_uniques = np.zeros(engine.n_rows, dtype=np.int64), pd.Index([None])
+    filas, filas_uniques = engine.key_codes(rows)
+    nombres_filas = np.append(np.asarray(filas_uniques.astype(str)), total_filas)
+    n_filas = len(nombres_filas)  # la última fila es el total
+    base = tablas * n_filas
+    
+    partes = []
+    for orden, columna in enumerate([None] + list(columns)):
+        if columna is None:
+            categorias, etiquetas = np.zeros(engine.n_rows, dtype=np.int64), pd.Index([total])
+            analisis = total
+        else:
+            categorias, etiquetas = engine.key_codes(columna)
+            analisis = ANALISIS.get(columna, columna)
+        n_cat = len(etiquetas)
+        en_celda = valido & (categorias >= 0)
+        en_fila = en_celda & (filas >= 0)
+        # Celdas fila x categoría y fila total x categoría en un solo conteo
+        indices = np.concatenate([
+            (base[en_fila] + filas[en_fila]) * n_cat + categorias[en_fila],
+            (base[en_celda] + n_filas - 1) * n_cat + categorias[en_celda]
+        ])
+        tamano = len(por_uniques) * n_filas * n_cat
+        suma_pesos = np.bincount(indices, np.concatenate([pesos[en_fila], pesos[en_celda]]), tamano)
+        if variable is not None:
+            suma = np.bincount(indices, np.concatenate([numerador[en_fila], numerador[en_celda]]), tamano)
+            denominador = suma_pesos
+        else:
+            suma = suma_pesos
+            denominador = np.repeat(suma_pesos.reshape(-1, n_cat).sum(axis=1), n_cat)
+        
+        presentes = np.flatnonzero(suma_pesos > 0)
+        celda_fila = presentes // n_cat
+        fila = celda_fila % n_filas
+        with np.errstate(invalid='ignore', divide='ignore'):
+            valor = suma[presentes] / denominador[presentes]
+        partes.append(pd.DataFrame({
+            'variable': nombre or variable or weight,
+            rows: nombres_filas[fila],
+            'analisis': analisis,
+            'desagregacion': np.asarray(etiquetas.astype(str))[presentes % n_cat],
+            por: np.asarray(por_uniques)[celda_fila // n_filas],
+            'valor': valor,
+            '_detalle': fila != n_filas - 1,
+            '_orden': orden,
+            '_fila': fila,
+            '_categoria': presentes % n_cat
+        }))
+    
+    resultado = pd.concat(partes, ignore_index=True)
+    resultado = resultado.sort_values(
+        [por, '_detalle', '_orden', '_fila', '_categoria'], kind='stable'
+    ).reset_index(drop=True)
+    return resultado[['variable', rows, 'analisis', 'desagregacion', por, 'valor']]
+
 
 class IndicatorCalculator:
-    def __init__(self, data: pd.DataFrame):
+    def __init__(self, data: Optional[pd.DataFrame] = None,
+                 cache: Optional[IndicatorResultCache] = None,
+                 contexto: Optional[dict] = None, hogares=None):
+        """
+        Args:
+            data: Datos empalmados (DataFrame o vista perezosa)
+            cache: Caché de resultados; si se indica, un indicador no se
+                recalcula mientras no cambien sus datos, su código ni sus
+                argumentos
+            contexto: Identidad de los datos (p. ej. año, versión del pipeline
+                y huellas de entrada). Sin contexto, la huella de los datos se
+                calcula con el contenido de las columnas que lee cada indicador
+            hogares: Tabla de hogares del año (HouseholdTable); se pasa como
+                argumento `hogares` a las funciones que lo aceptan
+        """
         self.data = data
+        self.hogares = hogares
+        self.cache = cache
+        self.contexto = contexto
+        self._column_hashes = {}
+        self._hashed_data = None
         self.indicators = {}
+        self.indicator_columns = {}
+        self.indicator_specs = {}
+        self.indicator_filters = {}
+        self.sandbox_report = None
+        self.graph = IndicatorGraph()
+        self._designs = {}
+        self._engine = None
+        self._derived = None
         self._load_base_indicators()
     
     def _load_base_indicators(self):
         """Carga los indicadores base predefinidos"""
         try:
-            from src.base_indicators import BASE_INDICATORS
+            from src.base_indicators import (
+                BASE_INDICATORS, BASE_INDICATOR_COLUMNS, BASE_INDICATOR_SPECS,
+                BASE_DERIVED_VARIABLES
+            )
+            for name, variable in BASE_DERIVED_VARIABLES.items():
+                self.graph.add(name, variable)
             self.indicators.update(BASE_INDICATORS)
+            self.indicator_columns.update(BASE_INDICATOR_COLUMNS)
+            self.indicator_specs.update(BASE_INDICATOR_SPECS)
             print("Indicadores base cargados exitosamente")
         except ImportError:
             print("No se pudieron cargar los indicadores base")
     
-    def register_indicator(self, name: str, function: Callable):
+    def register_variable(self, name: str, function: Callable,
+                          inputs: Iterable[str], filtro: bool = False):
+        """
+        Registra una variable derivada compartida entre indicadores. Se
+        calcula una sola vez por corrida, la primera vez que se usa.
+        
+        Args:
+            name: Nombre de la variable
+            function: Función df -> valores por fila
+            inputs: Columnas (o variables derivadas) que lee la función
+            filtro: La variable es una máscara booleana de filas
+        """
+        if self.data is not None and name in self.data.columns:
+            raise ValueError(f"'{name}' ya es una columna de los datos")
+        self.graph.add(name, DerivedVariable(function, list(inputs), filtro))
+        self._derived = None
+        print(f"Variable '{name}' registrada exitosamente")
+    
+    def register_filter(self, name: str, function: Callable, inputs: Iterable[str]):
+        """Registra un filtro de filas compartido (variable derivada booleana)."""
+        self.register_variable(name, function, inputs, filtro=True)
+    
+    def register_indicator(self, name: str, function: Optional[Callable] = None,
+                           columns: Optional[Iterable[str]] = None,
+                           spec: Optional[IndicatorSpec] = None,
+                           keys: Optional[list] = None,
+                           aggregations: Optional[dict] = None,
+                           filters: Optional[Iterable[str]] = None):
         """
         Registra un nuevo indicador en el sistema.
         
+        Puede registrarse con una función, con una declaración (spec, o
+        keys + aggregations) o con ambas. Las columnas y filtros pueden
+        nombrar variables derivadas del grafo; el loader lee las columnas
+        originales de las que dependen.
+        
         Args:
             name: Nombre único del indicador
             function: Función que calcula el indicador
+            columns: Columnas o variables derivadas que lee el indicador
+                (para la proyección del loader)
+            spec: Declaración de llaves y agregaciones para el modo por lotes
+            keys: Llaves de agrupación (con aggregations, arma la declaración)
+            aggregations: nombre -> Aggregation
+            filters: Filtros registrados que deben cumplir las filas
         """
+        filters = list(filters or [])
+        if spec is None and keys is not None and aggregations is not None:
+            spec = IndicatorSpec(keys=list(keys), aggregations=dict(aggregations), filters=filters)
+        if function is None and spec is None:
+            raise ValueError(f"El indicador '{name}' necesita una función o una declaración")
+        for nombre in filters:
+            if nombre not in self.graph.variables or not self.graph.variables[nombre].filtro:
+                raise ValueError(f"Filtro '{nombre}' no registrado")
+        
         self.indicators[name] = function
+        if spec is not None:
+            self.indicator_specs[name] = spec
+            if columns is None:
+                columns = spec.required_columns()
+        else:
+            self.indicator_specs.pop(name, None)
+        if columns is not None:
+            self.indicator_columns[name] = list(dict.fromkeys(list(columns) + filters))
+        if filters:
+            self.indicator_filters[name] = filters
+        else:
+            self.indicator_filters.pop(name, None)
         print(f"Indicador '{name}' registrado exitosamente")
     
     def load_custom_indicators(self, module_path: str):
@@ -47,8 +266,18 @@ class IndicatorCalculator:
             sys.modules["custom_indicators"] = module
             spec.loader.exec_module(module)
             
+            for name, variable in getattr(module, 'CUSTOM_DERIVED_VARIABLES', {}).items():
+                self.graph.add(name, variable)
+            self._derived = None
+            
             if hasattr(module, 'CUSTOM_INDICATORS'):
                 self.indicators.update(module.CUSTOM_INDICATORS)
+                self.indicator_columns.update(getattr(module, 'CUSTOM_INDICATOR_COLUMNS', {}))
+                for name in module.CUSTOM_INDICATORS:
+                    self.indicator_specs.pop(name, None)
+                    self.indicator_filters.pop(name, None)
+                self.indicator_filters.update(getattr(module, 'CUSTOM_INDICATOR_FILTERS', {}))
+                self.indicator_specs.update(getattr(module, 'CUSTOM_INDICATOR_SPECS', {}))
                 print(f"✅ {len(module.CUSTOM_INDICATORS)} indicadores personalizados cargados")
         except Exception as e:
             print(f"Error cargando indicadores personalizados: {e}")
@@ -67,8 +296,18 @@ class IndicatorCalculator:
         if indicator_name not in self.indicators:
             raise ValueError(f"Indicador '{indicator_name}' no encontrado")
         
+        function = self.indicators[indicator_name]
+        if function is None:
+            return self._calculate_spec(self._group_engine(), indicator_name)
+        
         print(f"Calculando indicador: {indicator_name}")
-        result = self.indicators[indicator_name](self.data, **kwargs)
+        key, result = self._cached(indicator_name, kwargs)
+        if result is not None:
+            return result
+        
+        result = function(self._input_data(indicator_name), **self._con_hogares(indicator_name, kwargs))
+        if key is not None:
+            self.cache.put(key, result)
         
         if result is not None:
             print(f"{indicator_name}: {result.shape[0]} registros calculados")
@@ -77,12 +316,133 @@ class IndicatorCalculator:
         
         return result
     
-    def calculate_all(self, indicator_list: Optional[list] = None):
+    def _cached(self, indicator_name: str, kwargs: dict):
+        """Llave de caché de un indicador con función y su resultado guardado, si hay."""
+        if self.cache is None:
+            return None, None
+        derivadas = list(self.indicator_columns.get(indicator_name, []))
+        derivadas += self.indicator_filters.get(indicator_name, [])
+        key = self.cache.key(
+            self.data_fingerprint(indicator_name),
+            config_fingerprint(function_fingerprint(self.indicators[indicator_name]),
+                               self.graph.fingerprint(derivadas)),
+            kwargs
+        )
+        result = self.cache.get(key, indicator_name)
+        if result is not None:
+            print(f"{indicator_name}: {result.shape[0]} registros (caché)")
+        return key, result
+    
+    def _con_hogares(self, indicator_name: str, kwargs: dict):
+        """
+        Agrega la tabla de hogares a los argumentos si la función la acepta
+        y recibe todas las filas de personas (sin filtros declarados).
+        """
+        if self.hogares is None or 'hogares' in kwargs or self.indicator_filters.get(indicator_name):
+            return kwargs
+        if self.hogares.n_personas != len(self.data):
+            return kwargs
+        if 'hogares' not in inspect.signature(self.indicators[indicator_name]).parameters:
+            return kwargs
+        return dict(kwargs, hogares=self.hogares)
+    
+    def data_fingerprint(self, indicator_name: str):
+        """
+        Huella de los datos que lee un indicador: contexto y columnas
+        declaradas, o el contenido de esas columnas si no hay contexto.
+        """
+        columns = self.indicator_columns.get(indicator_name)
+        if columns is None:
+            columns = list(self.data.columns) if self.data is not None else []
+        columns = self.graph.source_columns(list(columns) + self.indicator_filters.get(indicator_name, []))
+        columns = sorted(c for c in columns if self.data is not None and c in self.data.columns)
+        if self.contexto is not None:
+            return config_fingerprint(self.contexto, columns)
+        
+        if self._hashed_data is not self.data:
+            self._column_hashes = {}
+            self._hashed_data = self.data
+        for c in columns:
+            if c not in self._column_hashes:
+                valores = pd.util.hash_pandas_object(self.data[c], index=False).to_numpy()
+                self._column_hashes[c] = config_fingerprint(len(valores), hashlib.blake2b(memoryview(valores)).hexdigest())
+        return config_fingerprint(len(self.data) if self.data is not None else 0,
+                                  {c: self._column_hashes[c] for c in columns})
+    
+    def spec_fingerprint(self, indicator_name: str):
+        """Huella de la declaración de un indicador (incluye sus funciones)."""
+        spec = self.indicator_specs[indicator_name]
+        funciones = [spec.filter] + list(spec.derived.values())
+        return config_fingerprint(
+            'lote', spec.keys,
+            {nombre: vars(agg) for nombre, agg in spec.aggregations.items()},
+            sorted(spec.derived), spec.filters,
+            [function_fingerprint(f) for f in funciones if f is not None],
+            self.graph.fingerprint(spec.required_columns())
+        )
+    
+    def indicator_version(self, indicator_name: str):
+        """
+        Versión de un indicador para el manifiesto: huella de su función,
+        de su declaración (la que se usa en el modo por lotes) y de las
+        variables derivadas y filtros de los que dependen.
+        """
+        function = self.indicators[indicator_name]
+        if function is None:
+            return self.spec_fingerprint(indicator_name)
+        derivadas = list(self.indicator_columns.get(indicator_name, []))
+        derivadas += self.indicator_filters.get(indicator_name, [])
+        return config_fingerprint(
+            function_fingerprint(function),
+            self.graph.fingerprint(derivadas),
+            self.spec_fingerprint(indicator_name) if indicator_name in self.indicator_specs else None
+        )
+    
+    def cache_stats(self):
+        """Estadísticas de la caché de resultados (None si no hay caché)."""
+        if self.cache is None:
+            return None
+        return {"total": self.cache.stats(), "por_indicador": dict(self.cache.stats_por_indicador)}
+    
+    def _derived_frame(self):
+        """Vista de los datos con las variables derivadas de esta corrida."""
+        if self._derived is None or self._derived.data is not self.data:
+            self._derived = DerivedFrame(self.data, self.graph)
+        return self._derived
+    
+    def _input_data(self, indicator_name: str):
+        """
+        Datos que recibe un indicador. Si declara sus columnas, solo se
+        arman esas (incluidas las variables derivadas, que se calculan una
+        vez y se comparten), sea cual sea el motor de empalme; si no,
+        recibe todos los datos. Las filas se restringen a sus filtros
+        declarados.
+        """
+        columns = self.indicator_columns.get(indicator_name)
+        filters = self.indicator_filters.get(indicator_name, [])
+        derivadas = [c for c in columns or [] if c in self.graph.variables and c not in self.data.columns]
+        if not derivadas and not filters:
+            if hasattr(self.data, 'materialize'):
+                return self.data.materialize(columns)
+            if columns is None:
+                return self.data
+            return self.data[[c for c in columns if c in self.data.columns]]
+        
+        frame = self._derived_frame()
+        datos = frame.materialize(list(columns) if columns is not None else list(self.data.columns))
+        if filters:
+            datos = datos[frame.mask(filters)].reset_index(drop=True)
+        return datos
+    
+    def calculate_all(self, indicator_list: Optional[list] = None, batched: bool = False):
         """
         Calcula múltiples indicadores.
         
         Args:
             indicator_list: Lista de indicadores a calcular. Si es None, calcula todos.
+            batched: Calcular los indicadores declarados (con IndicatorSpec)
+                con el motor de agregación compartido, que factoriza cada
+                conjunto de llaves una sola vez. Los demás usan su función.
             
         Returns:
             Diccionario con los resultados de cada indicador
@@ -91,8 +451,12 @@ class IndicatorCalculator:
             indicator_list = list(self.indicators.keys())
         
         results = {}
+        engine = self._group_engine() if batched else None
         for indicator in indicator_list:
             try:
+                if engine is not None and indicator in self.indicator_specs:
+                    results[indicator] = self._calculate_spec(engine, indicator)
+                    continue
                 results[indicator] = self.calculate(indicator)
             except Exception as e:
                 print(f"Error calculando {indicator}: {e}")
@@ -100,6 +464,296 @@ class IndicatorCalculator:
         
         return results
     
-    def list_indicators(self):
-        """Lista todos los indicadores disponibles"""
-        return list(self.indicators.keys())
\ No newline at end of file
+    def calculate_sandboxed(self, indicator_list: Optional[list] = None, workers: int = 2,
+                            timeout: Optional[float] = None, memoria_mb: Optional[float] = None,
+                            batched: bool = False, **kwargs):
+        """
+        Calcula los indicadores con función en procesos aislados y en
+        paralelo (ver src/sandbox.py). Los datos que leen (con sus variables
+        derivadas y filtros) se escriben una vez a memoria compartida; cada
+        proceso lee de ahí solo sus columnas a una copia propia, que puede
+        modificar sin afectar a los demás ni a los datos de este proceso.
+        Los indicadores declarados sin función y los que están en caché se
+        calculan aquí.
+
+        
+        Args:
+            indicator_list: Indicadores a calcular. Si es None, todos.
+            workers: Indicadores calculados a la vez
+            timeout: Segundos máximos por indicador
+            memoria_mb: Memoria máxima por indicador (además de los datos)
+            batched: Usar el motor compartido para los declarados
+            **kwargs: Argumentos para las funciones de los indicadores
+            
+        Returns:
+            Diccionario con los resultados de cada indicador; los tiempos,
+            la memoria y los errores quedan en self.sandbox_report
+        """
+        if indicator_list is None:
+            indicator_list = list(self.indicators.keys())
+        
+        results, tareas, keys = {}, [], {}
+        columnas_datos = set()
+        reporte_local = []
+        for indicator in indicator_list:
+            if indicator not in self.indicators:
+                print(f"Error calculando {indicator}: Indicador '{indicator}' no encontrado")
+                results[indicator] = None
+                continue
+            if self.indicators[indicator] is None:
+                inicio = time.perf_counter()
+                results[indicator] = self.calculate_all([indicator], batched=batched)[indicator]
+                reporte_local.append({'indicador': indicator, 'estado': 'local',
+                                      'segundos': time.perf_counter() - inicio})
+                continue
+            keys[indicator], result = self._cached(indicator, kwargs)
+            if result is not None:
+                results[indicator] = result
+                reporte_local.append({'indicador': indicator, 'estado': 'cache', 'segundos': 0.0})
+                continue
+            columns = self.indicator_columns.get(indicator)
+            columns = list(columns) if columns is not None else list(self.data.columns)
+            filters = self.indicator_filters.get(indicator, [])
+            columnas_datos.update(columns + filters)
+            tareas.append((indicator, self.indicators[indicator], columns, filters,
+                           self._con_hogares(indicator, kwargs)))
+        
+        runner = SandboxedRunner(workers, timeout, memoria_mb)
+        if tareas:
+            frame = self._derived_frame()
+            datos = frame.materialize([c for c in frame.columns if c in columnas_datos])
+            results.update(runner.run(datos, tareas))
+            del datos
+            for indicator, key in keys.items():
+                if key is not None and results.get(indicator) is not None:
+                    self.cache.put(key, results[indicator])
+        
+        reporte = pd.DataFrame(reporte_local)
+        if runner.reporte is not None:
+            reporte = pd.concat([runner.reporte, reporte], ignore_index=True) if len(reporte) else runner.reporte
+        self.sandbox_report = reporte
+        return {indicator: results.get(indicator) for indicator in indicator_list}
+    
+    def _group_engine(self):
+        """Motor de agregación compartido sobre los datos actuales."""
+        frame = self._derived_frame()
+        if self._engine is None or self._engine.data is not frame:
+            self._engine = GroupByEngine(frame)
+            self._designs = {}
+        return self._engine
+    
+    def estimate(self, estimator: str, variable, by: Optional[list] = None,
+                 weight: str = 'factor07_sum', filter=None, strata: str = 'estrato',
+                 psu: str = 'conglome', **kwargs):
+        """
+        Estimación ponderada por dominio con error estándar, CV e intervalo
+        de confianza según el diseño muestral (estratos y conglomerados).
+        
+        Args:
+            estimator: 'total', 'mean', 'proportion', 'ratio' o 'quantile'
+            variable: Columna (o valores por fila) a estimar; para 'ratio',
+                el numerador (el denominador va en `denominator`)
+            by: Llaves de dominio (None = población total)
+            weight: Columna de factor de expansión
+            filter: Máscara o función df -> máscara de filas a considerar
+            **kwargs: Argumentos del estimador (q, valor, denominator, scale)
+            
+        Returns:
+            DataFrame con llaves, estimación, se, cv, ic_inf, ic_sup y n
+        """
+        if estimator not in ESTIMADORES:
+            raise ValueError(f"Estimador '{estimator}' no soportado; use uno de {ESTIMADORES}")
+        
+        engine = self._group_engine()
+        clave = (weight, strata, psu)
+        if clave not in self._designs:
+            self._designs[clave] = SurveyDesign(engine.data, weight, strata, psu, engine=engine)
+        design = self._designs[clave]
+        
+        if estimator == 'ratio':
+            return design.ratio(variable, kwargs.pop('denominator'), by, filter, **kwargs)
+        return getattr(design, estimator)(variable, by=by, filter=filter, **kwargs)
+    
+    def crosstab(self, variable: Optional[str] = None, weight: str = 'factor07_sum',
+                 rows: str = 'dpto', columns: Iterable[str] = ('área',), filter=None,
+                 nombre: Optional[str] = None, por: str = 'año'):
+        """
+        Tabla ponderada (p. ej. dpto x área) con sus marginales, en formato
+        largo (variable, dpto, analisis, desagregacion, año, valor). Usa el
+        motor compartido, de modo que las filas, desagregaciones y filtros
+        (dpto, área, sexo, grupo_edad, residente...) se calculan una sola vez
+        para todas las tablas de la corrida.
+        
+        Args:
+            variable: Columna a promediar (None = participaciones por fila)
+            weight: Columna de factor de expansión
+            rows: Filas de la tabla
+            columns: Desagregaciones
+            filter: Función df -> máscara, máscara o lista de filtros registrados
+            nombre: Nombre del indicador en la columna 'variable'
+            por: Columna que separa tablas (año)
+            
+        Returns:
+            DataFrame en formato largo
+        """
+        return weighted_crosstab(self._group_engine(), variable, weight, rows, columns,
+                                 filter, nombre, por)
+    
+    def calculate_replicates(self, indicator_list: Optional[list] = None,
+                             method: str = 'bootstrap', replicates: int = 200,
+                             seed: Optional[int] = None, memoria_mb: float = 512,
+                             workers: Optional[int] = None):
+        """
+        Calcula indicadores declarados con errores estándar por réplicas
+        (bootstrap Rao-Wu o jackknife por conglomerados). Todas las réplicas
+        se evalúan juntas como un producto de matrices.
+        
+        Args:
+            indicator_list: Indicadores a calcular. Si es None, todos los declarados.
+            method: 'bootstrap' o 'jackknife'
+            replicates: Número de réplicas bootstrap
+            seed: Semilla del sorteo bootstrap
+            memoria_mb: Memoria máxima por bloque de grupos
+            workers: Hilos para los bloques (None = núcleos disponibles)
+            
+        Returns:
+            Diccionario con los resultados (columnas *_se) de cada indicador
+        """
+        if indicator_list is None:
+            indicator_list = list(self.indicator_specs.keys())
+        
+        engine = self._group_engine()
+        design = ReplicateDesign(engine.data, method, replicates, seed=seed,
+                                 engine=engine, memoria_mb=memoria_mb,
+                                 workers=workers)
+        print(f"Réplicas {method}: {design.n_replicates}")
+        
+        results = {}
+        for indicator in indicator_list:
+            if indicator not in self.indicator_specs:
+                print(f"{indicator}: sin declaración de agregaciones, se omite")
+                results[indicator] = None
+                continue
+            try:
+                results[indicator] = design.evaluate(self.indicator_specs[indicator])
+            except Exception as e:
+                print(f"Error calculando réplicas de {indicator}: {e}")
+                results[indicator] = None
+        return results
+    
+    def calculate_streaming(self, batches: Iterable, indicator_list: Optional[list] = None,
+                            workers: int = 1):
+        """
+        Calcula indicadores declarados recorriendo los datos por bloques
+        (RecordBatch, Table o DataFrame), sin reunirlos en memoria. Cada
+        bloque se reduce a agregados parciales que se combinan al final.
+        
+        Args:
+            batches: Iterable de bloques (p. ej. StorageManager.scan_merged)
+            indicator_list: Indicadores a calcular. Si es None, todos los declarados.
+            workers: Bloques procesados en paralelo
+            
+        Returns:
+            Diccionario con los resultados de cada indicador
+        """
+        if indicator_list is None:
+            indicator_list = list(self.indicator_specs.keys())
+        
+        specs = {}
+        results = {}
+        for indicator in indicator_list:
+            if indicator in self.indicator_specs:
+                specs[indicator] = self.indicator_specs[indicator]
+            else:
+                print(f"{indicator}: sin declaración de agregaciones, no se puede calcular por bloques")
+                results[indicator] = None
+        
+        evaluator = StreamingEvaluator(specs, workers, graph=self.graph)
+        results.update(evaluator.run(batches))
+        print(f"Bloques procesados: {evaluator.bloques} ({evaluator.filas} filas)")
+        for indicator in specs:
+            if results[indicator] is None:
+                print(f"{indicator}: No se pudo calcular (variables faltantes)")
+            else:
+                print(f"{indicator}: {results[indicator].shape[0]} registros calculados")
+        return {indicator: results[indicator] for indicator in indicator_list}
+    
+    def indicator_keys(self):
+        """Llaves de agrupación de los indicadores declarados."""
+        return {name: list(spec.keys) for name, spec in self.indicator_specs.items()}
+    
+    def spec_columns(self, indicator_list: Optional[list] = None):
+        """Columnas originales que leen los indicadores declarados."""
+        if indicator_list is None:
+            indicator_list = list(self.indicator_specs.keys())
+        columns = []
+        for indicator in indicator_list:
+            if indicator in self.indicator_specs:
+                columns += self.indicator_specs[indicator].required_columns()
+        return self.graph.source_columns(list(dict.fromkeys(columns)))
+    
+    def _calculate_spec(self, engine: GroupByEngine, indicator_name: str):
+        """Calcula un indicador declarado con el motor de agregación."""
+        print(f"Calculando indicador (lote): {indicator_name}")
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(self.data_fingerprint(indicator_name), self.spec_fingerprint(indicator_name))
+            result = self.cache.get(key, indicator_name)
+            if result is not None:
+                print(f"{indicator_name}: {result.shape[0]} registros (caché)")
+                return result
+        result = engine.evaluate(self.indicator_specs[indicator_name])
+        if key is not None:
+            self.cache.put(key, result)
+        if result is not None:
+            print(f"{indicator_name}: {result.shape[0]} registros calculados")
+        else:
+            print(f"{indicator_name}: No se pudo calcular (variables faltantes)")
+        return result
+    
+    def required_columns(self, indicator_list: Optional[list] = None):
+        """
+        Une las columnas originales que leen los indicadores (las variables
+        derivadas se resuelven a sus columnas de entrada).
+        
+        Args:
+            indicator_list: Indicadores a considerar. Si es None, todos.
+            
+        Returns:
+            set con las columnas requeridas, o None si algún indicador no
+            declaró sus columnas (en ese caso hay que leer todo).
+        """
+        if indicator_list is None:
+            indicator_list = list(self.indicators.keys())
+        
+        columns = set()
+        for indicator in indicator_list:
+            if indicator not in self.indicator_columns:
+                return None
+            columns.update(self.graph.source_columns(
+                self.indicator_columns[indicator] + self.indicator_filters.get(indicator, [])
+            ))
+        return columns
+    
+    def list_indicators(self, con_estadisticas: bool = False):
+        """
+        Lista todos los indicadores disponibles.
+        
+        Args:
+            con_estadisticas: Devolver un DataFrame con la declaración de
+                cada indicador y los aciertos/fallos de la caché de resultados
+        """
+        if not con_estadisticas:
+            return list(self.indicators.keys())
+        
+        stats = self.cache.stats_por_indicador if self.cache is not None else {}
+        filas = []
+        for name in self.indicators:
+            fila = {
+                'indicador': name,
+                'declarado': name in self.indicator_specs,
+                'columnas': len(self.indicator_columns.get(name, [])) or None,
+            }
+            fila.update(stats.get(name, {"hits_memoria": 0, "hits_disco": 0, "misses": 0}))
+            filas.append(fila)
+        return pd.DataFrame(filas)
\ No newline at end of file
@@ -14,4 +14,60 @@ FACTOR_RECOMMENDATIONS = {
 DEFAULT_AGGREGATION_LEVELS = {
     'hogar': ['año', 'dominio', 'estrato'],
     'persona': ['año', 'dominio', 'estrato', 'p207']  
-}
\ No newline at end of file
+}
+
+# Departamentos por código (dos primeros dígitos del ubigeo)
+DEPARTAMENTOS = {
+    '01': 'Amazonas',
+    '02': 'Áncash',
+    '03': 'Apurímac',
+    '04': 'Arequipa',
+    '05': 'Ayacucho',
+    '06': 'Cajamarca',
+    '07': 'Callao',
+    '08': 'Cusco',
+    '09': 'Huancavelica',
+    '10': 'Huánuco',
+    '11': 'Ica',
+    '12': 'Junín',
+    '13': 'La Libertad',
+    '14': 'Lambayeque',
+    '15': 'Lima',
+    '16': 'Loreto',
+    '17': 'Madre de Dios',
+    '18': 'Moquegua',
+    '19': 'Pasco',
+    '20': 'Piura',
+    '21': 'Puno',
+    '22': 'San Martín',
+    '23': 'Tacna',
+    '24': 'Tumbes',
+    '25': 'Ucayali'
+}
+
+# Área de residencia por rango de estrato
+AREAS = {
+    'Urbano': (1, 5),
+    'Rural': (6, 8)
+}
+
+SEXOS = {1: 'Hombre', 2: 'Mujer'}
+
+# Grupos de edad (p208a): límites inferiores y etiquetas
+GRUPOS_EDAD = {
+    0: '0-2',
+    3: '3-5',
+    6: '6-11',
+    12: '12-16',
+    17: '17-24',
+    25: '25-44',
+    45: '45-64',
+    65: '65+'
+}
+
+# Nombres de las desagregaciones en la columna 'analisis' de resultados_enaho.csv
+ANALISIS = {
+    'área': 'Área',
+    'sexo': 'Sexo',
+    'grupo_edad': 'Grupo de edad'
+}
@@ -0,0 +1,272 @@
+"""
+Motor de empalme por índices para los módulos ENAHO de un año
+
+Las llaves de hogar (conglome, vivienda, hogar) y de persona (+ codperso)
+se codifican una sola vez como enteros int64. Con índices ordenados por
+módulo se calculan las posiciones de cada fila del resultado en cada
+módulo, y las columnas se arman en una sola pasada con `take` (gather) en
+lugar de encadenar merges.
+"""
+import numpy as np
+import pandas as pd
+
+from config.modules_config import KEY_COLUMNS
+
+HOGAR_KEYS = KEY_COLUMNS['sumarias']
+PERSONA_KEYS = KEY_COLUMNS['personas']
+
+# Renombre de factores tras unir sumarias y vivienda (como en el preprocesador)
+FACTORES_HOGAR = {
+    'factor07': 'factor07_sum',
+    'factora07': 'factora07_sum'
+}
+
+# Módulos a nivel persona que se unen a personas (left, 1:1) y su sufijo
+MODULOS_PERSONA = [('educacion', '_edu'), ('empleo_ingresos', '_emp')]
+
+
+def tomar(serie, posiciones):
+    """
+    Toma filas por posición; -1 produce un valor faltante (como un merge left).
+
+    Returns:
+        Series: Valores con índice 0..n-1
+    """
+    if len(posiciones) == 0 or posiciones.min() >= 0:
+        valores = serie.array.take(posiciones)
+    else:
+        valores = pd.api.extensions.take(serie.array, posiciones, allow_fill=True)
+    return pd.Series(valores, name=serie.name, dtype=object if serie.dtype == object else None)
+
+
+class KeyIndex:
+    """Índice ordenado de una llave sustituta int64."""
+
+    def __init__(self, llaves):
+        self.orden = np.argsort(llaves, kind='stable')
+        self.ordenadas = llaves[self.orden]
+
+    def duplicados(self):
+        """Número de filas con llave repetida (sin contar la primera)."""
+        return int((self.ordenadas[1:] == self.ordenadas[:-1]).sum())
+
+    def lookup(self, llaves):
+        """
+        Posición de cada llave en la tabla indexada (-1 si no existe). Con
+        llaves duplicadas se devuelve la primera aparición.
+        """
+        if len(self.ordenadas) == 0:
+            return np.full(len(llaves), -1, dtype=np.int64)
+        i = np.searchsorted(self.ordenadas, llaves, side='left')
+        i_seguro = np.minimum(i, len(self.ordenadas) - 1)
+        encontrada = (i < len(self.ordenadas)) & (self.ordenadas[i_seguro] == llaves)
+        return np.where(encontrada, self.orden[i_seguro], -1).astype(np.int64)
+
+
+class JoinPlan:
+    """
+    Resultado del empalme sin materializar: posiciones de cada fila del
+    resultado en cada módulo y procedencia de cada columna.
+    """
+
+    def __init__(self, n_filas, posiciones, columnas, reporte, hogar_ids=None):
+        self.n_filas = n_filas
+        self.posiciones = posiciones  # módulo -> array int64 (-1 = sin match)
+        self.columnas = columnas      # columna de salida -> (módulo, columna original)
+        self.reporte = reporte
+        self.hogar_ids = hogar_ids    # llave sustituta de hogar por fila
+
+
+class ModuleJoinEngine:
+    def encode_keys(self, modulos):
+        """
+        Codifica las llaves de todos los módulos con un diccionario común
+        por columna.
+
+        Returns:
+            dict: módulo -> {'hogar': int64 array, 'persona': int64 array|None}
+        """
+        codigos = {}
+        factor = {}
+        for col in PERSONA_KEYS:
+            presentes = [m for m, df in modulos.items() if col in df.columns]
+            if not presentes:
+                continue
+            todos = pd.concat(
+                [modulos[m][col].astype(object) for m in presentes], ignore_index=True
+            )
+            cod, uniques = pd.factorize(todos)
+            factor[col] = max(len(uniques), 1)
+            inicio = 0
+            for m in presentes:
+                n = len(modulos[m])
+                codigos.setdefault(m, {})[col] = cod[inicio:inicio + n].astype(np.int64)
+                inicio += n
+
+        llaves = {}
+        for m, cols in codigos.items():
+            hogar = np.zeros(len(modulos[m]), dtype=np.int64)
+            for col in HOGAR_KEYS:
+                hogar = hogar * factor[col] + cols[col]
+            persona = None
+            if 'codperso' in cols:
+                persona = hogar * factor['codperso'] + cols['codperso']
+            llaves[m] = {'hogar': hogar, 'persona': persona}
+        return llaves
+
+    def plan(self, modulos, columnas=None):
+        """
+        Calcula el empalme de los módulos de un año con la misma semántica
+        que los merges del preprocesador:
+
+        1. sumarias x vivienda (inner, 1:1, sufijos _sum/_viv)
+        2. personas x hogar (left, m:1, sufijo _per en personas)
+        3. personas x educacion / empleo_ingresos (left, 1:1, sufijos _edu/_emp)
+
+        Args:
+            modulos (dict): módulo -> DataFrame (basta con sus llaves si se
+                pasa `columnas`)
+            columnas (dict|None): módulo -> columnas completas del módulo,
+                cuando `modulos` solo trae las llaves (modo en disco)
+
+        Returns:
+            JoinPlan
+        """
+        modulos = {m: df for m, df in modulos.items() if df is not None}
+        columnas_modulos = columnas or {}
+        llaves = self.encode_keys(modulos)
+        reporte = {}
+
+        # 1. Nivel hogar: sumarias inner vivienda
+        llave_sum = llaves['sumarias']['hogar']
+        pos_sum = np.arange(len(llave_sum), dtype=np.int64)
+        indice_sum = KeyIndex(llave_sum)
+        reporte['sumarias'] = {'filas': len(llave_sum), 'duplicados': indice_sum.duplicados(), 'huerfanos': 0}
+        columnas_hogar = self._fuentes(modulos, 'sumarias', columnas_modulos)
+
+        if 'vivienda' in modulos:
+            llave_viv = llaves['vivienda']['hogar']
+            indice_viv = KeyIndex(llave_viv)
+            pos_viv = indice_viv.lookup(llave_sum)
+            con_vivienda = pos_viv >= 0
+            reporte['sumarias']['huerfanos'] = int((~con_vivienda).sum())
+            reporte['vivienda'] = {
+                'filas': len(llave_viv),
+                'duplicados': indice_viv.duplicados(),
+                'huerfanos': int((indice_sum.lookup(llave_viv) < 0).sum())
+            }
+            pos_sum = pos_sum[con_vivienda]
+            pos_viv = pos_viv[con_vivienda]
+            llave_hogar = llave_sum[pos_sum]
+            columnas_hogar = self._sufijos(
+                columnas_hogar, self._fuentes(modulos, 'vivienda', columnas_modulos),
+                HOGAR_KEYS, ('_sum', '_viv')
+            )
+            pos_hogar = {'sumarias': pos_sum, 'vivienda': pos_viv}
+        else:
+            llave_hogar = llave_sum
+            pos_hogar = {'sumarias': pos_sum}
+
+        columnas_hogar = [
+            (FACTORES_HOGAR.get(nombre, nombre), fuente) for nombre, fuente in columnas_hogar
+        ]
+
+        if 'personas' not in modulos:
+            columnas = {salida: fuente for salida, fuente in columnas_hogar}
+            return JoinPlan(len(llave_hogar), pos_hogar, columnas, reporte, llave_hogar)
+
+        # 2. Nivel persona: personas left hogar
+        llaves_per = llaves['personas']
+        indice_per = KeyIndex(llaves_per['persona'])
+        fila_hogar = KeyIndex(llave_hogar).lookup(llaves_per['hogar'])
+        reporte['personas'] = {
+            'filas': len(fila_hogar),
+            'duplicados': indice_per.duplicados(),
+            'huerfanos': int((fila_hogar < 0).sum())
+        }
+        posiciones = {'personas': np.arange(len(fila_hogar), dtype=np.int64)}
+        for m, pos in pos_hogar.items():
+            posiciones[m] = np.where(fila_hogar >= 0, pos[np.maximum(fila_hogar, 0)], -1)
+
+        columnas = self._sufijos(
+            self._fuentes(modulos, 'personas', columnas_modulos), columnas_hogar, HOGAR_KEYS, ('_per', '')
+        )
+
+        # 3. Módulos a nivel persona
+        for m, sufijo in MODULOS_PERSONA:
+            if m not in modulos:
+                continue
+            llave_mod = llaves[m]['persona']
+            indice_mod = KeyIndex(llave_mod)
+            posiciones[m] = indice_mod.lookup(llaves_per['persona'])
+            reporte[m] = {
+                'filas': len(llave_mod),
+                'duplicados': indice_mod.duplicados(),
+                'huerfanos': int((indice_per.lookup(llave_mod) < 0).sum())
+            }
+            columnas = self._sufijos(
+                columnas, self._fuentes(modulos, m, columnas_modulos), PERSONA_KEYS, ('', sufijo)
+            )
+
+        columnas = {salida: fuente for salida, fuente in columnas}
+        return JoinPlan(len(fila_hogar), posiciones, columnas, reporte, llaves_per['hogar'])
+
+    def _fuentes(self, modulos, modulo, columnas_modulos=None):
+        """Columnas de un módulo como [(nombre_salida, (módulo, columna))]."""
+        columnas = (columnas_modulos or {}).get(modulo, modulos[modulo].columns)
+        return [(col, (modulo, col)) for col in columnas]
+
+    def _sufijos(self, izquierda, derecha, llaves, sufijos):
+        """
+        Nombres de salida de un merge: columnas de la izquierda y luego las
+        de la derecha sin las llaves; las columnas repetidas reciben sufijo.
+
+        Args:
+            izquierda, derecha (list): [(nombre_salida, (módulo, columna))]
+
+        Returns:
+            list: [(nombre_salida, (módulo, columna))]
+        """
+        derecha = [(nombre, fuente) for nombre, fuente in derecha if nombre not in llaves]
+        nombres_izq = {nombre for nombre, _ in izquierda}
+        nombres_der = {nombre for nombre, _ in derecha}
+        repetidas = (nombres_izq & nombres_der) - set(llaves)
+
+        resultado = [
+            (nombre + sufijos[0] if nombre in repetidas else nombre, fuente)
+            for nombre, fuente in izquierda
+        ]
+        resultado += [
+            (nombre + sufijos[1] if nombre in repetidas else nombre, fuente)
+            for nombre, fuente in derecha
+        ]
+        return resultado
+
+    def assemble(self, modulos, plan, columnas=None):
+        """
+        Materializa el empalme tomando cada columna de su módulo.
+
+        Args:
+            columnas (list|None): Columnas de salida a materializar (None = todas)
+
+        Returns:
+            DataFrame
+        """
+        nombres = list(plan.columnas) if columnas is None else [c for c in plan.columnas if c in columnas]
+        datos = {}
+        for nombre in nombres:
+            m, col = plan.columnas[nombre]
+            datos[nombre] = tomar(modulos[m][col], plan.posiciones[m])
+        return pd.DataFrame(datos, index=pd.RangeIndex(plan.n_filas))
+
+    def join(self, modulos):
+        """Empalma los módulos de un año. Returns: (DataFrame, reporte)"""
+        plan = self.plan(modulos)
+        return self.assemble(modulos, plan), plan.reporte
+
+
+def imprimir_reporte(reporte):
+    """Imprime duplicados y huérfanos por módulo."""
+    for modulo, info in reporte.items():
+        print(f"   {modulo}: {info['filas']} filas, {info['duplicados']} llaves duplicadas, "
+              f"{info['huerfanos']} huérfanos")
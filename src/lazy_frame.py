@@ -0,0 +1,208 @@
+"""
+Vista perezosa del empalme de módulos ENAHO
+
+Los módulos se mantienen separados y unidos solo por el plan de posiciones
+del motor de empalme. Cada columna se arma a nivel persona la primera vez
+que se usa y queda en caché, de modo que la memoria crece con las columnas
+que realmente se leen y no con el ancho total de los cinco módulos.
+
+SpilledMergedFrame es la misma vista con los módulos en archivos Arrow IPC
+(modo en disco de src/memory_budget.py): en memoria quedan solo el plan y
+las columnas armadas.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.join_engine import ModuleJoinEngine, tomar
+
+
+class LazyMergedFrame:
+    def __init__(self, modulos, plan=None):
+        """
+        Args:
+            modulos (dict): módulo -> DataFrame preprocesado
+            plan (JoinPlan|None): Plan de empalme; se calcula si es None
+        """
+        self.modulos = {m: df for m, df in modulos.items() if df is not None}
+        self.plan = plan or ModuleJoinEngine().plan(self.modulos)
+        self._cache = {}
+
+    @property
+    def columns(self):
+        """Columnas disponibles (originales del empalme y derivadas)."""
+        derivadas = [c for c in self._cache if c not in self.plan.columnas]
+        return pd.Index(list(self.plan.columnas) + derivadas)
+
+    @property
+    def shape(self):
+        return (self.plan.n_filas, len(self.columns))
+
+    @property
+    def reporte(self):
+        return self.plan.reporte
+
+    def __len__(self):
+        return self.plan.n_filas
+
+    def __contains__(self, columna):
+        return columna in self.plan.columnas or columna in self._cache
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.column(key)
+        return self.materialize(list(key))
+
+    def __setitem__(self, columna, valores):
+        """Agrega una columna derivada (a nivel persona) a la vista."""
+        serie = pd.Series(valores, index=pd.RangeIndex(self.plan.n_filas), name=columna)
+        if len(serie) != self.plan.n_filas:
+            raise ValueError(f"La columna '{columna}' no tiene {self.plan.n_filas} filas")
+        self._cache[columna] = serie
+
+    def column(self, columna):
+        """
+        Devuelve una columna a nivel persona, armándola en el primer acceso.
+        """
+        if columna not in self._cache:
+            if columna not in self.plan.columnas:
+                raise KeyError(columna)
+            modulo, original = self.plan.columnas[columna]
+            serie = tomar(self.modulos[modulo][original], self.plan.posiciones[modulo])
+            serie.name = columna
+            self._cache[columna] = serie
+        return self._cache[columna]
+
+    def materialize(self, columnas=None):
+        """
+        DataFrame con las columnas pedidas (None = todas). Las columnas que
+        no existen se omiten.
+        """
+        if columnas is None:
+            columnas = list(self.columns)
+        columnas = [c for c in columnas if c in self]
+        return pd.DataFrame(
+            {c: self.column(c) for c in columnas}, index=pd.RangeIndex(self.plan.n_filas)
+        )
+
+    def to_pandas(self):
+        """Materializa el empalme completo."""
+        return self.materialize()
+
+    def iter_batches(self, batch_size=100000, columnas=None):
+        """
+        Genera el empalme por bloques de filas sin llenar la caché, para
+        escribirlo sin materializarlo completo.
+        """
+        if columnas is None:
+            columnas = list(self.columns)
+        for inicio in range(0, self.plan.n_filas, batch_size):
+            fin = min(inicio + batch_size, self.plan.n_filas)
+            datos = {}
+            for c in columnas:
+                if c in self._cache:
+                    serie = self._cache[c].iloc[inicio:fin].reset_index(drop=True)
+                else:
+                    modulo, original = self.plan.columnas[c]
+                    serie = tomar(self.modulos[modulo][original], self.plan.posiciones[modulo][inicio:fin])
+                datos[c] = serie
+            yield pd.DataFrame(datos, index=pd.RangeIndex(fin - inicio))
+
+    def cached_columns(self):
+        """Columnas ya armadas en memoria."""
+        return list(self._cache)
+
+    def drop_cache(self, columnas=None):
+        """Libera columnas armadas (None = todas)."""
+        for c in list(self._cache if columnas is None else columnas):
+            if c in self.plan.columnas:
+                self._cache.pop(c, None)
+
+    def memory_usage(self):
+        """Bytes ocupados por los módulos y por las columnas armadas."""
+        modulos = sum(int(df.memory_usage(deep=True).sum()) for df in self.modulos.values())
+        cache = sum(int(s.memory_usage(deep=True)) for s in self._cache.values())
+        return {"modulos": modulos, "columnas_armadas": cache}
+
+
+class SpilledMergedFrame(LazyMergedFrame):
+    def __init__(self, archivos, plan, filas_por_bloque=100000):
+        """
+        Args:
+            archivos (dict): módulo -> {columna: archivo Arrow IPC}
+            plan (JoinPlan): Plan de empalme calculado con las llaves
+            filas_por_bloque (int): Filas por bloque en iter_batches
+        """
+        self.archivos = archivos
+        self.modulos = {}
+        self.plan = plan
+        self.filas_por_bloque = filas_por_bloque
+        self._cache = {}
+        self._tablas = {}
+
+    def _tabla(self, ruta):
+        """Tabla Arrow de un archivo IPC, mapeada en memoria (sin copia)."""
+        if ruta not in self._tablas:
+            self._tablas[ruta] = pa.ipc.open_file(pa.memory_map(str(ruta), 'r')).read_all()
+        return self._tablas[ruta]
+
+    def _tomar(self, modulo, originales, posiciones):
+        """
+        Filas de columnas de un módulo por posición (-1 = faltante), con
+        un solo `take` por archivo IPC.
+
+        Returns:
+            DataFrame: Columnas originales con índice 0..n-1
+        """
+        faltantes = posiciones < 0
+        indices = pa.array(posiciones, mask=faltantes) if faltantes.any() else pa.array(posiciones)
+        por_archivo = {}
+        for original in originales:
+            por_archivo.setdefault(self.archivos[modulo][original], []).append(original)
+        partes = []
+        for ruta, columnas in por_archivo.items():
+            # La metadata pandas del archivo recupera Int*, category, etc.
+            parte = self._tabla(ruta).select(columnas).take(indices).to_pandas()
+            for c in columnas:
+                if parte[c].dtype == 'str':
+                    # Texto como object, igual que el preprocesador y `tomar`
+                    parte[c] = parte[c].astype(object)
+            partes.append(parte)
+        datos = pd.concat(partes, axis=1) if len(partes) > 1 else partes[0]
+        return datos[list(originales)].reset_index(drop=True)
+
+    def column(self, columna):
+        if columna not in self._cache:
+            if columna not in self.plan.columnas:
+                raise KeyError(columna)
+            modulo, original = self.plan.columnas[columna]
+            serie = self._tomar(modulo, [original], self.plan.posiciones[modulo])[original]
+            serie.name = columna
+            self._cache[columna] = serie
+        return self._cache[columna]
+
+    def iter_batches(self, batch_size=None, columnas=None):
+        if columnas is None:
+            columnas = list(self.columns)
+        batch_size = batch_size or self.filas_por_bloque
+        por_modulo = {}
+        for c in columnas:
+            if c not in self._cache:
+                modulo, original = self.plan.columnas[c]
+                por_modulo.setdefault(modulo, {})[original] = c
+        for inicio in range(0, self.plan.n_filas, batch_size):
+            fin = min(inicio + batch_size, self.plan.n_filas)
+            datos = {}
+            for modulo, nombres in por_modulo.items():
+                parte = self._tomar(modulo, list(nombres), self.plan.posiciones[modulo][inicio:fin])
+                datos.update({nombres[o]: parte[o] for o in nombres})
+            for c in columnas:
+                if c in self._cache:
+                    datos[c] = self._cache[c].iloc[inicio:fin].reset_index(drop=True)
+            yield pd.DataFrame({c: datos[c] for c in columnas}, index=pd.RangeIndex(fin - inicio))
+
+    def memory_usage(self):
+        """Bytes de las posiciones del plan y de las columnas armadas (los módulos están en disco)."""
+        posiciones = sum(int(np.asarray(p).nbytes) for p in self.plan.posiciones.values())
+        cache = sum(int(s.memory_usage(deep=True)) for s in self._cache.values())
+        return {"modulos": 0, "posiciones": posiciones, "columnas_armadas": cache}
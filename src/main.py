@@ -5,6 +5,7 @@ import sys
 import os
 import time
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # Agregar el directorio raíz al path
@@ -16,14 +17,286 @@ from src.data_loader import ENAHOLoader
 from src.preprocessor import ENAHOPreprocessor
 from src.indicators import IndicatorCalculator
 from src.storage import StorageManager
+from src.raw_cache import RawModuleCache
+from src.indicator_cache import IndicatorResultCache
+from src.manifest import BuildManifest
+from src.dtype_plan import plan_tipos
+from src.profiling import PipelineProfiler, NullProfiler
+
+from src.memory_budget import MemoryBudget, MemoryBudgetError
+from src.households import HouseholdTable
+from src.fingerprints import file_fingerprint, config_fingerprint, function_fingerprint
+from src.harmonization import version_armonizacion
+from src import preprocessor, join_engine, lazy_frame, households, harmonization, dtype_plan
+from config.modules_config import MODULES_MAPPING, KEY_COLUMNS, MISSING_CODES, HOUSEHOLD_VARS, CRITICAL_VARS
+from config.dtypes_config import DTYPE_PLAN, DTYPE_PLAN_YEARS
+from config.factors_mapping import FACTORS_MAPPING
 
 class ENAHOPipeline:
-    def __init__(self):
+    def __init__(self, base_path="D:/Mateo/ICSI/ENAHO", proyectar_columnas=False,
+                 usar_cache=False, cache_max_mb=20000, workers=1, usar_plan_tipos=False,
+                 motor_empalme='pandas', indicadores_por_lotes=False,
+                 particionar_dominio=False, perfilar=False, perfil_etapa=None,
+                 perfil_modo='cprofile', memoria_mb=None, aislar_indicadores=False,
+                 timeout_indicador=None, memoria_indicador_mb=None):
+        """
+        Args:
+            base_path (str|Path): Raíz del proyecto (contiene la carpeta data)
+            proyectar_columnas (bool): Leer de cada .dta solo las llaves, factores,
+                variables críticas y las columnas que declaran los indicadores
+            usar_cache (bool): Leer los módulos crudos a través de la caché Parquet
+                y memoizar los resultados de indicadores
+            cache_max_mb (float): Tamaño máximo de la caché en MB
+            workers (int): Procesos para cargar módulos (un año) o para
+                procesar años completos en paralelo (rango de años)
+            usar_plan_tipos (bool): Aplicar el plan de tipos de
+                config/dtypes_config.py al leer y al preprocesar
+            motor_empalme (str): 'pandas' (merges encadenados) o 'indices'
+                (llaves enteras y armado en una pasada, con reporte de
+                duplicados y huérfanos)
+            indicadores_por_lotes (bool): Calcular los indicadores declarados
+                con el motor de agregación compartido (una factorización
+                por conjunto de llaves)
+            particionar_dominio (bool): Particionar el dataset empalmado por
+                año y dominio (por defecto solo por año)
+            perfilar (bool): Escribir los spans de cada etapa y módulo en
+                processed/profiling (spans.jsonl y una traza por año)
+            perfil_etapa (str|None): Etapa a perfilar en detalle (p. ej.
+                'empalme' o 'carga:personas'); implica perfilar=True
+            perfil_modo (str): 'cprofile' o 'tracemalloc' para perfil_etapa
+            memoria_mb (float|None): Presupuesto de memoria por año (y por
+                proceso). Antes de cargar se estima el año con la metadata
+                de los .dta: si no cabe en memoria se procesa en disco por
+                grupos de columnas (data/cache/spill), y si tampoco cabe el
+                año falla de inmediato con la estimación
+            aislar_indicadores (bool): Calcular los indicadores con función en
+                procesos aislados (hasta `workers` a la vez) que leen los datos
+                de memoria compartida, con reporte de tiempos por indicador
+            timeout_indicador (float|None): Segundos máximos por indicador aislado
+            memoria_indicador_mb (float|None): Memoria máxima por indicador aislado
+        """
+        self.motor_empalme = motor_empalme
+        self.indicadores_por_lotes = indicadores_por_lotes
+        self.aislar_indicadores = aislar_indicadores
+        self.timeout_indicador = timeout_indicador
+        self.memoria_indicador_mb = memoria_indicador_mb
+        self.workers = workers
         # Usar Path para manejar rutas
-        base_path = Path("D:/Mateo/ICSI/ENAHO")
-        self.loader = ENAHOLoader(base_path / "data" / "1. raw")
+        base_path = Path(base_path)
+        self.cache = None
+        self.indicator_cache = None
+        if usar_cache:
+            self.cache = RawModuleCache(base_path / "data" / "cache" / "raw", cache_max_mb)
+            self.indicator_cache = IndicatorResultCache(base_path / "data" / "cache" / "indicators")
+        self.usar_plan_tipos = usar_plan_tipos
+        self.loader = ENAHOLoader(base_path / "data" / "1. raw", cache=self.cache,
+                                  aplicar_plan=usar_plan_tipos)
         self.preprocessor = ENAHOPreprocessor()
-        self.storage = StorageManager(base_path / "data")
+        self.storage = StorageManager(base_path / "data", particionar_dominio=particionar_dominio)
+        self.manifest = BuildManifest(self.storage.processed_path / "manifest.json")
+        perfiles_path = self.storage.processed_path / "profiling"
+        if perfilar or perfil_etapa:
+            self.profiler = PipelineProfiler(perfiles_path / "spans.jsonl", perfilar=perfil_etapa,
+                                             modo=perfil_modo, perfiles_path=perfiles_path)
+        else:
+            self.profiler = NullProfiler()
+        self.loader.profiler = self.profiler
+        self.memory_budget = None
+        if memoria_mb:
+            self.memory_budget = MemoryBudget(memoria_mb, base_path / "data" / "cache" / "spill")
+        self.ultima_entrada = None
+        if proyectar_columnas:
+            self.loader.columnas = self.columnas_requeridas()
+    
+    def columnas_requeridas(self, indicator_list=None):
+        """
+        Proyección por módulo derivada de los indicadores registrados.
+        
+        Returns:
+            dict|None: módulo -> columnas, o None si algún indicador no
+            declaró sus columnas.
+        """
+        extra = IndicatorCalculator().required_columns(indicator_list)
+        if extra is None:
+            print("Algún indicador no declara sus columnas; se leen módulos completos")
+            return None
+        return {
+            modulo: self.loader.columnas_proyeccion(modulo, extra)
+            for modulo in MODULES_MAPPING
+        }
+    
+    def huellas_entrada(self, año):
+        """Huellas de los archivos .dta de un año, por módulo."""
+        huellas = {}
+        for modulo in MODULES_MAPPING:
+            ruta = self.loader.ruta_modulo(año, modulo)
+            if ruta.exists():
+                huellas[modulo] = file_fingerprint(ruta)
+        return huellas
+    
+    def version_config(self):
+        """
+        Huella de la configuración y del código de preprocesamiento; si
+        cambia, los años registrados en el manifiesto se reconstruyen (y
+        la caché de indicadores deja de usar resultados anteriores).
+        Cubre el código completo de los módulos de preprocesamiento,
+        empalme, tabla de hogares, armonización y plan de tipos.
+        """
+        return config_fingerprint(
+            MODULES_MAPPING,
+            FACTORS_MAPPING,
+            version_armonizacion(),
+            KEY_COLUMNS,
+            MISSING_CODES,
+            HOUSEHOLD_VARS,
+            CRITICAL_VARS,
+            DTYPE_PLAN,
+            DTYPE_PLAN_YEARS,
+            self.loader.columnas,
+            self.usar_plan_tipos,
+            self.motor_empalme,
+            [function_fingerprint(modulo) for modulo in
+             (preprocessor, join_engine, lazy_frame, households, harmonization, dtype_plan)]
+        )
+
+    
+    def versiones_indicadores(self, calculator=None):
+        """
+        Huella de cada indicador registrado: su código, su declaración y
+        las variables derivadas y filtros que lee (ver
+        IndicatorCalculator.indicator_version).
+        """
+        calculator = calculator or IndicatorCalculator()
+        return {nombre: calculator.indicator_version(nombre) for nombre in calculator.indicators}
+    
+    def _calculadora(self, datos, año, hogares=None):
+        """
+        Calculadora de indicadores de un año; con caché, los resultados se
+        identifican por año, versión del pipeline y huellas de entrada.
+        """
+        contexto = None
+        if self.indicator_cache is not None:
+            contexto = {
+                "año": año,
+                "version": self.version_config(),
+                "entradas": {m: fp.get("clave") for m, fp in self.huellas_entrada(año).items()}
+            }
+        return IndicatorCalculator(datos, cache=self.indicator_cache, contexto=contexto, hogares=hogares)
+    
+    def _salidas_indicadores(self, indicadores, indicator_paths, versiones):
+        """
+        Salidas de indicadores para el manifiesto. Los que fallaron (None)
+        no se registran, para que year_status los siga marcando pendientes.
+        """
+        fallidos = [nombre for nombre, resultado in indicadores.items() if resultado is None]
+        if fallidos:
+            print(f"   Indicadores sin resultado (quedan pendientes): {fallidos}")
+        return {
+            nombre: {"ruta": indicator_paths.get(nombre), "version": versiones[nombre]}
+            for nombre, resultado in indicadores.items() if resultado is not None
+        }
+    
+    def _calcular_indicadores(self, calculator, indicator_list=None):
+        """
+        Calcula indicadores en el proceso o, con aislar_indicadores, en
+        procesos aislados (los tiempos quedan en calculator.sandbox_report).
+        """
+        if not self.aislar_indicadores:
+            return calculator.calculate_all(indicator_list, batched=self.indicadores_por_lotes)
+        indicadores = calculator.calculate_sandboxed(
+            indicator_list, workers=self.workers, timeout=self.timeout_indicador,
+            memoria_mb=self.memoria_indicador_mb, batched=self.indicadores_por_lotes
+        )
+        print(calculator.sandbox_report[['indicador', 'estado', 'segundos']].to_string(index=False))
+        return indicadores
+    
+    def invalidar_cache(self, año=None, tipo_modulo=None):
+        """
+        Elimina entradas de la caché de módulos crudos.
+        
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        if self.cache is None:
+            return 0
+        return self.cache.invalidate(año, tipo_modulo)
+    
+    def _cargar_y_empalmar(self, año):
+        """
+        Carga, preprocesa y empalma un año en memoria. Cada módulo se
+        libera en cuanto queda empalmado.
+
+        Returns:
+            DataFrame|LazyMergedFrame|None|False: Datos empalmados, None si
+                falló el empalme o False si el año no tiene datos
+        """
+        profiler = self.profiler
+        # 1. Cargar datos
+        print("Cargando módulos...")
+        cache_antes = self.cache.stats() if self.cache else None
+        with profiler.span('carga', año=año) as span:
+            datos_crudos = self.loader.cargar_datos_año(año, workers=self.workers)
+            span.salida(datos_crudos)
+            span.leido(n_bytes=sum(
+                s['bytes_leidos'] for s in profiler.spans
+                if s['padre'] == 'carga' and s['atributos'].get('año') == año
+            ))
+        if self.cache:
+            stats = self.cache.stats()
+            print(f"   Caché de módulos: {stats['hits'] - cache_antes['hits']} aciertos, "
+                  f"{stats['misses'] - cache_antes['misses']} fallos")
+        if not datos_crudos:
+            print(f"⏭Saltando año {año} - datos incompletos")
+            return False
+
+        # 2. Preprocesar
+        print("Preprocesando...")
+        modulos_procesados = {}
+        with profiler.span('preprocesamiento', año=año) as etapa:
+            etapa.entrada(datos_crudos)
+            for modulo, df in datos_crudos.items():
+                if df is not None:
+                    with profiler.span(f"preprocesamiento:{modulo}", categoria='modulo',
+                                       modulo=modulo, año=año) as span:
+                        span.entrada(df)
+                        tipos = plan_tipos(modulo, año) if self.usar_plan_tipos else None
+                        df_procesado = self.preprocessor.preprocesar_datos(df, modulo, tipos=tipos)
+                        span.salida(df_procesado)
+                    modulos_procesados[modulo] = df_procesado
+                    print(f" {modulo}:{df.shape} -> {df_procesado.shape}")
+            etapa.salida(modulos_procesados)
+        # Los módulos crudos y procesados son los mismos objetos: solo queda
+        # la referencia del dict procesado, que el empalme va vaciando
+        datos_crudos.clear()
+
+        # 3. Empalmar
+        print("Empalmando módulos...")
+        with profiler.span('empalme', año=año, motor=self.motor_empalme) as span:
+            span.entrada(modulos_procesados)
+            datos_empalmados = self.preprocessor.empalmar_modulos_año(
+                modulos_procesados, motor=self.motor_empalme, liberar=True
+            )
+            span.salida(datos_empalmados)
+        return datos_empalmados
+    
+    def _empalmar_en_disco(self, año, estimacion):
+        """
+        Procesa un año que no cabe en el presupuesto de memoria: cada módulo
+        se lee y preprocesa por grupos de columnas que se vuelcan a Arrow
+        IPC, y el empalme se arma por bloques de filas desde esos archivos.
+
+        Returns:
+            SpilledMergedFrame|None
+        """
+        print("Procesando en disco por grupos de columnas...")
+        tipos = (lambda modulo: plan_tipos(modulo, año)) if self.usar_plan_tipos else None
+        with self.profiler.span('empalme', año=año, motor='disco') as span:
+            datos_empalmados = self.memory_budget.spill_year(
+                self.loader, self.preprocessor, año, estimacion, tipos
+            )
+            span.salida(datos_empalmados)
+            span.escrito(self.memory_budget.spill_path / str(año))
+        return datos_empalmados
     
     def procesar_año(self, año, calcular_indicadores=True):
         """
@@ -34,65 +307,187 @@ class ENAHOPipeline:
         print(f"{'='*60}")
         
         start_time = time.time()
+        self.ultima_entrada = {
+            "estado": "error",
+            "entradas": self.huellas_entrada(año),
+            "version_config": self.version_config(),
+            "salidas": {}
+        }
+        profiler = self.profiler
+        raiz = f"procesar_año {año}"
+        modo = 'memoria'
         
         try:
-            # 1. Cargar datos
-            print("Cargando módulos...")
-            datos_crudos = self.loader.cargar_datos_año(año)
-            if not datos_crudos:
-                print(f"⏭Saltando año {año} - datos incompletos")
-                return False
-            
-            # 2. Preprocesar
-            print("Preprocesando...")
-            modulos_procesados = {}
-            for modulo, df in datos_crudos.items():
-                if df is not None:
-                    df_procesado = self.preprocessor.preprocesar_datos(df, modulo)
-                    modulos_procesados[modulo] = df_procesado
-                    print(f" {modulo}:{df.shape} -> {df_procesado.shape}")
-            
-            # 3. Empalmar
-            print("Empalmando módulos...")
-            datos_empalmados = self.preprocessor.empalmar_modulos_año(modulos_procesados)
-            if datos_empalmados is None:
-                raise ValueError("Error al empalmar módulos")
-            print(f"   Datos empalmados: {datos_empalmados.shape}")
-            
-            # 4. Guardar datos empalmados
-            print("Guardando datos empalmados...")
-            merged_path = self.storage.save_merged_data(datos_empalmados, año)
-            print(f"   Guardado en: {merged_path}")
-            
-            # 5. Calcular y guardar indicadores
-            if calcular_indicadores:
-                print("Calculando indicadores...")
-                calculator = IndicatorCalculator(datos_empalmados)
-                indicadores = calculator.calculate_all()
+            with profiler.span(raiz, categoria='año', año=año):
+                # 0. Estimar memoria y decidir el modo (falla antes de cargar)
+                if self.memory_budget is not None:
+                    with profiler.span('estimacion_memoria', año=año) as span:
+                        modo, estimacion = self.memory_budget.plan(self.loader, año, self.motor_empalme)
+                        span.atributos['modo'] = modo
+                
+                if modo == 'disco':
+                    datos_empalmados = self._empalmar_en_disco(año, estimacion)
+                    hogares = None
+                    if datos_empalmados is not None:
+                        with profiler.span('hogares', año=año):
+                            hogares = HouseholdTable.desde_empalme(datos_empalmados)
+                else:
+                    datos_empalmados = self._cargar_y_empalmar(año)
+                    hogares = self.preprocessor.hogares
+                if datos_empalmados is False:
+                    return False
+                if datos_empalmados is None:
+                    raise ValueError("Error al empalmar módulos")
+                print(f"   Datos empalmados: {datos_empalmados.shape}")
+                
+                # 4. Guardar datos empalmados
+                print("Guardando datos empalmados...")
+                with profiler.span('guardar_empalme', año=año) as span:
+                    span.entrada(datos_empalmados)
+                    merged_path = self.storage.save_merged_data(datos_empalmados, año)
+                    span.escrito(merged_path)
+                    if hogares is not None:
+                        hogares_path = self.storage.save_households(hogares, año)
+                        span.escrito(hogares_path)
+                        self.ultima_entrada["salidas"]["hogares"] = str(hogares_path)
+                print(f"   Guardado en: {merged_path}")
+                self.ultima_entrada["salidas"]["merged"] = str(merged_path)
                 
-                print("Guardando indicadores...")
-                indicator_paths = self.storage.save_indicators(indicadores, año)
-                print(f"   Indicadores guardados en: {self.storage.processed_path / 'Indicators'}")
+                # 5. Calcular y guardar indicadores
+                if calcular_indicadores:
+                    print("Calculando indicadores...")
+                    with profiler.span('indicadores', año=año) as span:
+                        span.entrada(datos_empalmados)
+                        calculator = self._calculadora(datos_empalmados, año, hogares)
+                        indicadores = self._calcular_indicadores(calculator)
+                        span.salida(indicadores)
+                    reporte = calculator.sandbox_report
+                    if reporte is not None:
+                        self.ultima_entrada["tiempos_indicadores"] = (
+                            reporte.astype(object).where(reporte.notna(), None).to_dict(orient='records')
+                        )
+                    
+                    print("Guardando indicadores...")
+                    with profiler.span('guardar_indicadores', año=año) as span:
+                        span.entrada(indicadores)
+                        versiones = self.versiones_indicadores(calculator)
+                        indicator_paths = self.storage.save_indicators(
+                            indicadores, año, versiones, calculator.indicator_keys(),
+                            calculator.cache_stats()
+                        )
+                        for ruta in indicator_paths.values():
+                            span.escrito(ruta)
+                    print(f"   Indicadores guardados en: {self.storage.indicators.path}")
+                    self.ultima_entrada["salidas"]["indicadores"] = self._salidas_indicadores(
+                        indicadores, indicator_paths, versiones
+                    )
             
             elapsed = time.time() - start_time
             print(f"✓ {año} completado en {elapsed:.2f} segundos")
+            profiler.imprimir_resumen(raiz)
+            self.ultima_entrada["estado"] = "completo"
             return True
             
+        except MemoryBudgetError as e:
+            print(f"✗ Error procesando {año}: {str(e)}")
+            return False
+            
         except Exception as e:
             print(f"✗ Error procesando {año}: {str(e)}")
             import traceback
             traceback.print_exc()
             return False
+        
+        finally:
+            if modo == 'disco':
+                self.memory_budget.limpiar(año)
+            if self.manifest is not None:
+                self.manifest.record_year(año, self.ultima_entrada)
+            if profiler.jsonl_path is not None:
+                profiler.write_trace(profiler.jsonl_path.parent / f"trace_{año}.json", año)
+    
+    def calcular_indicadores_streaming(self, años=None, indicator_list=None, workers=1,
+                                       batch_size=131072):
+        """
+        Calcula indicadores declarados sobre varios años del dataset
+        empalmado, leyendo por bloques solo las columnas necesarias. La
+        memoria depende del número de grupos, no de los años leídos.
+        
+        Args:
+            años (list|None): Años a incluir (None = todos los guardados)
+            indicator_list (list|None): Indicadores (None = todos los declarados)
+            workers (int): Bloques procesados en paralelo
+            batch_size (int): Filas máximas por bloque
+            
+        Returns:
+            dict: nombre -> DataFrame|None
+        """
+        calculator = IndicatorCalculator()
+        columnas = calculator.spec_columns(indicator_list)
+        batches = self.storage.scan_merged(años, columnas, batch_size=batch_size)
+        return calculator.calculate_streaming(batches, indicator_list, workers)
+    
+    def recalcular_indicadores(self, año, indicator_list):
+        """
+        Recalcula solo algunos indicadores de un año a partir de los datos
+        empalmados ya guardados.
+        """
+        print(f"\nAño {año}: recalculando indicadores {indicator_list}")
+        datos_empalmados = self.storage.load_merged_data(año)
+        if datos_empalmados is None:
+            print(f"✗ No hay datos empalmados guardados para {año}")
+            return False
+        
+        hogares = HouseholdTable.desde_empalme(datos_empalmados)
+        calculator = self._calculadora(datos_empalmados, año, hogares)
+        indicadores = self._calcular_indicadores(calculator, indicator_list)
+        versiones = self.versiones_indicadores(calculator)
+        indicator_paths = self.storage.save_indicators(
+            indicadores, año, versiones, calculator.indicator_keys(),
+            calculator.cache_stats()
+        )
+        self.manifest.record_indicators(
+            año, self._salidas_indicadores(indicadores, indicator_paths, versiones)
+        )
+        return True
     
-    def procesar_rango_años(self, años, calcular_indicadores=True):
+    def procesar_rango_años(self, años, calcular_indicadores=True, incremental=False):
         """
         Procesa un rango de años.
+        
+        Con workers > 1 cada año se procesa completo en un proceso hijo que
+        escribe sus resultados directamente en el almacenamiento; al proceso
+        principal solo vuelve el estado de cada año.
+        
+        Con incremental=True se consulta el manifiesto: los años al día se
+        omiten, los años cuyo único cambio es el código de algunos indicadores
+        solo recalculan esos indicadores, y el resto se reconstruye.
         """
         resultados = {}
+        pendientes = list(años)
+        
+        if incremental:
+            pendientes = []
+            versiones = self.versiones_indicadores() if calcular_indicadores else None
+            version_config = self.version_config()
+            for año in años:
+                estado, indicadores = self.manifest.year_status(
+                    año, self.huellas_entrada(año), version_config, versiones
+                )
+                if estado == "actualizado":
+                    print(f"Año {año}: al día, se omite")
+                    resultados[año] = True
+                elif estado == "indicadores":
+                    resultados[año] = self.recalcular_indicadores(año, indicadores)
+                else:
+                    pendientes.append(año)
         
-        for año in años:
-            éxito = self.procesar_año(año, calcular_indicadores)
-            resultados[año] = éxito
+        if self.workers > 1 and len(pendientes) > 1:
+            resultados.update(self._procesar_años_paralelo(pendientes, calcular_indicadores))
+        else:
+            for año in pendientes:
+                éxito = self.procesar_año(año, calcular_indicadores)
+                resultados[año] = éxito
         
         # Resumen final
         print(f"\n{'='*60}")
@@ -104,6 +499,10 @@ class ENAHOPipeline:
         
         print(f"Años procesados exitosamente: {exitosos}/{total}")
         print(f"Porcentaje de éxito: {exitosos/total*100:.1f}%")
+        if self.cache:
+            stats = self.cache.stats()
+            print(f"Caché de módulos: {stats['hits']} aciertos, {stats['misses']} fallos, "
+                  f"{self.cache.size_mb():.1f} MB")
         
         if exitosos < total:
             print("\nAños con errores:")
@@ -113,6 +512,48 @@ class ENAHOPipeline:
         
         return resultados
 
+    def _procesar_años_paralelo(self, años, calcular_indicadores):
+        """Procesa años en un pool de procesos."""
+        resultados = {}
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(años))) as executor:
+            futuros = {
+                año: executor.submit(_procesar_año_en_proceso, self, año, calcular_indicadores)
+                for año in años
+            }
+            for año, futuro in futuros.items():
+                try:
+                    éxito, hits, misses, entrada, spans = futuro.result()
+                except Exception as e:
+                    print(f"✗ Error procesando {año}: {str(e)}")
+                    éxito, hits, misses, entrada, spans = False, 0, 0, None, []
+                resultados[año] = éxito
+                # El hijo ya escribió sus spans en el JSONL y su traza
+                self.profiler.spans.extend(spans)
+                if entrada is not None:
+                    self.manifest.record_year(año, entrada)
+                if self.cache:
+                    self.cache.hits += hits
+                    self.cache.misses += misses
+        return resultados
+
+def _procesar_año_en_proceso(pipeline, año, calcular_indicadores):
+    """
+    Procesa un año en un proceso hijo. Los módulos se cargan en serie dentro
+    del hijo para no anidar pools de procesos, y la entrada del manifiesto
+    y los spans del año se devuelven al padre, que es el único que escribe
+    el manifiesto.
+    """
+    pipeline.workers = 1
+    pipeline.manifest = None
+    pipeline.profiler.spans = []
+    cache = pipeline.cache
+    antes = (cache.hits, cache.misses) if cache else (0, 0)
+    éxito = pipeline.procesar_año(año, calcular_indicadores)
+    spans = pipeline.profiler.spans
+    if cache:
+        return éxito, cache.hits - antes[0], cache.misses - antes[1], pipeline.ultima_entrada, spans
+    return éxito, 0, 0, pipeline.ultima_entrada, spans
+
 def main():
     """
     Función principal del pipeline.
@@ -126,7 +567,7 @@ def main():
     pipeline = ENAHOPipeline()
     
     # Procesar años
-    resultados = pipeline.procesar_rango_años(años)
+    resultados = pipeline.procesar_rango_años(años, incremental=True)
     
     # Mostrar resumen de almacenamiento
     print(f"\nArchivos generados:")
@@ -0,0 +1,98 @@
+"""
+Manifiesto de construcción por año del pipeline ENAHO
+"""
+import json
+import os
+from pathlib import Path
+from datetime import datetime
+
+
+class BuildManifest:
+    def __init__(self, path):
+        """
+        Inicializa el manifiesto.
+
+        Args:
+            path (str|Path): Archivo JSON del manifiesto
+        """
+        self.path = Path(path)
+        self.years = {}
+        self.load()
+
+    def load(self):
+        """Carga el manifiesto desde disco si existe."""
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.years = json.load(f).get("años", {})
+        return self.years
+
+    def save(self):
+        """Guarda el manifiesto de forma atómica."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"años": self.years}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get_year(self, año):
+        """Entrada registrada para un año (o None)."""
+        return self.years.get(str(año))
+
+    def year_status(self, año, inputs, config_version, indicator_versions=None):
+        """
+        Compara el estado registrado de un año con el estado actual.
+
+        Args:
+            año (int): Año a evaluar
+            inputs (dict): Huellas actuales de los archivos de entrada por módulo
+            config_version (str): Huella actual de la configuración del pipeline
+            indicator_versions (dict|None): Huella actual del código de cada
+                indicador a calcular (None si no se calculan indicadores)
+
+        Returns:
+            tuple: (estado, indicadores_pendientes) donde estado es
+                'actualizado', 'indicadores' o 'reconstruir'
+        """
+        entrada = self.get_year(año)
+        if entrada is None or entrada.get("estado") != "completo":
+            return "reconstruir", list(indicator_versions or [])
+
+        claves_registradas = {m: fp.get("clave") for m, fp in entrada.get("entradas", {}).items()}
+        claves_actuales = {m: fp.get("clave") for m, fp in inputs.items()}
+        if claves_registradas != claves_actuales or entrada.get("version_config") != config_version:
+            return "reconstruir", list(indicator_versions or [])
+
+        registrados = entrada.get("salidas", {}).get("indicadores", {})
+        pendientes = [
+            nombre for nombre, version in (indicator_versions or {}).items()
+            if registrados.get(nombre, {}).get("version") != version
+        ]
+        if pendientes:
+            return "indicadores", pendientes
+        return "actualizado", []
+
+    def record_year(self, año, entrada):
+        """
+        Registra el resultado de un año y guarda el manifiesto.
+
+        Args:
+            año (int): Año procesado
+            entrada (dict): estado, entradas, version_config y salidas
+        """
+        entrada = dict(entrada)
+        entrada["fecha"] = datetime.now().isoformat()
+        self.years[str(año)] = entrada
+        self.save()
+
+    def record_indicators(self, año, indicadores):
+        """
+        Actualiza las salidas de indicadores de un año ya registrado.
+
+        Args:
+            indicadores (dict): nombre -> {"ruta": ..., "version": ...}
+        """
+        entrada = self.years.setdefault(str(año), {"estado": "completo", "salidas": {}})
+        salidas = entrada.setdefault("salidas", {}).setdefault("indicadores", {})
+        salidas.update(indicadores)
+        entrada["fecha"] = datetime.now().isoformat()
+        self.save()
@@ -0,0 +1,296 @@
+"""
+Ejecución con presupuesto de memoria para años grandes
+
+Antes de cargar un año se estima su memoria con la metadata de los .dta
+(filas, columnas y tipos, sin leer datos). Si el empalme en memoria cabe
+en el presupuesto se usa el camino normal; si no, el año se procesa en
+disco:
+
+1. Cada módulo se lee y preprocesa por grupos de columnas (siempre con
+   sus llaves) y cada grupo se vuelca a un archivo Arrow IPC local; el
+   DataFrame se libera en cuanto se escribe.
+2. El plan del empalme (ModuleJoinEngine) se calcula solo con las llaves.
+3. El resultado es una SpilledMergedFrame: las columnas se toman de los
+   archivos IPC mapeados en memoria y se escriben por bloques de filas.
+
+Si ni el modo en disco cabe en el presupuesto, se falla de inmediato con
+la estimación en lugar de llegar a usar swap.
+"""
+import gc
+import shutil
+from pathlib import Path
+
+import pyarrow as pa
+import pyreadstat
+
+from config.modules_config import KEY_COLUMNS, MODULES_MAPPING
+from src.join_engine import ModuleJoinEngine, imprimir_reporte
+from src.lazy_frame import SpilledMergedFrame
+
+# Bytes por valor en pandas: números en float64/int64 y texto como objetos str
+BYTES_NUMERO = 8
+BYTES_TEXTO_BASE = 57
+
+# Copias simultáneas durante preprocesamiento (lectura + conversión)
+COPIAS_PREPROCESO = 2
+# Copias del resultado durante los merges encadenados de pandas
+COPIAS_EMPALME = {'pandas': 2, 'indices': 1, 'perezoso': 0}
+
+
+class MemoryBudgetError(MemoryError):
+    """El año no cabe en el presupuesto de memoria ni procesándolo en disco."""
+
+
+def _mb(n_bytes):
+    return n_bytes / 1024 ** 2
+
+
+class MemoryBudget:
+    def __init__(self, limite_mb, spill_path, fraccion_grupo=0.25, fraccion_bloque=0.1):
+        """
+        Args:
+            limite_mb (float): Memoria máxima que puede usar el año
+            spill_path (str|Path): Carpeta local para los archivos Arrow IPC
+            fraccion_grupo (float): Fracción del presupuesto para un grupo
+                de columnas de un módulo (leído y preprocesado)
+            fraccion_bloque (float): Fracción del presupuesto para un bloque
+                de filas del empalme al escribirlo
+        """
+        if limite_mb <= 0:
+            raise ValueError("El presupuesto de memoria debe ser positivo")
+        self.limite_mb = limite_mb
+        self.spill_path = Path(spill_path)
+        self.fraccion_grupo = fraccion_grupo
+        self.fraccion_bloque = fraccion_bloque
+
+    def columnas_modulo(self, loader, año, tipo_modulo):
+        """
+        Columnas (nombres limpios) que se leerían de un módulo y sus bytes
+        por fila, según la metadata del .dta y la proyección del loader.
+
+        Returns:
+            dict|None: {'filas', 'columnas': {limpio: bytes}, 'originales':
+                {limpio: original}} o None si el archivo no existe
+        """
+        ruta = loader.ruta_modulo(año, tipo_modulo)
+        if not ruta.exists():
+            return None
+        _, meta = pyreadstat.read_dta(str(ruta), metadataonly=True)
+        seleccion = loader.columnas_modulo(tipo_modulo)
+        limpios = loader.nombres_limpios(meta.column_names, tipo_modulo, año)
+        columnas, originales = {}, {}
+        for original in meta.column_names:
+            limpio = limpios[original]
+            if seleccion is not None and limpio not in seleccion:
+                continue
+            if meta.readstat_variable_types.get(original) == 'string':
+                ancho = BYTES_TEXTO_BASE + (meta.variable_storage_width.get(original) or 8)
+            else:
+                ancho = BYTES_NUMERO
+            columnas[limpio] = ancho
+            originales[limpio] = original
+        return {'filas': meta.number_rows or 0, 'columnas': columnas, 'originales': originales}
+
+    def estimate(self, loader, año, motor='pandas'):
+        """
+        Estima la memoria de un año sin leer datos. Es una cota superior:
+        el texto se cuenta con el ancho máximo de almacenamiento y el
+        empalme con el ancho de todos los módulos.
+
+        Returns:
+            dict: 'modulos' (MB por módulo), 'empalme_mb', 'memoria_mb'
+                (pico del camino en memoria), 'disco_mb' (pico del modo en
+                disco), 'filas_empalme' y la metadata de cada módulo
+        """
+        modulos = {}
+        for tipo_modulo in MODULES_MAPPING:
+            info = self.columnas_modulo(loader, año, tipo_modulo)
+            if info is not None:
+                modulos[tipo_modulo] = info
+
+        filas = modulos.get('personas', modulos.get('sumarias', {'filas': 0}))['filas']
+        por_modulo = {
+            m: _mb(info['filas'] * sum(info['columnas'].values())) for m, info in modulos.items()
+        }
+        # El empalme tiene una fila por persona y las columnas de todos los módulos
+        ancho_empalme = sum(sum(info['columnas'].values()) for info in modulos.values())
+        empalme = _mb(filas * ancho_empalme)
+        memoria = (sum(por_modulo.values()) + max(por_modulo.values(), default=0)
+                   + COPIAS_EMPALME.get(motor, 1) * empalme)
+
+        # Modo en disco: llaves y posiciones en memoria, un grupo de columnas
+        # y un bloque de filas a la vez
+        llaves = sum(
+            _mb(info['filas'] * sum(info['columnas'].get(k, BYTES_NUMERO) + BYTES_NUMERO
+                                    for k in KEY_COLUMNS.get(m, [])))
+            for m, info in modulos.items()
+        )
+        posiciones = _mb(filas * BYTES_NUMERO * len(modulos))
+        grupo_minimo = max(
+            (COPIAS_PREPROCESO * self._grupo_minimo(info, m) for m, info in modulos.items()), default=0
+        )
+        grupo = max(grupo_minimo, self.limite_mb * self.fraccion_grupo)
+        bloque = 2 * _mb(self.filas_por_bloque(ancho_empalme) * ancho_empalme)
+        disco = llaves + posiciones + grupo + bloque
+
+        return {
+            'modulos': por_modulo,
+            'empalme_mb': empalme,
+            'memoria_mb': memoria,
+            'disco_mb': disco,
+            'filas_empalme': filas,
+            'ancho_fila_bytes': ancho_empalme,
+            'metadata': modulos
+        }
+
+    def _grupo_minimo(self, info, tipo_modulo):
+        """MB del grupo más chico posible: llaves más la columna más ancha."""
+        llaves = sum(info['columnas'].get(k, 0) for k in KEY_COLUMNS.get(tipo_modulo, []))
+        return _mb(info['filas'] * (llaves + max(info['columnas'].values(), default=0)))
+
+    def filas_por_bloque(self, ancho_fila_bytes):
+        """Filas por bloque de escritura del empalme dentro del presupuesto."""
+        # El bloque existe dos veces: como DataFrame y al convertirlo a Arrow
+        disponible = self.limite_mb * self.fraccion_bloque * 1024 ** 2 / 2
+        return max(int(disponible // max(ancho_fila_bytes, 1)), 256)
+
+    def plan(self, loader, año, motor='pandas'):
+        """
+        Decide cómo procesar un año dentro del presupuesto.
+
+        Returns:
+            tuple: ('memoria' | 'disco', estimación)
+
+        Raises:
+            MemoryBudgetError: Si ni el modo en disco cabe en el presupuesto
+        """
+        estimacion = self.estimate(loader, año, motor)
+        print(f"Memoria estimada {año}: módulos {sum(estimacion['modulos'].values()):.0f} MB, "
+              f"empalme {estimacion['empalme_mb']:.0f} MB, pico en memoria "
+              f"{estimacion['memoria_mb']:.0f} MB, en disco {estimacion['disco_mb']:.0f} MB "
+              f"(presupuesto {self.limite_mb:.0f} MB)")
+        if estimacion['memoria_mb'] <= self.limite_mb:
+            return 'memoria', estimacion
+        if estimacion['disco_mb'] <= self.limite_mb:
+            return 'disco', estimacion
+        raise MemoryBudgetError(
+            f"El año {año} no cabe en {self.limite_mb:.0f} MB: se estiman "
+            f"{estimacion['memoria_mb']:.0f} MB en memoria y {estimacion['disco_mb']:.0f} MB "
+            f"en disco ({estimacion['filas_empalme']} filas x "
+            f"{estimacion['ancho_fila_bytes']} bytes por fila). Aumente el presupuesto o "
+            f"proyecte columnas (proyectar_columnas=True)."
+        )
+
+    def grupos_columnas(self, info, tipo_modulo):
+        """
+        Reparte las columnas de un módulo en grupos que caben en la
+        fracción del presupuesto (cada grupo se lee con las llaves).
+
+        Returns:
+            list: Listas de nombres limpios
+        """
+        llaves = set(KEY_COLUMNS.get(tipo_modulo, []))
+        limite = self.limite_mb * self.fraccion_grupo * 1024 ** 2 / COPIAS_PREPROCESO
+        base = info['filas'] * sum(info['columnas'].get(k, 0) for k in llaves)
+        grupos, actual, tamaño = [], [], base
+        for columna, ancho in info['columnas'].items():
+            if columna in llaves:
+                continue
+            if actual and tamaño + info['filas'] * ancho > limite:
+                grupos.append(actual)
+                actual, tamaño = [], base
+            actual.append(columna)
+            tamaño += info['filas'] * ancho
+        if actual or not grupos:
+            grupos.append(actual)
+        return grupos
+
+    def spill_module(self, loader, preprocessor, año, tipo_modulo, info, tipos=None):
+        """
+        Lee y preprocesa un módulo por grupos de columnas y vuelca cada
+        grupo a un archivo Arrow IPC.
+
+        Returns:
+            tuple: (DataFrame de llaves, {columna: archivo IPC}, columnas en
+                el orden del módulo) o None si el módulo no se pudo cargar
+        """
+        destino = self.spill_path / str(año) / tipo_modulo
+        shutil.rmtree(destino, ignore_errors=True)
+        destino.mkdir(parents=True, exist_ok=True)
+        llaves = KEY_COLUMNS.get(tipo_modulo, [])
+        grupos = self.grupos_columnas(info, tipo_modulo)
+        print(f"   {tipo_modulo}: {len(grupos)} grupos de columnas")
+
+        archivos, claves, orden = {}, None, []
+        for i, grupo in enumerate(grupos):
+            df = loader.cargar_modulo(año, tipo_modulo, grupo)
+            if df is None:
+                return None
+            df = preprocessor.preprocesar_datos(df, tipo_modulo, tipos=tipos)
+            if df is None:
+                return None
+            if claves is None:
+                claves = df[llaves].copy()
+                columnas = list(df.columns)
+            else:
+                columnas = [c for c in df.columns if c not in llaves]
+            ruta = destino / f"grupo_{i}.arrow"
+            escribir_ipc(df[columnas], ruta)
+            archivos.update({c: ruta for c in columnas})
+            orden += columnas
+            del df
+            gc.collect()
+        return claves, archivos, orden
+
+    def spill_year(self, loader, preprocessor, año, estimacion, tipos=None):
+        """
+        Procesa un año en disco: vuelca cada módulo por grupos de columnas
+        y calcula el empalme solo con las llaves.
+
+        Args:
+            estimacion (dict): Resultado de `estimate` para el año
+            tipos (callable|None): módulo -> plan de tipos (o None)
+
+        Returns:
+            SpilledMergedFrame|None: Empalme respaldado en disco, o None si
+                falta el módulo sumarias
+        """
+        claves, archivos, columnas = {}, {}, {}
+        for tipo_modulo, info in estimacion['metadata'].items():
+            resultado = self.spill_module(
+                loader, preprocessor, año, tipo_modulo, info,
+                tipos(tipo_modulo) if tipos else None
+            )
+            if resultado is None:
+                continue
+            claves[tipo_modulo], archivos[tipo_modulo], columnas[tipo_modulo] = resultado
+        if 'sumarias' not in claves:
+            print("Error: El módulo 'sumarias' es obligatorio para el empalme.")
+            return None
+        plan = ModuleJoinEngine().plan(claves, columnas)
+        del claves
+        imprimir_reporte(plan.reporte)
+        preprocessor.reporte_empalme = plan.reporte
+        merged = SpilledMergedFrame(
+            archivos, plan, self.filas_por_bloque(estimacion['ancho_fila_bytes'])
+        )
+        print(f"Empalme en disco: {merged.shape}, bloques de {merged.filas_por_bloque} filas")
+        return merged
+
+    def limpiar(self, año=None):
+        """Elimina los archivos volcados (de un año o todos)."""
+        shutil.rmtree(self.spill_path / str(año) if año is not None else self.spill_path,
+                      ignore_errors=True)
+
+
+def escribir_ipc(df, ruta):
+    """Escribe un DataFrame como archivo Arrow IPC (texto mixto como string)."""
+    try:
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for columna in df.select_dtypes(include=['object']).columns:
+            df[columna] = df[columna].astype('string')
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(str(ruta), 'wb') as f, pa.ipc.new_file(f, tabla.schema) as writer:
+        writer.write_table(tabla)
@@ -0,0 +1,308 @@
+"""
+Panel de varios años del dataset empalmado (pooling)
+
+En lugar de leer cada año con load_merged_data y unirlos con pd.concat
+(que sube los tipos que no coinciden y duplica la memoria), el panel se
+arma en dos pasos:
+
+1. Plan: con solo la metadata de Parquet (esquemas, filas y conteos de
+   nulos por row group) se decide un tipo común por columna y se reserva
+   cada columna completa para todos los años.
+2. Llenado: cada año se lee por bloques y cada bloque se copia una sola vez
+   a su tramo de las columnas reservadas. Las columnas de texto se
+   codifican contra un diccionario común a todos los años (códigos int32).
+
+El resultado se entrega como DataFrame (las columnas reservadas se usan
+sin copiarlas), como tabla Arrow o como iterador de RecordBatch.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Tipo de las columnas de texto en el panel: códigos sobre un diccionario común
+CATEGORIA = 'categoria'
+
+
+def _clase(tipo):
+    """Clase de un tipo Arrow: 'entero', 'real', 'texto' u 'otro'."""
+    if pa.types.is_dictionary(tipo):
+        tipo = tipo.value_type
+    if pa.types.is_integer(tipo) or pa.types.is_boolean(tipo):
+        return 'entero'
+    if pa.types.is_floating(tipo):
+        return 'real'
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        return 'texto'
+    return 'otro'
+
+
+def _tipo_codigos(n_categorias):
+    """Entero más chico para los códigos de n categorías (como en pandas)."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categorias < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _numpy_dtype(tipo):
+    """dtype numpy de un tipo Arrow numérico (bool cuenta como entero)."""
+    if pa.types.is_dictionary(tipo):
+        tipo = tipo.value_type
+    if pa.types.is_boolean(tipo):
+        return np.dtype(np.int8)
+    return np.dtype(tipo.to_pandas_dtype())
+
+
+class SharedDictionary:
+    """Diccionario de valores de texto común a todos los años (solo crece)."""
+
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def codigos(self, valores):
+        """Códigos globales de una lista de valores, agregando los nuevos."""
+        resultado = np.empty(len(valores), dtype=np.int32)
+        for i, valor in enumerate(valores):
+            codigo = self._codigos.get(valor)
+            if codigo is None:
+                codigo = self._codigos[valor] = len(self.valores)
+                self.valores.append(valor)
+            resultado[i] = codigo
+        return resultado
+
+    def encode(self, arreglo):
+        """
+        Códigos int32 de un arreglo Arrow (-1 = nulo). Cada valor distinto
+        del bloque se busca una sola vez en el diccionario.
+        """
+        if not pa.types.is_dictionary(arreglo.type):
+            if _clase(arreglo.type) != 'texto':
+                arreglo = pc.cast(arreglo, pa.string())
+            arreglo = pc.dictionary_encode(arreglo)
+        locales = arreglo.dictionary
+        if _clase(locales.type) != 'texto':
+            locales = pc.cast(locales, pa.string())
+        mapeo = self.codigos(locales.to_pylist())
+        indices = arreglo.indices.to_numpy(zero_copy_only=False)
+        nulos = arreglo.is_null().to_numpy(zero_copy_only=False)
+        codigos = mapeo.take(np.where(nulos, 0, indices).astype(np.int64)) if len(mapeo) else \
+            np.zeros(len(arreglo), dtype=np.int32)
+        codigos[nulos] = -1
+        return codigos
+
+
+class PooledPanel:
+    """Panel de varios años con columnas contiguas en memoria."""
+
+    def __init__(self, columnas, diccionarios, años):
+        self.columnas = columnas          # columna -> ndarray (códigos si es categoría)
+        self.diccionarios = diccionarios  # columna -> SharedDictionary
+        self.años = años                  # año -> (fila inicial, fila final)
+
+    def __len__(self):
+        return max((fin for _, fin in self.años.values()), default=0)
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columnas))
+
+    def nbytes(self):
+        """Bytes de las columnas y diccionarios del panel."""
+        diccionarios = sum(sum(len(str(v)) + 49 for v in d.valores) for d in self.diccionarios.values())
+        return sum(a.nbytes for a in self.columnas.values()) + diccionarios
+
+    def _categorical(self, columna):
+        dtype = pd.CategoricalDtype(self.diccionarios[columna].valores)
+        return pd.Categorical.from_codes(self.columnas[columna], dtype=dtype, validate=False)
+
+    def to_pandas(self):
+        """
+        DataFrame del panel. Las columnas numéricas y los códigos de las
+        categorías se usan sin copiarlos: modificar el DataFrame modifica
+        el panel.
+        """
+        datos = {
+            c: self._categorical(c) if c in self.diccionarios else valores
+            for c, valores in self.columnas.items()
+        }
+        return pd.DataFrame(datos, index=pd.RangeIndex(len(self)), copy=False)
+
+    def to_arrow(self):
+        """Tabla Arrow del panel; las columnas numéricas sin nulos no se copian."""
+        arreglos = {}
+        for c, valores in self.columnas.items():
+            if c in self.diccionarios:
+                arreglos[c] = pa.DictionaryArray.from_arrays(
+                    pa.array(valores, mask=valores < 0),
+                    pa.array(self.diccionarios[c].valores, pa.string())
+                )
+            else:
+                arreglos[c] = pa.array(valores)
+        return pa.table(arreglos)
+
+    def iter_batches(self, batch_size=131072):
+        """RecordBatch por bloques de filas (vistas de la tabla, sin copia)."""
+        yield from self.to_arrow().to_batches(max_chunksize=batch_size)
+
+
+class PooledPanelBuilder:
+    def __init__(self, storage, batch_size=131072):
+        """
+        Args:
+            storage (StorageManager): Almacenamiento del dataset empalmado
+            batch_size (int): Filas por bloque al leer cada año
+        """
+        self.storage = storage
+        self.batch_size = batch_size
+
+    def _fragmentos(self, año):
+        dataset = self.storage.merged_dataset([año])
+        return dataset, list(dataset.get_fragments()) if dataset is not None else []
+
+    def _tiene_nulos(self, fragmentos, columna):
+        """Indica si una columna tiene nulos según las estadísticas de row groups."""
+        for fragmento in fragmentos:
+            metadata = fragmento.metadata
+            nombres = metadata.schema.names
+            if columna not in nombres:
+                continue
+            j = nombres.index(columna)
+            for i in range(metadata.num_row_groups):
+                estadisticas = metadata.row_group(i).column(j).statistics
+                if estadisticas is None or not estadisticas.has_null_count or estadisticas.null_count:
+                    return True
+        return False
+
+    def _texto_numerico(self, dataset, columna, filtro):
+        """Indica si todos los valores de texto de una columna son números."""
+        valores = pc.unique(dataset.to_table(columns=[columna], filter=filtro).column(columna))
+        if pa.types.is_dictionary(valores.type):
+            valores = valores.dictionary_decode()
+        try:
+            pc.cast(valores.drop_null(), pa.float64())
+            return True
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            return False
+
+    def plan(self, años=None, columns=None, categoricas=None, filters=None):
+        """
+        Decide el tipo común de cada columna y las filas de cada año, sin
+        leer datos (salvo los valores distintos de columnas de texto que en
+        otros años son numéricas).
+
+        Reglas por columna:
+        - texto en todos los años (o pedida en `categoricas`) -> categoría
+          con diccionario común
+        - texto en unos años y número en otros -> número si todo el texto
+          es numérico; si no, categoría
+        - enteros sin nulos presentes en todos los años -> el entero más
+          ancho entre años; en otro caso float64 (nulos como NaN)
+
+        Returns:
+            dict: {'años': {año: filas}, 'tipos': {columna: dtype|'categoria'}}
+        """
+        años = años if años is not None else self.storage.list_partitioned_years()
+        filtro = self.storage._expression(filters)
+        categoricas = set(categoricas or [])
+        filas, esquemas, nulos, datasets = {}, {}, {}, {}
+        for año in años:
+            dataset, fragmentos = self._fragmentos(año)
+            if dataset is None:
+                print(f"Panel: no hay datos empalmados para {año}")
+                continue
+            datasets[año] = dataset
+            filas[año] = dataset.count_rows(filter=filtro)
+            esquemas[año] = {campo.name: campo.type for campo in dataset.schema}
+            nulos[año] = fragmentos
+
+        nombres = list(columns) if columns is not None else list(dict.fromkeys(
+            c for esquema in esquemas.values() for c in esquema
+        ))
+        tipos = {}
+        for columna in nombres:
+            por_año = {año: e[columna] for año, e in esquemas.items() if columna in e}
+            if not por_año:
+                continue
+            clases = {_clase(t) for t in por_año.values()}
+            if columna in categoricas or clases == {'texto'} or 'otro' in clases:
+                tipos[columna] = CATEGORIA
+                continue
+            if 'texto' in clases and not all(
+                self._texto_numerico(datasets[año], columna, filtro)
+                for año, t in por_año.items() if _clase(t) == 'texto'
+            ):
+                tipos[columna] = CATEGORIA
+                continue
+            completa = len(por_año) == len(esquemas)
+            sin_nulos = columna == 'año' or not any(
+                self._tiene_nulos(nulos[año], columna) for año in por_año
+            )
+            if clases <= {'entero', 'texto'} and completa and sin_nulos:
+                enteros = [_numpy_dtype(t) for t in por_año.values() if _clase(t) == 'entero']
+                if 'texto' in clases:
+                    enteros.append(np.dtype(np.int64))
+                tipos[columna] = np.result_type(*enteros)
+                if tipos[columna].kind == 'f':
+                    tipos[columna] = np.dtype(np.float64)
+            else:
+                tipos[columna] = np.dtype(np.float64)
+        return {'años': filas, 'tipos': tipos}
+
+    def build(self, años=None, columns=None, categoricas=None, filters=None):
+        """
+        Arma el panel de varios años.
+
+        Args:
+            años (list|None): Años a incluir (None = todos los guardados)
+            columns (list|None): Columnas (None = unión de todos los años)
+            categoricas (list|None): Columnas a codificar como categoría
+                aunque sean numéricas
+            filters: Expresión de pyarrow.dataset o lista [(col, op, valor)]
+
+        Returns:
+            PooledPanel
+        """
+        plan = self.plan(años, columns, categoricas, filters)
+        total = sum(plan['años'].values())
+        columnas, diccionarios = {}, {}
+        for columna, dtype in plan['tipos'].items():
+            if dtype == CATEGORIA:
+                columnas[columna] = np.full(total, -1, dtype=np.int32)
+                diccionarios[columna] = SharedDictionary()
+            elif dtype.kind == 'f':
+                columnas[columna] = np.full(total, np.nan, dtype=dtype)
+            else:
+                columnas[columna] = np.empty(total, dtype=dtype)
+
+        filtro = self.storage._expression(filters)
+        rangos, inicio = {}, 0
+        for año, n in plan['años'].items():
+            dataset = self.storage.merged_dataset([año])
+            presentes = [c for c in columnas if c in dataset.schema.names]
+            fila = inicio
+            for batch in dataset.to_batches(columns=presentes, filter=filtro, batch_size=self.batch_size):
+                fin = fila + batch.num_rows
+                for columna in presentes:
+                    arreglo = batch.column(columna)
+                    if columna in diccionarios:
+                        columnas[columna][fila:fin] = diccionarios[columna].encode(arreglo)
+                        continue
+                    if pa.types.is_dictionary(arreglo.type):
+                        arreglo = arreglo.dictionary_decode()
+                    if _clase(arreglo.type) == 'texto':
+                        arreglo = pc.cast(arreglo, pa.float64() if plan['tipos'][columna].kind == 'f'
+                                          else pa.int64())
+                    columnas[columna][fila:fin] = arreglo.to_numpy(zero_copy_only=False)
+                fila = fin
+            rangos[año] = (inicio, fila)
+            inicio = fila
+            print(f"Panel {año}: {n} filas")
+
+        # Códigos con el tipo que usaría pandas, para que to_pandas no los copie
+        for columna, diccionario in diccionarios.items():
+            dtype = _tipo_codigos(len(diccionario.valores))
+            if dtype != columnas[columna].dtype:
+                columnas[columna] = columnas[columna].astype(dtype)
+        return PooledPanel(columnas, diccionarios, rangos)
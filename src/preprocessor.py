@@ -1,10 +1,30 @@
 import pandas as pd
 import numpy as np
-from config.modules_config import KEY_COLUMNS
+from config.modules_config import KEY_COLUMNS, MISSING_CODES
+from src.dtype_plan import aplicar_plan_tipos
+from src.join_engine import ModuleJoinEngine, imprimir_reporte
+from src.lazy_frame import LazyMergedFrame
+from src.households import HouseholdTable
+
+
+def _columnas_texto(df):
+    """Columnas object o string de un DataFrame."""
+    return list(df.select_dtypes(include=['object', 'string']).columns)
+
+
+def _a_numero(valores):
+    """Convierte valores distintos a número (NaN si no se puede)."""
+    try:
+        return pd.Series(pd.to_numeric(pd.Series(valores, dtype=object), errors='coerce'))
+    except (TypeError, ValueError):
+        return None
+
 
 class ENAHOPreprocessor:
     def __init__(self):
         self.required_columns = KEY_COLUMNS
+        self.reporte_empalme = None
+        self.hogares = None
 
     def validar_modulo(self, df, tipo_modulo):
         """Valida que el DataFrame tenga las columnas clave necesarias."""
@@ -16,33 +36,135 @@ class ENAHOPreprocessor:
             return False
         return True
     
-    def preprocesar_datos(self, df, tipo_modulo):
-        """Realiza preprocesamiento específico según el tipo de módulo."""
+    def preprocesar_datos(self, df, tipo_modulo, esquema=None, tipos=None):
+        """
+        Realiza preprocesamiento específico según el tipo de módulo.
+
+        Trabaja por bloques y modifica `df` en el lugar:
+        1. Los códigos missing (999...) se enmascaran en todas las columnas
+           numéricas a la vez sobre los arreglos 2-D de cada dtype.
+        2. Cada columna de texto se codifica como diccionario (factorize); la
+           conversión a número o la normalización (strip/upper) se aplica una
+           sola vez por valor distinto.
+
+        Args:
+            esquema (dict|None): columna -> 'numerico' | 'texto' para las
+                columnas de texto. Si es None se infiere con `inferir_esquema`.
+            tipos (dict|None): Plan de tipos (columna -> dtype) que se aplica
+                al final, cuando los códigos missing ya son NaN.
+        """
         if not self.validar_modulo(df, tipo_modulo):
             return None
-        # 1. Maejo valores missing en 
-        missing_codes = [999,9999,99999,999999,9999999,99999999]
-        for col in df.select_dtypes(include=[np.number]).columns:
-            df[col] = df[col].replace(missing_codes, np.nan)
-        
-        # 2. Convertir tipos de datos si es necesario
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                try:
-                    df[col] = pd.to_numeric(df[col], errors='ignore')
-                except:
-                    pass
-        # 3. Otras transformaciones específicas del módulo
-        string_cols = df.select_dtypes(include=['object']).columns
-        for col in string_cols:
-            df[col] = df[col].str.strip().str.upper()
+        # 1. Manejo de valores missing en columnas numéricas
+        self._enmascarar_missing(df, MISSING_CODES)
+
+        # 2. Convertir tipos de datos y 3. normalizar texto
+        for col in _columnas_texto(df):
+            tipo = esquema.get(col, 'texto') if esquema is not None else None
+            df[col] = self._convertir_texto(df[col], tipo)
+
+        # 4. Tipos compactos del plan
+        if tipos:
+            aplicar_plan_tipos(df, tipos)
         return df
-    
-    def empalmar_modulos_año(self, modulos_dict):
-        """Empalma múltiples módulos de un mismo año en un solo DataFrame."""
+
+    def inferir_esquema(self, df):
+        """
+        Decide una vez por columna de texto si es numérica: lo es si todos
+        sus valores distintos no nulos se pueden convertir a número.
+
+        Returns:
+            dict: columna -> 'numerico' | 'texto'
+        """
+        esquema = {}
+        for col in _columnas_texto(df):
+            _, valores = pd.factorize(df[col])
+            numeros = _a_numero(valores)
+            esquema[col] = 'numerico' if numeros is not None and numeros.notna().all() else 'texto'
+        return esquema
+
+    def _enmascarar_missing(self, df, missing_codes):
+        """Reemplaza los códigos missing por NaN, un bloque por dtype."""
+        numericas = df.select_dtypes(include=[np.number])
+        for dtype, columnas in numericas.columns.groupby(numericas.dtypes).items():
+            if isinstance(dtype, np.dtype):
+                valores = numericas[columnas].to_numpy()
+            else:
+                # Enteros nullable: se enmascara sobre su versión float
+                valores = numericas[columnas].to_numpy(dtype=np.float64, na_value=np.nan)
+            mascara = np.isin(valores, missing_codes)
+            afectadas = mascara.any(axis=0)
+            if not afectadas.any():
+                continue
+            # Las columnas enteras con missing pasan a float, como con replace
+            bloque = valores[:, afectadas].astype(np.float64)
+            bloque[mascara[:, afectadas]] = np.nan
+            df[list(columnas[afectadas])] = bloque
+
+    def _convertir_texto(self, serie, tipo=None):
+        """
+        Convierte una columna de texto procesando cada valor distinto una vez.
+        Con tipo None la columna es numérica si todos sus valores lo son.
+        """
+        codigos, valores = pd.factorize(serie)
+        if tipo != 'texto':
+            convertidos = _a_numero(valores)
+            if convertidos is not None and (tipo == 'numerico' or convertidos.notna().all()):
+                convertidos = convertidos.to_numpy(dtype=np.float64)
+                resultado = convertidos.take(codigos)
+                resultado[codigos == -1] = np.nan
+                if not np.isnan(resultado).any() and (resultado == np.round(resultado)).all():
+                    resultado = resultado.astype(np.int64)
+                return pd.Series(resultado, index=serie.index, name=serie.name)
+
+        normalizados = np.asarray(
+            pd.Series(valores, dtype=object).str.strip().str.upper(), dtype=object
+        )
+        resultado = normalizados.take(codigos)
+        resultado[codigos == -1] = np.nan
+        return pd.Series(resultado, index=serie.index, name=serie.name, dtype=object)
+
+    def empalmar_modulos_año(self, modulos_dict, motor='pandas', liberar=False):
+        """
+        Empalma múltiples módulos de un mismo año en un solo DataFrame.
+
+        Args:
+            motor (str): 'pandas' encadena pd.merge; 'indices' codifica las
+                llaves una vez como enteros y arma el resultado en una pasada
+                (ver src/join_engine.py). El motor por índices no falla ante
+                llaves duplicadas: las reporta en `self.reporte_empalme`,
+                junto con los registros huérfanos, y usa la primera aparición.
+                'perezoso' devuelve una LazyMergedFrame: mismo plan que
+                'indices', pero cada columna se arma solo cuando se usa.
+            liberar (bool): Quitar de `modulos_dict` cada módulo en cuanto
+                se empalma, para que su memoria se libere antes del final
+                (no aplica al motor 'perezoso', que los sigue usando)
+
+        Con el empalme se arma la tabla de hogares del año
+        (`self.hogares`, ver src/households.py).
+        """
+        merged = self._empalmar(modulos_dict, motor, liberar)
+        self.hogares = HouseholdTable.desde_empalme(merged) if merged is not None else None
+        return merged
+
+    def _empalmar(self, modulos_dict, motor, liberar):
+        """Empalme de los módulos según el motor (ver empalmar_modulos_año)."""
         if 'sumarias' not in modulos_dict:
             print("Error: El módulo 'sumarias' es obligatorio para el empalme.")
             return None
+        if motor == 'perezoso':
+            merged = LazyMergedFrame(modulos_dict)
+            self.reporte_empalme = merged.reporte
+            imprimir_reporte(self.reporte_empalme)
+            print(f"Empalme perezoso: {merged.shape}")
+            return merged
+        if motor == 'indices':
+            merged, self.reporte_empalme = ModuleJoinEngine().join(modulos_dict)
+            if liberar:
+                modulos_dict.clear()
+            imprimir_reporte(self.reporte_empalme)
+            print(f"Empalme por índices: {merged.shape}")
+            return merged
         #1. Unir vivienda con sumarias (nivel hogar)
         merged = pd.merge(
             modulos_dict['sumarias'],
@@ -52,6 +174,9 @@ class ENAHOPreprocessor:
             validate='1:1',
             suffixes=('_sum', '_viv')
         )
+        if liberar:
+            modulos_dict.pop('sumarias')
+            modulos_dict.pop('vivienda')
 
         # Rename factor columns to match config
         factor_mapping = {
@@ -79,6 +204,8 @@ class ENAHOPreprocessor:
                 validate='m:1',
                 suffixes=('_per', '')
             )
+            if liberar:
+                modulos_dict.pop('personas')
             print(f"Merge personas: {merged.shape}")
 
         #3. Unir módulos adicionales (educacion, empleo_ingresos)
@@ -92,6 +219,8 @@ class ENAHOPreprocessor:
                     validate='1:1',
                     suffixes=('', suffix)
                 )
+                if liberar:
+                    modulos_dict.pop(mod)
                 print(f"Merge {mod}: {merged.shape}")
         return merged
            
@@ -0,0 +1,405 @@
+"""
+Instrumentación por etapas del pipeline ENAHO
+
+Cada etapa (y cada módulo dentro de ella) se registra como un span con
+tiempo de reloj, tiempo de CPU, RSS al inicio y al final, pico de RSS
+durante el span (muestreado por un hilo), filas/columnas de entrada y
+salida y bytes leídos/escritos. Los spans se escriben como líneas JSON y
+como traza en formato Chrome Trace Event (se abre en chrome://tracing,
+Perfetto o speedscope).
+
+Sin perfilado, el pipeline usa NullProfiler: mismos métodos, sin registrar
+spans ni muestrear RSS.
+
+Opcionalmente una sola etapa se perfila con cProfile (archivo .prof para
+pstats/snakeviz) o con tracemalloc (líneas que más memoria asignan).
+"""
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MODOS_PERFIL = ('cprofile', 'tracemalloc')
+
+# Segundos entre muestras de RSS mientras hay spans abiertos
+INTERVALO_MUESTREO = 0.05
+
+
+def rss_mb():
+    """RSS actual del proceso en MB (None si no se puede medir)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        return pico_rss_mb()
+
+
+def pico_rss_mb():
+    """Pico de RSS del proceso en MB (None si no se puede medir)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB y macOS bytes
+    return pico / 1024 ** 2 if os.uname().sysname == 'Darwin' else pico / 1024
+
+
+def tamano_bytes(ruta):
+    """Tamaño en bytes de un archivo o de una carpeta (recursivo)."""
+    ruta = Path(ruta)
+    if ruta.is_file():
+        return ruta.stat().st_size
+    if ruta.is_dir():
+        return sum(f.stat().st_size for f in ruta.rglob('*') if f.is_file())
+    return 0
+
+
+def _forma(datos):
+    """(filas, columnas) de un DataFrame, o sumadas para un dict de DataFrames."""
+    if datos is None:
+        return None, None
+    if isinstance(datos, dict):
+        formas = [_forma(d) for d in datos.values() if d is not None]
+        return sum(f[0] for f in formas), sum(f[1] for f in formas)
+    if hasattr(datos, 'shape'):
+        return int(datos.shape[0]), int(datos.shape[1])
+    return len(datos), None
+
+
+class Span:
+    """Registro de una etapa en curso; el código instrumentado completa sus datos."""
+
+    def __init__(self, nombre, categoria, padre, atributos):
+        self.nombre = nombre
+        self.categoria = categoria
+        self.padre = padre
+        self.atributos = dict(atributos)
+        self.filas_entrada = self.columnas_entrada = None
+        self.filas_salida = self.columnas_salida = None
+        self.bytes_leidos = 0
+        self.bytes_escritos = 0
+
+    def entrada(self, datos):
+        """Registra las filas y columnas de entrada (DataFrame o dict de DataFrames)."""
+        self.filas_entrada, self.columnas_entrada = _forma(datos)
+
+    def salida(self, datos):
+        """Registra las filas y columnas de salida (DataFrame o dict de DataFrames)."""
+        self.filas_salida, self.columnas_salida = _forma(datos)
+
+    def leido(self, ruta=None, n_bytes=None):
+        self.bytes_leidos += n_bytes if n_bytes is not None else tamano_bytes(ruta)
+
+    def escrito(self, ruta=None, n_bytes=None):
+        self.bytes_escritos += n_bytes if n_bytes is not None else tamano_bytes(ruta)
+
+
+class MuestreadorRSS:
+    """
+    Pico de RSS de cada span abierto. Un hilo lee el RSS actual cada
+    `intervalo` segundos mientras haya spans abiertos, de modo que el pico
+    es el de la etapa aunque no supere el pico de toda la vida del proceso
+    (que es lo único que da ru_maxrss).
+    """
+
+    def __init__(self, intervalo=INTERVALO_MUESTREO):
+        self.intervalo = intervalo
+        self._picos = {}
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        """Abre la medición de un span y devuelve su identificador."""
+        rss = rss_mb()
+        with self._lock:
+            token = object()
+            self._picos[token] = rss
+            if self._hilo is None:
+                self._detener = threading.Event()
+                self._hilo = threading.Thread(target=self._muestrear, args=(self._detener,),
+                                              name='muestreo-rss', daemon=True)
+                self._hilo.start()
+        return token
+
+    def terminar(self, token):
+        """Cierra la medición de un span y devuelve su pico de RSS en MB."""
+        self._actualizar(rss_mb())
+        with self._lock:
+            pico = self._picos.pop(token)
+            if not self._picos and self._hilo is not None:
+                self._detener.set()
+                self._hilo = None
+        return pico
+
+    def _actualizar(self, rss):
+        if rss is None:
+            return
+        with self._lock:
+            for token, pico in self._picos.items():
+                if pico is None or rss > pico:
+                    self._picos[token] = rss
+
+    def _muestrear(self, detener):
+        while not detener.wait(self.intervalo):
+            self._actualizar(rss_mb())
+
+
+class PipelineProfiler:
+    def __init__(self, jsonl_path=None, trace_path=None, perfilar=None, modo='cprofile',
+                 perfiles_path=None):
+        """
+        Args:
+            jsonl_path (str|Path|None): Archivo donde se agrega un JSON por span
+            trace_path (str|Path|None): Archivo de traza (Chrome Trace Event)
+            perfilar (str|None): Nombre de la etapa a perfilar (p. ej. 'empalme')
+            modo (str): 'cprofile' o 'tracemalloc'
+            perfiles_path (str|Path|None): Carpeta de los perfiles (por
+                defecto la de jsonl_path o trace_path, o el directorio actual)
+        """
+        if modo not in MODOS_PERFIL:
+            raise ValueError(f"Modo '{modo}' no soportado; use uno de {MODOS_PERFIL}")
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.perfilar = perfilar
+        self.modo = modo
+        referencia = self.jsonl_path or self.trace_path
+        self.perfiles_path = Path(perfiles_path) if perfiles_path else (
+            referencia.parent if referencia else Path('.')
+        )
+        self.spans = []
+        self._pila = threading.local()
+        self._muestreador = MuestreadorRSS()
+        self._origen = time.time()
+
+    def __getstate__(self):
+        # La pila de spans abiertos y el muestreo de RSS son propios de cada
+        # hilo y proceso
+        estado = self.__dict__.copy()
+        estado.pop('_pila')
+        estado.pop('_muestreador')
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._pila = threading.local()
+        self._muestreador = MuestreadorRSS()
+
+    def _actual(self):
+        pila = getattr(self._pila, 'spans', None)
+        if pila is None:
+            pila = self._pila.spans = []
+        return pila
+
+    @contextmanager
+    def span(self, nombre, categoria='etapa', **atributos):
+        """
+        Mide un bloque de código.
+
+        Uso:
+            with profiler.span('empalme', año=2024) as span:
+                span.entrada(modulos)
+                ...
+                span.salida(resultado)
+        """
+        pila = self._actual()
+        span = Span(nombre, categoria, pila[-1].nombre if pila else None, atributos)
+        pila.append(span)
+        perfil = self._iniciar_perfil(nombre)
+
+        inicio_ts = time.time()
+        inicio, cpu = time.perf_counter(), time.process_time()
+        rss_inicio = rss_mb()
+        muestreo = self._muestreador.iniciar()
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            registro = {
+                'nombre': nombre,
+                'categoria': categoria,
+                'padre': span.padre,
+                'inicio': inicio_ts,
+                'segundos': time.perf_counter() - inicio,
+                'cpu_segundos': time.process_time() - cpu,
+                'rss_inicio_mb': rss_inicio,
+                'rss_fin_mb': rss_mb(),
+                'pico_rss_mb': None,
+                'pico_rss_delta_mb': None,
+                'filas_entrada': span.filas_entrada,
+                'columnas_entrada': span.columnas_entrada,
+                'filas_salida': span.filas_salida,
+                'columnas_salida': span.columnas_salida,
+                'bytes_leidos': span.bytes_leidos,
+                'bytes_escritos': span.bytes_escritos,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'error': error,
+                'atributos': span.atributos
+            }
+            # Pico durante el span y cuánto supera al RSS con que empezó
+            pico = self._muestreador.terminar(muestreo)
+            registro['pico_rss_mb'] = pico
+            if pico is not None and rss_inicio is not None:
+                registro['pico_rss_delta_mb'] = pico - rss_inicio
+            self._terminar_perfil(perfil, nombre, registro)
+            pila.pop()
+            self.registrar(registro)
+
+    def registrar(self, registro):
+        """Guarda un span (propio o de un proceso hijo) y lo escribe en el JSONL."""
+        self.spans.append(registro)
+        if self.jsonl_path is not None:
+            self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+
+    def _iniciar_perfil(self, nombre):
+        if nombre != self.perfilar:
+            return None
+        if self.modo == 'cprofile':
+            perfil = cProfile.Profile()
+            perfil.enable()
+            return perfil
+        ya_activo = tracemalloc.is_tracing()
+        if not ya_activo:
+            tracemalloc.start(25)
+        return (tracemalloc.take_snapshot(), ya_activo)
+
+    def _terminar_perfil(self, perfil, nombre, registro):
+        if perfil is None:
+            return
+        self.perfiles_path.mkdir(parents=True, exist_ok=True)
+        sufijo = f"{nombre}_{os.getpid()}_{int(registro['inicio'])}"
+        if self.modo == 'cprofile':
+            perfil.disable()
+            ruta = self.perfiles_path / f"perfil_{sufijo}.prof"
+            perfil.dump_stats(str(ruta))
+            print(f"Perfil de '{nombre}' (cProfile) en {ruta}")
+            pstats.Stats(perfil).sort_stats('cumulative').print_stats(15)
+        else:
+            inicial, ya_activo = perfil
+            final = tracemalloc.take_snapshot()
+            registro['tracemalloc_pico_mb'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            if not ya_activo:
+                tracemalloc.stop()
+            estadisticas = final.compare_to(inicial, 'lineno')
+            ruta = self.perfiles_path / f"memoria_{sufijo}.txt"
+            with open(ruta, 'w', encoding='utf-8') as f:
+                for estadistica in estadisticas[:50]:
+                    f.write(f"{estadistica}\n")
+            print(f"Perfil de memoria de '{nombre}' (tracemalloc) en {ruta}")
+            for estadistica in estadisticas[:10]:
+                print(f"   {estadistica}")
+        registro['perfil'] = str(ruta)
+
+    def spans_año(self, año=None):
+        """Spans de un año (todos si `año` es None)."""
+        if año is None:
+            return list(self.spans)
+        return [s for s in self.spans if s.get('atributos', {}).get('año') == año]
+
+    def trace_events(self, año=None):
+        """Spans (de un año o todos) como eventos completos ('X') de Chrome Trace Event."""
+
+        eventos = []
+        for s in self.spans_año(año):
+            args = {k: v for k, v in s.items()
+                    if k not in ('nombre', 'categoria', 'inicio', 'segundos', 'pid', 'tid', 'atributos')
+                    and v is not None}
+            args.update(s.get('atributos', {}))
+            eventos.append({
+                'name': s['nombre'],
+                'cat': s['categoria'],
+                'ph': 'X',
+                'ts': round((s['inicio'] - self._origen) * 1e6),
+                'dur': round(s['segundos'] * 1e6),
+                'pid': s['pid'],
+                'tid': s['tid'],
+                'args': args
+            })
+        return eventos
+
+    def write_trace(self, path=None, año=None):
+        """
+        Escribe la traza de los spans de un año (de todos si `año` es None).
+
+        Returns:
+            Path|None: Archivo escrito
+        """
+        path = Path(path) if path else self.trace_path
+        if path is None:
+            return None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.trace_events(año), 'displayTimeUnit': 'ms'}, f,
+                      ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+    def resumen(self, categoria=None):
+        """Spans como DataFrame (opcionalmente de una categoría)."""
+        spans = [s for s in self.spans if categoria is None or s['categoria'] == categoria]
+        columnas = ['nombre', 'categoria', 'padre', 'segundos', 'cpu_segundos', 'rss_fin_mb',
+                    'pico_rss_mb', 'pico_rss_delta_mb', 'filas_entrada', 'filas_salida', 'columnas_salida',
+                    'bytes_leidos', 'bytes_escritos']
+        return pd.DataFrame(spans, columns=columnas + ['atributos'])[columnas]
+
+    def imprimir_resumen(self, padre):
+        """Imprime los spans hijos directos de `padre` del proceso actual."""
+        hijos = [s for s in self.spans if s['padre'] == padre and s['pid'] == os.getpid()]
+        for s in hijos:
+            pico = s['pico_rss_delta_mb']
+            print(f"   {s['nombre']:<22}{s['segundos']:>8.2f} s  CPU {s['cpu_segundos']:>7.2f} s"
+                  + (f"  +{pico:.0f} MB pico RSS" if pico else ""))
+
+
+class NullProfiler:
+    """
+    Perfilador que no registra nada, para corridas sin perfilado: los spans
+    solo dan un Span para que el código instrumentado lo complete.
+    """
+
+    jsonl_path = None
+    trace_path = None
+
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def span(self, nombre, categoria='etapa', **atributos):
+        yield Span(nombre, categoria, None, atributos)
+
+    def registrar(self, registro):
+        pass
+
+    def spans_año(self, año=None):
+        return []
+
+    def trace_events(self, año=None):
+        return []
+
+
+    def write_trace(self, path=None, año=None):
+        return None
+
+    def resumen(self, categoria=None):
+        return PipelineProfiler().resumen(categoria)
+
+    def imprimir_resumen(self, padre):
+        pass
@@ -0,0 +1,197 @@
+"""
+Caché Parquet de módulos crudos ENAHO (.dta)
+
+Cada módulo se convierte una sola vez a Parquet. Las entradas se identifican
+por la huella del .dta (ruta, tamaño y mtime, o hash del contenido), de modo
+que un archivo modificado invalida su entrada automáticamente.
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.fingerprints import file_fingerprint
+
+
+class RawModuleCache:
+    def __init__(self, cache_path, max_size_mb=20000, content_hash=False):
+        """
+        Inicializa la caché de módulos crudos.
+
+        Args:
+            cache_path (str|Path): Carpeta donde se guardan las entradas
+            max_size_mb (float): Tamaño máximo de la caché; al superarlo se
+                eliminan las entradas usadas hace más tiempo
+            content_hash (bool): Identificar archivos por hash del contenido
+                en lugar de tamaño y fecha de modificación
+        """
+        self.cache_path = Path(cache_path)
+        self.max_size_mb = max_size_mb
+        self.content_hash = content_hash
+        self.hits = 0
+        self.misses = 0
+        # (ruta, tamaño, mtime_ns) -> clave, para no volver a leer el
+        # archivo completo en cada consulta cuando content_hash=True
+        self._claves = {}
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+
+    def _clave(self, ruta_archivo):
+        """Huella de un .dta, calculada una vez por versión del archivo."""
+        ruta = Path(ruta_archivo).resolve()
+        stat = ruta.stat()
+        llave = (str(ruta), stat.st_size, stat.st_mtime_ns)
+        if llave not in self._claves:
+            self._claves[llave] = file_fingerprint(ruta, self.content_hash)["clave"]
+        return self._claves[llave]
+
+    def entry_path(self, ruta_archivo, tipo_modulo, año):
+        """Ruta de la entrada de caché que corresponde a un .dta."""
+        clave = self._clave(ruta_archivo)
+        return self.cache_path / f"{tipo_modulo}_{año}_{clave[:16]}.parquet"
+
+
+    def columns(self, ruta_archivo, tipo_modulo, año):
+        """
+        Columnas originales de una entrada, leyendo solo el esquema.
+
+        Returns:
+            list|None: Nombres de columnas o None si no hay entrada
+        """
+        path = self.entry_path(ruta_archivo, tipo_modulo, año)
+        if not path.exists():
+            return None
+        return pq.read_schema(path).names
+
+    def get(self, ruta_archivo, tipo_modulo, año, columns=None):
+        """
+        Lee una entrada de la caché con memory-map.
+
+        Args:
+            columns (list|None): Columnas originales a leer (None = todas)
+
+        Returns:
+            DataFrame|None: Datos del módulo o None si no hay entrada
+        """
+        path = self.entry_path(ruta_archivo, tipo_modulo, año)
+        if not path.exists():
+            self.misses += 1
+            return None
+
+        tabla = pq.read_table(path, columns=columns, memory_map=True)
+        os.utime(path)  # marca de uso para la expulsión LRU
+        self.hits += 1
+        return tabla.to_pandas()
+
+    def iter_batches(self, ruta_archivo, tipo_modulo, año, columns=None, batch_size=100000):
+        """
+        Lee una entrada por bloques de filas con memory-map.
+
+        Returns:
+            generator|None: DataFrames por bloque, o None si no hay entrada
+        """
+        path = self.entry_path(ruta_archivo, tipo_modulo, año)
+        if not path.exists():
+            self.misses += 1
+            return None
+
+        archivo = pq.ParquetFile(path, memory_map=True)
+        os.utime(path)
+        self.hits += 1
+        return (lote.to_pandas() for lote in archivo.iter_batches(batch_size=batch_size, columns=columns))
+
+    def put(self, ruta_archivo, tipo_modulo, año, df):
+        """
+        Guarda un módulo crudo en la caché y reemplaza entradas antiguas
+        del mismo módulo y año.
+
+        Returns:
+            Path|None: Ruta de la entrada o None si no se pudo convertir
+        """
+        path = self.entry_path(ruta_archivo, tipo_modulo, año)
+        try:
+            tabla = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"No se pudo cachear {tipo_modulo} {año}: {e}")
+            return None
+
+        # Escritura atómica: varios procesos pueden poblar la caché a la vez
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        pq.write_table(tabla, tmp_path, compression='snappy')
+        os.replace(tmp_path, path)
+
+        for antigua in self.cache_path.glob(f"{tipo_modulo}_{año}_*.parquet"):
+            if antigua != path:
+                antigua.unlink(missing_ok=True)
+
+        self._evict(keep=path)
+        return path
+
+    def size_mb(self):
+        """Tamaño total de la caché en MB."""
+        return sum(f.stat().st_size for f in self.cache_path.glob("*.parquet")) / (1024 * 1024)
+
+    def _evict(self, keep=None):
+        """Elimina las entradas menos usadas hasta respetar el tamaño máximo."""
+        entradas = sorted(self.cache_path.glob("*.parquet"), key=lambda f: f.stat().st_mtime)
+        total = sum(f.stat().st_size for f in entradas)
+        limite = self.max_size_mb * 1024 * 1024
+
+        for entrada in entradas:
+            if total <= limite:
+                break
+            if entrada == keep:
+                continue
+            total -= entrada.stat().st_size
+            entrada.unlink(missing_ok=True)
+            print(f"Caché: expulsada {entrada.name}")
+
+    def invalidate(self, año=None, tipo_modulo=None):
+        """
+        Elimina entradas de la caché.
+
+        Args:
+            año (int|None): Solo entradas de este año
+            tipo_modulo (str|None): Solo entradas de este módulo
+
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        patron = f"{tipo_modulo or '*'}_{año or '*'}_*.parquet"
+        eliminadas = 0
+        for entrada in self.cache_path.glob(patron):
+            entrada.unlink(missing_ok=True)
+            eliminadas += 1
+        return eliminadas
+
+    def stats(self):
+        """Contadores de aciertos y fallos de la caché."""
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def main(argv=None):
+    """Comando de mantenimiento de la caché."""
+    parser = argparse.ArgumentParser(description="Caché Parquet de módulos crudos ENAHO")
+    parser.add_argument("cache_path", help="Carpeta de la caché")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    invalidar = sub.add_parser("invalidar", help="Eliminar entradas de la caché")
+    invalidar.add_argument("--año", type=int, default=None)
+    invalidar.add_argument("--modulo", default=None)
+    sub.add_parser("info", help="Mostrar tamaño de la caché")
+
+    args = parser.parse_args(argv)
+    cache = RawModuleCache(args.cache_path)
+
+    if args.comando == "invalidar":
+        eliminadas = cache.invalidate(args.año, args.modulo)
+        print(f"{eliminadas} entradas eliminadas de {cache.cache_path}")
+    else:
+        entradas = len(list(cache.cache_path.glob("*.parquet")))
+        print(f"{entradas} entradas, {cache.size_mb():.2f} MB en {cache.cache_path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Varianza por réplicas (bootstrap y jackknife) para indicadores declarados
+
+Las réplicas se definen con factores por conglomerado (matriz PSU x R):
+
+    bootstrap  Rao-Wu: en cada estrato con n_h conglomerados se sortean
+               n_h - 1 con reemplazo; factor = veces elegido * n_h / (n_h - 1)
+    jackknife  JKn: una réplica por conglomerado, que se elimina (factor 0)
+               y los demás de su estrato se reescalan por n_h / (n_h - 1)
+
+El peso de réplica de una fila es factor07_* x factor de su conglomerado.
+Como toda agregación ponderada es lineal en los pesos, los totales de las
+R réplicas por grupo salen de una multiplicación de matrices:
+
+    (grupos x conglomerados) @ (conglomerados x réplicas)
+
+en lugar de recalcular cada indicador R veces. En jackknife la matriz de
+factores es diagonal por bloques de estrato y no se arma: la réplica que
+elimina el conglomerado e del estrato h es
+
+    T_g + (s_h - 1) * T_gh - s_h * t_ge,    s_h = n_h / (n_h - 1)
+
+con T_g el total del grupo, T_gh su total en el estrato y t_ge su total en
+el conglomerado. Las réplicas y su varianza se calculan por bloques de
+grupos que respetan un presupuesto de memoria, y los bloques se reparten
+entre hilos (numpy libera el GIL en la multiplicación).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.groupby_engine import GroupByEngine
+
+METODOS_REPLICA = ('bootstrap', 'jackknife')
+
+
+class ReplicateDesign:
+    def __init__(self, data, method='bootstrap', replicates=200, strata='estrato',
+                 psu='conglome', seed=None, engine=None, memoria_mb=512, workers=None):
+        """
+        Args:
+            data (DataFrame|LazyMergedFrame): Datos a nivel de registro
+            method (str): 'bootstrap' o 'jackknife'
+            replicates (int): Número de réplicas bootstrap (en jackknife hay
+                una por conglomerado de estratos con más de uno)
+            strata, psu (str): Columnas de estrato y conglomerado
+            seed (int|None): Semilla del sorteo bootstrap
+            engine (GroupByEngine|None): Motor de agregación a compartir
+            memoria_mb (float): Memoria máxima de cada bloque de grupos
+                (producto y réplicas del bloque)
+            workers (int|None): Hilos para los bloques (None = núcleos)
+        """
+        if method not in METODOS_REPLICA:
+            raise ValueError(f"Método '{method}' no soportado; use uno de {METODOS_REPLICA}")
+        self.data = data
+        self.method = method
+        self.engine = engine or GroupByEngine(data)
+        self.memoria_mb = memoria_mb
+        self.workers = workers or os.cpu_count() or 1
+
+        unidades = self.engine.group_codes([strata, psu])
+        self.psu_codes = unidades.codes
+        self.n_psu = unidades.n_groups
+        self.psu_strata = unidades.key_codes[:, 0]
+        self.n_strata = len(unidades.key_uniques[0])
+        self.psu_por_estrato = np.bincount(self.psu_strata, minlength=self.n_strata)
+
+        if method == 'bootstrap':
+            self.factors, self.coef = self._bootstrap(replicates, np.random.default_rng(seed))
+        else:
+            self.factors = None
+            self.coef = self._jackknife()
+        self.n_replicates = len(self.coef)
+
+    def _bootstrap(self, replicates, rng):
+        """Factores Rao-Wu (PSU x R) y coeficientes de varianza."""
+        factors = np.ones((self.n_psu, replicates))
+        for h, n_h in enumerate(self.psu_por_estrato):
+            if n_h < 2:
+                continue
+            miembros = np.flatnonzero(self.psu_strata == h)
+            conteos = rng.multinomial(n_h - 1, np.full(n_h, 1.0 / n_h), size=replicates)
+            factors[miembros] = conteos.T * (n_h / (n_h - 1))
+        return factors, np.full(replicates, 1.0 / replicates)
+
+    def _jackknife(self):
+        """
+        Réplicas JKn: una por conglomerado de estratos con más de uno.
+        Guarda el conglomerado eliminado en cada réplica, la réplica de cada
+        conglomerado (-1 si no se elimina) y el reescalamiento s_h.
+
+        Returns:
+            ndarray: Coeficientes de varianza
+        """
+        n_h = self.psu_por_estrato[self.psu_strata]
+        self.eliminados = np.flatnonzero(n_h > 1)
+        self.replica_psu = np.full(self.n_psu, -1, dtype=np.int64)
+        self.replica_psu[self.eliminados] = np.arange(len(self.eliminados))
+        self.escala = n_h / np.maximum(n_h - 1, 1)
+        return (n_h[self.eliminados] - 1) / n_h[self.eliminados]
+
+    def _celdas(self, codes, valores):
+        """
+        Totales por (grupo, conglomerado) de valores ya ponderados (w * y),
+        solo de las celdas presentes y ordenados por grupo.
+
+        Returns:
+            tuple: (grupo, conglomerado, total) por celda
+        """
+        incluir = (codes >= 0) & (self.psu_codes >= 0) & ~np.isnan(valores)
+        celda = codes[incluir] * self.n_psu + self.psu_codes[incluir]
+        celdas, inversa = np.unique(celda, return_inverse=True)
+        totales = np.bincount(inversa, weights=valores[incluir])
+        return celdas // self.n_psu, celdas % self.n_psu, totales
+
+    def _replicas(self, celdas, grupos):
+        """
+        Totales de réplica de algunos grupos.
+
+        Args:
+            celdas (tuple): Resultado de _celdas
+            grupos (ndarray): Grupos pedidos (en cualquier orden, con repetidos)
+
+        Returns:
+            ndarray: len(grupos) x réplicas
+        """
+        grupo, psu, totales = celdas
+        unicos, inversa = np.unique(grupos, return_inverse=True)
+        inicio = np.searchsorted(grupo, unicos, side='left')
+        fin = np.searchsorted(grupo, unicos, side='right')
+        largos = fin - inicio
+        # Celdas de los grupos pedidos (rangos contiguos porque están ordenadas)
+        posiciones = np.repeat(fin - largos.cumsum(), largos) + np.arange(largos.sum())
+        fila = np.repeat(np.arange(len(unicos)), largos)
+        psu, totales = psu[posiciones], totales[posiciones]
+
+        if self.method == 'bootstrap':
+            matriz = np.zeros((len(unicos), self.n_psu))
+            matriz[fila, psu] = totales
+            replicas = matriz @ self.factors
+        else:
+            total = np.bincount(fila, weights=totales, minlength=len(unicos))
+            por_estrato = np.bincount(
+                fila * self.n_strata + self.psu_strata[psu], weights=totales,
+                minlength=len(unicos) * self.n_strata
+            ).reshape(len(unicos), self.n_strata)
+            escala = self.escala[self.eliminados]
+            replicas = por_estrato[:, self.psu_strata[self.eliminados]]
+            replicas *= escala - 1
+            replicas += total[:, None]
+            replica = self.replica_psu[psu]
+            quitar = replica >= 0
+            replicas[fila[quitar], replica[quitar]] -= escala[replica[quitar]] * totales[quitar]
+        return replicas[inversa]
+
+    def _grupos_por_bloque(self):
+        """Grupos por bloque según memoria_mb: producto más réplicas del bloque."""
+        ancho = self.n_psu if self.method == 'bootstrap' else self.n_strata + self.n_replicates
+        # Réplicas del numerador, del denominador y el temporal de la varianza
+        ancho += 3 * self.n_replicates
+        return max(1, int(self.memoria_mb * 1024 * 1024 // (8 * ancho)))
+
+    def _por_bloques(self, funcion, n_grupos):
+        """Llama funcion(slice) por bloques de grupos, repartidos entre hilos."""
+        por_bloque = self._grupos_por_bloque()
+        bloques = [slice(i, min(i + por_bloque, n_grupos)) for i in range(0, n_grupos, por_bloque)]
+        if self.workers > 1 and len(bloques) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                list(executor.map(funcion, bloques))
+        else:
+            for bloque in bloques:
+                funcion(bloque)
+
+
+    def variance(self, estimacion, replicas):
+        """Varianza por grupo a partir de la estimación y sus réplicas."""
+        with np.errstate(invalid='ignore'):
+            return ((replicas - estimacion[:, None]) ** 2) @ self.coef
+
+    def _ponderado(self, valores, pesos):
+        """w * y con NaN si falta alguno (como en GroupByEngine._sum)."""
+        if valores is None:
+            return pesos
+        return valores * pesos
+
+    def evaluate(self, spec):
+        """
+        Calcula un indicador declarado con su error estándar por réplicas.
+
+        Las agregaciones ponderadas ('sum', 'mean', 'ratio' con weight)
+        reciben una columna '{nombre}_se'; las demás no tienen varianza
+        de diseño y se devuelven sin error estándar.
+
+        Returns:
+            DataFrame|None: Resultado del indicador con columnas _se
+        """
+        if not self.engine.available(spec):
+            return None
+        salida, grupos, codes, seleccion = self.engine.evaluate_groups(spec)
+
+        for nombre, agg in spec.aggregations.items():
+            if agg.weight is None or agg.how not in ('sum', 'mean', 'ratio'):
+                continue
+            valores = self.engine.values(agg.column, spec) if agg.column else None
+            pesos = self.engine.values(agg.weight)
+            numerador = self._celdas(codes, self._ponderado(valores, pesos))
+
+            # Denominador de cada grupo de salida: sus celdas y su grupo
+            if agg.how == 'mean':
+                denominador = self._celdas(codes, np.where(np.isnan(valores), np.nan, pesos))
+                grupo_den = seleccion
+            elif agg.how == 'ratio':
+                den = self.engine.group_codes(list(agg.denominator_keys or spec.keys))
+                filtrado = spec.filter is not None or spec.filters
+                den_codes = np.where(codes >= 0, den.codes, -1) if filtrado else den.codes
+                den_valores = self.engine.values(agg.denominator, spec) if agg.denominator else None
+                denominador = self._celdas(den_codes, self._ponderado(den_valores, pesos))
+                grupo_den = self.engine.parent_groups(grupos, den)[seleccion]
+            else:
+                denominador = None
+
+            estimacion = salida[nombre].to_numpy(dtype=np.float64)
+            se = np.empty(len(seleccion))
+
+            def bloque(filas):
+                replicas = self._replicas(numerador, seleccion[filas])
+                if denominador is not None:
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        replicas /= self._replicas(denominador, grupo_den[filas])
+                replicas *= agg.scale
+                se[filas] = np.sqrt(self.variance(estimacion[filas], replicas))
+
+            self._por_bloques(bloque, len(seleccion))
+            salida[f'{nombre}_se'] = se
+        return salida
+
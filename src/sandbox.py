@@ -0,0 +1,230 @@
+"""
+Ejecución aislada y en paralelo de indicadores con función
+
+Cada indicador corre en su propio proceso hijo (como máximo `workers` a la
+vez). Los datos se escriben una sola vez como archivo Arrow IPC en memoria
+compartida (/dev/shm si tiene espacio) y cada hijo lo abre con memory_map en
+modo solo lectura: no se envían copias serializadas y cada indicador copia
+solo sus columnas, de modo que puede modificarlas sin afectar a los demás.
+Por indicador se aplica un tiempo máximo (el hijo se termina) y un límite de
+memoria (RLIMIT_AS, solo en POSIX), y se reporta el tiempo de carga, de
+cálculo y la memoria pico.
+
+Los hijos se crean con fork cuando existe, de modo que las funciones
+cargadas con load_custom_indicators (o registradas en el proceso) están
+disponibles sin importarlas; con spawn (Windows) las funciones deben poder
+importarse por nombre.
+"""
+import multiprocessing as mp
+import multiprocessing.connection
+import os
+import shutil
+import tempfile
+import time
+import traceback
+import uuid
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from src.memory_budget import escribir_ipc
+
+
+def directorio_compartido(n_bytes=0):
+    """
+    Directorio en memoria compartida para los datos, si tiene espacio libre
+    para `n_bytes` (en Docker /dev/shm suele tener solo 64 MB); si no, el
+    directorio temporal.
+    """
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK) and shutil.disk_usage(shm).free > n_bytes:
+        return shm
+    if shm.is_dir():
+        print(f"Aislamiento: /dev/shm sin espacio para {n_bytes / 2**20:.0f} MB, "
+              "se usa el directorio temporal")
+    return Path(tempfile.gettempdir())
+
+
+def _memoria_virtual():
+    """Memoria virtual actual del proceso en bytes (None si no se puede leer)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _limitar_memoria(memoria_mb):
+    """
+    Limita la memoria virtual del proceso a la actual más `memoria_mb`
+    (el archivo mapeado y las librerías ya cargadas no cuentan al límite).
+    """
+    if memoria_mb is None or resource is None:
+        return
+    base = _memoria_virtual()
+    if base is None:
+        return
+    limite = base + int(memoria_mb * 2**20)
+    _, maximo = resource.getrlimit(resource.RLIMIT_AS)
+    if maximo != resource.RLIM_INFINITY:
+        limite = min(limite, maximo)
+    resource.setrlimit(resource.RLIMIT_AS, (limite, maximo))
+
+
+def _memoria_pico_mb():
+    """Memoria residente pico del proceso en MB (None si no se puede leer)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _ejecutar(conexion, ruta, funcion, columnas, filtros, kwargs, memoria_mb):
+    """Proceso hijo: lee sus columnas del archivo compartido y calcula."""
+    inicio = time.perf_counter()
+    try:
+        tabla = pa.ipc.open_file(pa.memory_map(ruta, 'r')).read_all()
+        _limitar_memoria(memoria_mb)
+        datos = tabla.select([c for c in columnas if c in tabla.column_names]).to_pandas(split_blocks=True)
+        # Las columnas mapeadas son de solo lectura: el indicador recibe una
+        # copia privada (cuenta para su límite de memoria) que puede modificar
+        if filtros:
+            mascara = np.ones(tabla.num_rows, dtype=bool)
+            for nombre in filtros:
+                mascara &= tabla.column(nombre).fill_null(False).to_numpy().astype(bool)
+            datos = datos[mascara].reset_index(drop=True)
+        else:
+            datos = datos.copy()
+        carga = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resultado = funcion(datos, **kwargs)
+        calculo = time.perf_counter() - inicio
+        conexion.send(('ok', resultado, {'carga_s': carga, 'calculo_s': calculo,
+                                         'memoria_pico_mb': _memoria_pico_mb()}))
+    except MemoryError as e:
+        conexion.send(('memoria', None, {'error': f"límite de memoria excedido ({e})",
+                                         'memoria_pico_mb': _memoria_pico_mb()}))
+    except Exception as e:
+        ultima = traceback.format_exc().strip().splitlines()[-1]
+        conexion.send(('error', None, {'error': f"{type(e).__name__}: {e}" if str(e) else ultima}))
+    finally:
+        conexion.close()
+
+
+class SandboxedRunner:
+    def __init__(self, workers=2, timeout=None, memoria_mb=None, directorio=None):
+        """
+        Args:
+            workers (int): Indicadores calculados a la vez (procesos)
+            timeout (float|None): Segundos máximos por indicador
+            memoria_mb (float|None): Memoria máxima por indicador, además de
+                los datos compartidos (solo POSIX)
+            directorio (str|Path|None): Dónde escribir los datos compartidos
+                (por defecto /dev/shm si tiene espacio, o el directorio temporal)
+        """
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.memoria_mb = memoria_mb
+        self.directorio = Path(directorio) if directorio else None
+        self.reporte = None
+        if memoria_mb is not None and resource is None:
+            print("Aislamiento: límite de memoria no disponible en esta plataforma")
+        metodos = mp.get_all_start_methods()
+        self._contexto = mp.get_context('fork' if 'fork' in metodos else 'spawn')
+
+    def run(self, datos, tareas):
+        """
+        Calcula los indicadores en procesos aislados.
+
+        Args:
+            datos (DataFrame): Columnas que leen los indicadores (incluidas
+                variables derivadas y filtros), escritas una vez a memoria
+                compartida
+            tareas (list): (nombre, función, columnas, filtros, kwargs)
+
+        Returns:
+            dict: nombre -> resultado (None si falló, expiró o excedió la
+            memoria). El detalle queda en self.reporte (DataFrame).
+        """
+        # Tamaño estimado del archivo IPC (cota superior: el texto cuenta
+        # con su sobrecarga de objetos Python)
+        directorio = self.directorio or directorio_compartido(int(datos.memory_usage(deep=True).sum()))
+        ruta = directorio / f"enaho_indicadores_{os.getpid()}_{uuid.uuid4().hex[:8]}.arrow"
+        escribir_ipc(datos, ruta)
+        try:
+            return self._ejecutar_tareas(str(ruta), tareas)
+        finally:
+            ruta.unlink(missing_ok=True)
+
+    def _lanzar(self, ruta, tarea):
+        nombre, funcion, columnas, filtros, kwargs = tarea
+        receptor, emisor = self._contexto.Pipe(duplex=False)
+        proceso = self._contexto.Process(
+            target=_ejecutar, name=f"indicador-{nombre}",
+            args=(emisor, ruta, funcion, columnas, filtros, kwargs, self.memoria_mb)
+        )
+        proceso.start()
+        emisor.close()
+        return proceso, receptor, time.perf_counter()
+
+    def _ejecutar_tareas(self, ruta, tareas):
+        pendientes = deque(tareas)
+        activos = {}
+        resultados, filas = {}, []
+
+        def terminar(nombre, estado, resultado=None, detalle=None):
+            proceso, receptor, inicio = activos.pop(nombre)
+            receptor.close()
+            proceso.join()
+            resultados[nombre] = resultado
+            fila = {'indicador': nombre, 'estado': estado,
+                    'segundos': time.perf_counter() - inicio,
+                    'carga_s': None, 'calculo_s': None, 'memoria_pico_mb': None,
+                    'registros': resultado.shape[0] if resultado is not None else None,
+                    'error': None}
+            fila.update(detalle or {})
+            filas.append(fila)
+            if estado == 'ok':
+                print(f"{nombre}: {fila['registros']} registros calculados "
+                      f"({fila['segundos']:.2f} s, aislado)")
+            else:
+                print(f"{nombre}: {estado} - {fila['error']}")
+
+        while pendientes or activos:
+            while pendientes and len(activos) < self.workers:
+                tarea = pendientes.popleft()
+                print(f"Calculando indicador (aislado): {tarea[0]}")
+                activos[tarea[0]] = self._lanzar(ruta, tarea)
+
+            esperar = [receptor for _, receptor, _ in activos.values()]
+            esperar += [proceso.sentinel for proceso, _, _ in activos.values()]
+            multiprocessing.connection.wait(esperar, timeout=0.1)
+
+            for nombre, (proceso, receptor, inicio) in list(activos.items()):
+                if receptor.poll():
+                    try:
+                        estado, resultado, detalle = receptor.recv()
+                    except (EOFError, OSError) as e:
+                        estado, resultado, detalle = 'error', None, {'error': f"sin respuesta ({e})"}
+                    terminar(nombre, estado, resultado, detalle)
+                elif not proceso.is_alive():
+                    proceso.join()
+                    terminar(nombre, 'error', None,
+                             {'error': f"el proceso terminó con código {proceso.exitcode}"})
+                elif self.timeout is not None and time.perf_counter() - inicio > self.timeout:
+                    proceso.terminate()
+                    terminar(nombre, 'timeout', None,
+                             {'error': f"excedió {self.timeout} s"})
+
+        columnas = ['indicador', 'estado', 'segundos', 'carga_s', 'calculo_s',
+                    'memoria_pico_mb', 'registros', 'error']
+        self.reporte = pd.DataFrame(filas, columns=columnas)
+        return resultados
@@ -1,23 +1,44 @@
 """
 Módulo para manejo de almacenamiento de datos ENAHO
 """
+import os
+import shutil
 import pandas as pd
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 from pathlib import Path
 import json
 from datetime import datetime
 
+from src.indicator_store import IndicatorStore
+from src.pooled import PooledPanelBuilder
+
+# Tipos de las columnas de partición del dataset empalmado
+PARTITION_TYPES = {'año': pa.int16(), 'dominio': pa.int8()}
+
 class StorageManager:
-    def __init__(self, base_path):
+    def __init__(self, base_path, particionar_dominio=False, filas_por_grupo=131072):
         """
         Inicializa el gestor de almacenamiento.
         
         Args:
             base_path (str|Path): Ruta base donde están las carpetas de datos
+            particionar_dominio (bool): Particionar el dataset empalmado
+                también por dominio (año=/dominio=)
+            filas_por_grupo (int): Filas máximas por row group; cada row
+                group guarda estadísticas min/max para filtrar al leer
         """
         self.base_path = Path(base_path)
         self.processed_path = self.base_path / "2. processed"
         self.final_path = self.base_path / "3. final"
+        self.merged_path = self.processed_path / "Merged" / "enaho"
+        self.particionar_dominio = particionar_dominio
+        self.filas_por_grupo = filas_por_grupo
         self._ensure_directories()
+        self.indicators = IndicatorStore(self.processed_path / "Indicators" / "store")
     
     def _ensure_directories(self):
         """Crea las carpetas necesarias si no existen."""
@@ -28,31 +49,152 @@ class StorageManager:
     
     def save_merged_data(self, df, año):
         """
-        Guarda datos unidos en formato parquet con partición por año.
+        Guarda datos unidos en el dataset Parquet particionado (Hive) por
+        año, y por dominio si se configuró. La partición del año se
+        reemplaza completa.
         
         Args:
-            df (DataFrame): DataFrame con datos unidos
+            df (DataFrame|LazyMergedFrame): Datos unidos. Una vista perezosa
+                se escribe por bloques de filas, sin materializarla completa.
             año (int): Año de los datos
             
         Returns:
-            Path: Ruta donde se guardaron los datos
+            Path: Carpeta de la partición del año
+        """
+        batches = df.iter_batches() if hasattr(df, 'iter_batches') else [df]
+        self._write_batches(batches, año)
+        
+        # Archivo plano de versiones anteriores: queda reemplazado
+        legacy_path = self.processed_path / "Merged" / f"enaho_{año}.parquet"
+        legacy_path.unlink(missing_ok=True)
+        return self.merged_path / f"año={año}"
+    
+    def save_households(self, hogares, año):
+        """
+        Guarda la tabla de hogares de un año (una fila por hogar, con los
+        desplazamientos al jefe y a la primera persona de cada hogar).
+        
+        Args:
+            hogares (HouseholdTable): Tabla armada al empalmar
+            año (int): Año de los datos
+            
+        Returns:
+            Path: Archivo escrito
+        """
+        ruta = self.processed_path / "Households" / f"hogares_{año}.parquet"
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        hogares.tabla.to_parquet(ruta, index=False)
+        return ruta
+    
+    def load_households(self, año, columns=None):
+        """
+        Carga la tabla de hogares de un año.
+        
+        Returns:
+            DataFrame|None: Tabla de hogares o None si no existe
         """
-        output_path = self.processed_path / "Merged" / f"enaho_{año}.parquet"
-        df.to_parquet(output_path, index=False)
-        return output_path
+        ruta = self.processed_path / "Households" / f"hogares_{año}.parquet"
+        if not ruta.exists():
+            return None
+        return pd.read_parquet(ruta, columns=columns)
     
-    def save_indicators(self, indicators_dict, año):
+    def _partitioning(self):
+        """Esquema de partición Hive del dataset empalmado."""
+        campos = ['año', 'dominio'] if self.particionar_dominio else ['año']
+        return ds.partitioning(
+            pa.schema([(c, PARTITION_TYPES[c]) for c in campos]), flavor='hive'
+        )
+    
+    def _to_table(self, batch, año):
+        """Convierte un bloque a Arrow con las columnas de partición tipadas."""
+        batch = batch.drop(columns=['año'], errors='ignore')
+        tabla = pa.Table.from_pandas(batch, preserve_index=False)
+        tabla = tabla.append_column('año', pa.array([año] * len(tabla), PARTITION_TYPES['año']))
+        if self.particionar_dominio and 'dominio' in tabla.column_names:
+            i = tabla.column_names.index('dominio')
+            tabla = tabla.set_column(i, 'dominio', pc.cast(tabla['dominio'], PARTITION_TYPES['dominio']))
+        return tabla
+    
+    def _write_batches(self, batches, año):
+        """
+        Escribe bloques de DataFrames en la partición de un año sin
+        reunirlos en memoria.
+        
+        Con más de un bloque, cada uno se vuelca primero como Arrow IPC con
+        sus propios tipos y el esquema final se obtiene de todos ellos (una
+        columna de texto nula en el primer bloque no queda como tipo null).
+        Todo se escribe en una carpeta temporal que reemplaza a la partición
+        del año solo si la escritura terminó bien.
+        """
+        staging = self.processed_path / "Merged" / f".staging-{año}"
+        shutil.rmtree(staging, ignore_errors=True)
+        bloques = staging / "bloques"
+        try:
+            archivos, esquemas, tabla = [], [], None
+            for i, batch in enumerate(batches):
+                if tabla is not None:
+                    # Segundo bloque en adelante: volcar a disco
+                    bloques.mkdir(parents=True, exist_ok=True)
+                    archivos.append(self._volcar_bloque(tabla, bloques / f"{len(archivos)}.arrow"))
+                tabla = self._to_table(batch, año)
+                esquemas.append(tabla.schema)
+            if tabla is None:
+                return
+            if archivos:
+                archivos.append(self._volcar_bloque(tabla, bloques / f"{len(archivos)}.arrow"))
+                schema = pa.unify_schemas(esquemas, promote_options='permissive')
+                datos = ds.dataset(archivos, schema=schema, format='ipc')
+            else:
+                datos, schema = tabla, tabla.schema
+            
+            formato = ds.ParquetFileFormat()
+            ds.write_dataset(
+                datos,
+                staging / "dataset",
+                schema=schema,
+                format=formato,
+                file_options=formato.make_write_options(compression='snappy', write_statistics=True),
+                partitioning=self._partitioning(),
+                basename_template=f"part-{año}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore',
+                max_rows_per_group=self.filas_por_grupo,
+                min_rows_per_group=min(self.filas_por_grupo, 16384),
+            )
+            del datos, tabla
+            
+            # Reemplazar la partición del año completa (incluidas subparticiones)
+            destino = self.merged_path / f"año={año}"
+            shutil.rmtree(destino, ignore_errors=True)
+            escrito = staging / "dataset" / f"año={año}"
+            if escrito.exists():
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(escrito), str(destino))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    
+    def _volcar_bloque(self, tabla, ruta):
+        """Escribe un bloque como Arrow IPC sin comprimir. Returns: str ruta"""
+        with pa.OSFile(str(ruta), 'wb') as f, pa.ipc.new_file(f, tabla.schema) as writer:
+            writer.write_table(tabla)
+        return str(ruta)
+    
+    def save_indicators(self, indicators_dict, año, versiones=None, llaves=None, estadisticas=None):
         """
-        Guarda indicadores calculados en formato CSV.
+        Guarda indicadores calculados en el almacén Parquet de indicadores
+        (formato largo, particionado por indicador y año). Los resultados
+        de un indicador en un año reemplazan a los anteriores.
         
         Args:
             indicators_dict (dict): Diccionario de DataFrames con indicadores
             año (int): Año de los datos
+            versiones (dict|None): Versión del código de cada indicador
+            llaves (dict|None): Columnas llave de cada indicador
+            estadisticas (dict|None): Estadísticas de la caché de resultados
+                a incluir en la metadata
             
         Returns:
             dict: Diccionario con rutas de archivos guardados
         """
-        results = {}
         valid_indicators = {
             name: df for name, df in indicators_dict.items() 
             if df is not None
@@ -60,42 +202,184 @@ class StorageManager:
         
         if not valid_indicators:
             print("No hay indicadores válidos para guardar")
-            return results
+            return {}
         
-        for name, df in valid_indicators.items():
-            output_path = self.processed_path / "Indicators" / f"{name}_{año}.csv"
-            df.to_csv(output_path, index=False)
-            results[name] = str(output_path)
+        results = self.indicators.write_many(valid_indicators, año, versiones, llaves)
         
-        # Guardar metadata solo de indicadores válidos
+        # Guardar metadata solo de indicadores válidos. Un recálculo parcial
+        # actualiza las entradas de sus indicadores y conserva las demás.
+        meta_path = self.processed_path / "Indicators" / f"metadata_{año}.json"
+        anterior = {}
+        if meta_path.exists():
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    anterior = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Metadata de indicadores {año} ilegible, se reescribe: {e}")
+        indicadores = [n for n in anterior.get("indicadores", []) if n not in valid_indicators]
+        filas = anterior.get("filas_por_indicador", {})
+        filas.update({name: len(df) for name, df in valid_indicators.items()})
         metadata = {
             "año": año,
             "fecha_proceso": datetime.now().isoformat(),
-            "indicadores": list(valid_indicators.keys()),
-            "filas_por_indicador": {name: len(df) for name, df in valid_indicators.items()}
+            "indicadores": indicadores + list(valid_indicators.keys()),
+            "filas_por_indicador": filas
         }
+        if estadisticas is not None:
+            metadata["cache"] = estadisticas
+
         
-        meta_path = self.processed_path / "Indicators" / f"metadata_{año}.json"
-        with open(meta_path, 'w', encoding='utf-8') as f:
+        tmp_path = meta_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
         
         return results
+
     
-    def load_merged_data(self, año):
+    def load_indicators(self, indicadores=None, años=None, columns=None, filters=None):
+        """
+        Lee indicadores de varios años en formato largo con una sola
+        lectura columnar (ver IndicatorStore.load).
+        """
+        return self.indicators.load(indicadores, años, columns, filters)
+    
+    def merged_dataset(self, años=None):
+        """
+        Dataset Arrow de los datos unidos, con un esquema unificado entre
+        años (columnas ausentes en un año se leen como nulas).
+        
+        Args:
+            años (list|None): Años a incluir (None = todos)
+            
+        Returns:
+            pyarrow.dataset.Dataset|None
+        """
+        if not self.merged_path.exists():
+            return None
+        rutas = [
+            str(f) for f in sorted(self.merged_path.rglob("*.parquet"))
+            if años is None or self._año_de_ruta(f) in set(años)
+        ]
+        if not rutas:
+            return None
+        
+        dataset = ds.dataset(rutas, format='parquet', partitioning=self._partitioning(),
+                             partition_base_dir=str(self.merged_path))
+        try:
+            schema = pa.unify_schemas(
+                [f.physical_schema for f in dataset.get_fragments()] + [self._partitioning().schema],
+                promote_options='permissive'
+            )
+            dataset = ds.dataset(rutas, schema=schema, format='parquet',
+                                 partitioning=self._partitioning(),
+                                 partition_base_dir=str(self.merged_path))
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"Esquemas incompatibles entre años, se usa el del primer archivo: {e}")
+        return dataset
+    
+    def _año_de_ruta(self, ruta):
+        """Año de un archivo del dataset a partir de su carpeta año=."""
+        for parte in Path(ruta).relative_to(self.merged_path).parts:
+            if parte.startswith("año="):
+                return int(parte.split("=", 1)[1])
+        return None
+    
+    def _expression(self, filters):
+        """Convierte filtros en formato lista [(col, op, valor)] a expresión."""
+        if filters is None or isinstance(filters, ds.Expression):
+            return filters
+        return pq.filters_to_expression(filters)
+    
+    def scan_merged(self, años=None, columns=None, filters=None, batch_size=131072):
+        """
+        Recorre los datos unidos por bloques, leyendo solo las columnas,
+        particiones y row groups que cumplen los filtros.
+        
+        Args:
+            años (list|None): Años a leer (None = todos)
+            columns (list|None): Columnas a leer (None = todas)
+            filters: Expresión de pyarrow.dataset o lista [(col, op, valor)]
+            batch_size (int): Filas máximas por bloque
+            
+        Returns:
+            iterator de pyarrow.RecordBatch (vacío si no hay datos)
+        """
+        dataset = self.merged_dataset(años)
+        if dataset is None:
+            return iter(())
+        if columns is not None:
+            columns = [c for c in columns if c in dataset.schema.names]
+        return dataset.to_batches(columns=columns, filter=self._expression(filters),
+                                  batch_size=batch_size)
+    
+    def load_merged(self, años=None, columns=None, filters=None):
+        """
+        Carga datos unidos de varios años con proyección de columnas y
+        filtros aplicados al leer (particiones y estadísticas de row groups).
+        
+        Args:
+            años (list|None): Años a leer (None = todos)
+            columns (list|None): Columnas a leer (None = todas)
+            filters: Expresión de pyarrow.dataset o lista [(col, op, valor)]
+            
+        Returns:
+            DataFrame|None: Datos o None si no hay datos para esos años
+        """
+        dataset = self.merged_dataset(años)
+        if dataset is None:
+            return None
+        if columns is not None:
+            columns = [c for c in columns if c in dataset.schema.names]
+        return dataset.to_table(columns=columns, filter=self._expression(filters)).to_pandas()
+    
+    def load_pooled(self, años=None, columns=None, categoricas=None, filters=None):
+        """
+        Arma un panel de varios años con tipos comunes y diccionarios de
+        categorías compartidos, copiando cada año una sola vez (ver
+        src/pooled.py).
+        
+        Args:
+            años (list|None): Años a incluir (None = todos)
+            columns (list|None): Columnas (None = unión de todos los años)
+            categoricas (list|None): Columnas a codificar como categoría
+            filters: Expresión de pyarrow.dataset o lista [(col, op, valor)]
+            
+        Returns:
+            PooledPanel: usar .to_pandas(), .to_arrow() o .iter_batches()
+        """
+        return PooledPanelBuilder(self).build(años, columns, categoricas, filters)
+    
+    def load_merged_data(self, año, columns=None, filters=None):
         """
         Carga datos unidos de un año específico.
         
         Args:
             año (int): Año a cargar
+            columns (list|None): Columnas a leer (None = todas)
+            filters: Filtros adicionales (ver load_merged)
             
         Returns:
             DataFrame|None: DataFrame con datos o None si no existe
         """
+        if año in self.list_partitioned_years():
+            return self.load_merged([año], columns, filters)
+        
+        # Archivo plano de versiones anteriores
         file_path = self.processed_path / "Merged" / f"enaho_{año}.parquet"
         if file_path.exists():
-            return pd.read_parquet(file_path)
+            return pd.read_parquet(file_path, columns=columns, filters=filters)
         return None
     
+    def list_partitioned_years(self):
+        """Años con partición en el dataset empalmado."""
+        if not self.merged_path.exists():
+            return []
+        return sorted(
+            int(d.name.split("=", 1)[1]) for d in self.merged_path.glob("año=*")
+            if d.is_dir() and any(d.rglob("*.parquet"))
+        )
+    
     def list_processed_years(self):
         """
         Lista los años que tienen datos procesados.
@@ -104,6 +388,7 @@ class StorageManager:
             list: Lista de años encontrados
         """
         pattern = "enaho_*.parquet"
-        files = list(self.processed_path.glob(pattern))
-        años = [int(f.stem.split('_')[1]) for f in files]
+        files = list((self.processed_path / "Merged").glob(pattern))
+        años = {int(f.stem.split('_')[1]) for f in files}
+        años.update(self.list_partitioned_years())
         return sorted(años)
@@ -0,0 +1,225 @@
+"""
+Evaluación de indicadores por bloques de registros (streaming)
+
+Cada bloque (RecordBatch, row group o año) se reduce a agregados parciales
+combinables por grupo: sumas ponderadas, sumas de pesos y conteos. Los
+parciales se combinan sumándolos y el indicador se calcula al final, de
+modo que la memoria depende del número de grupos y no del número de filas
+ni de años leídos.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.groupby_engine import GroupByEngine
+from src.indicator_graph import DerivedFrame
+
+FILAS = '__filas'
+
+
+def _componentes(nombre, agg):
+    """Columnas parciales de una agregación y cómo se combinan."""
+    if agg.how == 'sum':
+        return {f'{nombre}__sum': 'sum'}
+    if agg.how == 'count':
+        return {f'{nombre}__n': 'sum'}
+    if agg.how == 'mean':
+        return {f'{nombre}__num': 'sum', f'{nombre}__den': 'sum'}
+    if agg.how == 'first':
+        return {f'{nombre}__first': 'first'}
+    if agg.how == 'ratio':
+        return {f'{nombre}__num': 'sum', f'{nombre}__nnum': 'sum'}
+    raise ValueError(f"Agregación '{agg.how}' no soportada")
+
+
+def partial_aggregate(spec, data, engine=None):
+    """
+    Agregados parciales de un indicador declarado sobre un bloque.
+
+    Returns:
+        dict|None: {'grupos': DataFrame (llaves + parciales),
+                    'denominadores': {nombre: DataFrame}}, o None si faltan
+                    columnas en el bloque
+    """
+    engine = engine or GroupByEngine(data)
+    if not engine.available(spec):
+        return None
+    grupos, codes = engine.spec_codes(spec)
+    n = grupos.n_groups
+
+    columnas = {FILAS: engine._count(codes, n)}
+    denominadores = {}
+    for nombre, agg in spec.aggregations.items():
+        valores = engine.values(agg.column, spec) if agg.column else None
+        pesos = engine.values(agg.weight) if agg.weight else None
+        if agg.how == 'sum':
+            columnas[f'{nombre}__sum'] = engine._sum(codes, n, valores, pesos)
+        elif agg.how == 'count':
+            columnas[f'{nombre}__n'] = engine._count(codes, n, valores)
+        elif agg.how == 'mean':
+            columnas[f'{nombre}__num'] = engine._sum(codes, n, valores, pesos)
+            columnas[f'{nombre}__den'] = engine._sum(codes, n, np.where(np.isnan(valores), np.nan, 1.0), pesos)
+        elif agg.how == 'first':
+            columnas[f'{nombre}__first'] = engine._first(codes, n, agg.column)
+        elif agg.how == 'ratio':
+            columnas[f'{nombre}__num'] = engine._sum(codes, n, valores, pesos)
+            columnas[f'{nombre}__nnum'] = engine._count(codes, n, valores)
+            den = engine.group_codes(list(agg.denominator_keys or spec.keys))
+            filtrado = spec.filter is not None or spec.filters
+            den_codes = np.where(codes >= 0, den.codes, -1) if filtrado else den.codes
+            den_valores = engine.values(agg.denominator, spec) if agg.denominator else None
+            tabla = den.groups()
+            tabla[f'{nombre}__den'] = engine._sum(den_codes, den.n_groups, den_valores, pesos)
+            denominadores[nombre] = tabla
+        else:
+            raise ValueError(f"Agregación '{agg.how}' no soportada")
+
+    tabla = grupos.groups()
+    for columna, valores in columnas.items():
+        tabla[columna] = valores.to_numpy() if isinstance(valores, pd.Series) else valores
+    return {'grupos': tabla[tabla[FILAS] > 0], 'denominadores': denominadores}
+
+
+def merge_partials(spec, parciales):
+    """
+    Combina parciales de varios bloques (en orden de lectura).
+
+    Returns:
+        dict|None: Parcial combinado
+    """
+    parciales = [p for p in parciales if p is not None]
+    if not parciales:
+        return None
+
+    reglas = {FILAS: 'sum'}
+    for nombre, agg in spec.aggregations.items():
+        reglas.update(_componentes(nombre, agg))
+    grupos = (
+        pd.concat([p['grupos'] for p in parciales], ignore_index=True)
+        .groupby(list(spec.keys), sort=True, observed=True)
+        .agg(reglas)
+        .reset_index()
+    )
+
+    denominadores = {}
+    for nombre, agg in spec.aggregations.items():
+        if agg.how != 'ratio':
+            continue
+        den_keys = list(agg.denominator_keys or spec.keys)
+        denominadores[nombre] = (
+            pd.concat([p['denominadores'][nombre] for p in parciales], ignore_index=True)
+            .groupby(den_keys, sort=True, observed=True)
+            .agg({f'{nombre}__den': 'sum'})
+            .reset_index()
+        )
+    return {'grupos': grupos, 'denominadores': denominadores}
+
+
+def finalize(spec, parcial):
+    """
+    Calcula el indicador a partir del parcial combinado, con la misma
+    salida que GroupByEngine.evaluate.
+
+    Returns:
+        DataFrame|None
+    """
+    if parcial is None:
+        return None
+    grupos = parcial['grupos']
+    presentes = grupos[FILAS].to_numpy() > 0
+    salida = grupos[list(spec.keys)].copy()
+
+    for nombre, agg in spec.aggregations.items():
+        if agg.how == 'sum':
+            salida[nombre] = grupos[f'{nombre}__sum'] * agg.scale
+        elif agg.how == 'count':
+            salida[nombre] = grupos[f'{nombre}__n']
+        elif agg.how == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                salida[nombre] = grupos[f'{nombre}__num'] / grupos[f'{nombre}__den'] * agg.scale
+        elif agg.how == 'first':
+            salida[nombre] = grupos[f'{nombre}__first']
+        elif agg.how == 'ratio':
+            den_keys = list(agg.denominator_keys or spec.keys)
+            denominador = grupos[den_keys].merge(
+                parcial['denominadores'][nombre], on=den_keys, how='left'
+            )[f'{nombre}__den'].to_numpy()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                salida[nombre] = grupos[f'{nombre}__num'].to_numpy() / denominador * agg.scale
+            presentes &= grupos[f'{nombre}__nnum'].to_numpy() > 0
+
+    return salida[presentes].reset_index(drop=True)
+
+
+def _a_pandas(bloque):
+    """DataFrame de un RecordBatch, Table o DataFrame."""
+    if isinstance(bloque, (pa.RecordBatch, pa.Table)):
+        return bloque.to_pandas()
+    return bloque
+
+
+class StreamingEvaluator:
+    def __init__(self, specs, workers=1, graph=None):
+        """
+        Args:
+            specs (dict): nombre -> IndicatorSpec
+            workers (int): Bloques procesados a la vez (hilos); como máximo
+                2 x workers bloques quedan en memoria
+            graph (IndicatorGraph|None): Variables derivadas y filtros que
+                se calculan sobre cada bloque
+        """
+        self.specs = specs
+        self.workers = workers
+        self.graph = graph
+        self.bloques = 0
+        self.filas = 0
+
+    def _procesar(self, bloque):
+        """Parciales de todos los indicadores sobre un bloque."""
+        datos = _a_pandas(bloque)
+        if self.graph is not None:
+            datos = DerivedFrame(datos, self.graph)
+        engine = GroupByEngine(datos)
+        return len(datos), {
+            nombre: partial_aggregate(spec, datos, engine)
+            for nombre, spec in self.specs.items()
+        }
+
+    def _parciales(self, batches):
+        """Parciales por bloque en orden de lectura."""
+        if self.workers <= 1:
+            for bloque in batches:
+                yield self._procesar(bloque)
+            return
+        pendientes = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for bloque in batches:
+                pendientes.append(executor.submit(self._procesar, bloque))
+                if len(pendientes) >= 2 * self.workers:
+                    yield pendientes.popleft().result()
+            while pendientes:
+                yield pendientes.popleft().result()
+
+    def run(self, batches):
+        """
+        Evalúa los indicadores sobre un iterable de bloques.
+
+        Los parciales se combinan a medida que llegan, de modo que solo se
+        mantiene un parcial acumulado por indicador.
+
+        Returns:
+            dict: nombre -> DataFrame|None
+        """
+        acumulado = {nombre: None for nombre in self.specs}
+        for filas, parciales in self._parciales(batches):
+            self.bloques += 1
+            self.filas += filas
+            for nombre, parcial in parciales.items():
+                previo = acumulado[nombre]
+                acumulado[nombre] = merge_partials(
+                    self.specs[nombre], [previo, parcial] if previo is not None else [parcial]
+                )
+        return {nombre: finalize(self.specs[nombre], parcial) for nombre, parcial in acumulado.items()}
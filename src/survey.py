@@ -0,0 +1,257 @@
+"""
+Estimadores ponderados con errores estándar según el diseño muestral ENAHO
+
+El diseño es estratificado (estrato) con conglomerados como unidades
+primarias de muestreo (conglome). Los errores estándar se obtienen por
+linealización: cada estimador se expresa con variables de influencia por
+fila, que se suman por dominio y conglomerado con `np.bincount`. La
+varianza de todos los dominios se calcula a la vez:
+
+    var_d = sum_h n_h / (n_h - 1) * (S2_dh - S1_dh^2 / n_h)
+
+donde S1 y S2 son la suma y la suma de cuadrados de los totales por
+conglomerado del dominio d en el estrato h, y n_h es el número de
+conglomerados del estrato.
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from src.groupby_engine import GroupByEngine, _a_float
+
+
+class SurveyDesign:
+    def __init__(self, data, weight, strata='estrato', psu='conglome', engine=None, nivel=0.95):
+        """
+        Args:
+            data (DataFrame|LazyMergedFrame): Datos a nivel de registro
+            weight (str): Columna de factor de expansión (p. ej. 'factor07_sum')
+            strata (str): Columna de estrato
+            psu (str): Columna de unidad primaria de muestreo
+            engine (GroupByEngine|None): Motor de agregación a compartir
+                (reutiliza la factorización de llaves de los indicadores)
+            nivel (float): Nivel de confianza de los intervalos
+        """
+        self.data = data
+        self.engine = engine or GroupByEngine(data)
+        self.weight = weight
+        self.nivel = nivel
+        self.z = NormalDist().inv_cdf(0.5 + nivel / 2)
+
+        self.pesos = self.engine.values(weight)
+        unidades = self.engine.group_codes([strata, psu])
+        self.psu_codes = unidades.codes
+        self.n_psu = unidades.n_groups
+        # Estrato de cada conglomerado y número de conglomerados por estrato
+        self.psu_strata = unidades.key_codes[:, 0]
+        self.n_strata = len(unidades.key_uniques[0])
+        self.psu_por_estrato = np.bincount(self.psu_strata, minlength=self.n_strata)
+        self.validas = (self.psu_codes >= 0) & ~np.isnan(self.pesos)
+        if not self.validas.all():
+            print(f"Diseño muestral: {(~self.validas).sum()} filas sin estrato, "
+                  f"conglomerado o factor se excluyen")
+
+    # ------------------------------------------------------------------
+    # Utilidades
+    # ------------------------------------------------------------------
+    def _valores(self, variable):
+        """Valores float64 de una columna (nombre) o de un arreglo."""
+        if isinstance(variable, str):
+            return self.engine.values(variable)
+        return _a_float(variable)
+
+    def _dominios(self, by, filter=None, *variables):
+        """
+        Códigos de dominio por fila (-1 = fuera de todo dominio o con
+        variables nulas).
+        """
+        if by:
+            grupos = self.engine.group_codes(by)
+            codes = grupos.codes.copy()
+        else:
+            grupos = None
+            codes = np.zeros(self.engine.n_rows, dtype=np.int64)
+        fuera = ~self.validas
+        if filter is not None:
+            mascara = filter(self.data) if callable(filter) else filter
+            fuera |= ~np.asarray(mascara, dtype=bool)
+        for valores in variables:
+            fuera |= np.isnan(valores)
+        codes[fuera] = -1
+        n_dom = grupos.n_groups if grupos is not None else 1
+        return grupos, codes, n_dom
+
+    def _suma(self, codes, n_dom, valores):
+        incluir = codes >= 0
+        return np.bincount(codes[incluir], weights=valores[incluir], minlength=n_dom)
+
+    def varianza(self, codes, n_dom, influencia):
+        """
+        Varianza linealizada de todos los dominios a partir de las variables
+        de influencia por fila.
+
+        Returns:
+            ndarray: Varianza por dominio
+        """
+        incluir = codes >= 0
+        celda = codes[incluir] * self.n_psu + self.psu_codes[incluir]
+        # Totales por (dominio, conglomerado) con celdas presentes solamente
+        celdas, inversa = np.unique(celda, return_inverse=True)
+        totales = np.bincount(inversa, weights=influencia[incluir])
+        dominio = celdas // self.n_psu
+        estrato = self.psu_strata[celdas % self.n_psu]
+
+        clave = dominio * self.n_strata + estrato
+        s1 = np.bincount(clave, weights=totales, minlength=n_dom * self.n_strata)
+        s2 = np.bincount(clave, weights=totales ** 2, minlength=n_dom * self.n_strata)
+
+        n_h = np.tile(self.psu_por_estrato.astype(np.float64), n_dom)
+        # Estratos con un solo conglomerado no aportan varianza
+        with np.errstate(invalid='ignore', divide='ignore'):
+            aporte = np.where(n_h > 1, n_h / (n_h - 1) * (s2 - s1 ** 2 / n_h), 0.0)
+        return aporte.reshape(n_dom, self.n_strata).sum(axis=1)
+
+    def _resultado(self, grupos, codes, n_dom, estimacion, varianza, columna):
+        """DataFrame de salida con estimación, error estándar, CV e intervalo."""
+        filas = np.bincount(codes[codes >= 0], minlength=n_dom)
+        seleccion = np.flatnonzero(filas > 0)
+        salida = grupos.groups(seleccion) if grupos is not None else pd.DataFrame(index=range(len(seleccion)))
+        estimacion = estimacion[seleccion]
+        se = np.sqrt(np.maximum(varianza[seleccion], 0))
+        salida[columna] = estimacion
+        salida['se'] = se
+        with np.errstate(invalid='ignore', divide='ignore'):
+            salida['cv'] = np.where(estimacion != 0, se / np.abs(estimacion) * 100, np.nan)
+        salida['ic_inf'] = estimacion - self.z * se
+        salida['ic_sup'] = estimacion + self.z * se
+        salida['n'] = filas[seleccion]
+        return salida
+
+    # ------------------------------------------------------------------
+    # Estimadores
+    # ------------------------------------------------------------------
+    def total(self, variable, by=None, filter=None):
+        """
+        Total ponderado de una variable por dominio.
+
+        Args:
+            variable (str|array): Columna o valores por fila
+            by (list|None): Llaves de dominio (None = población total)
+            filter (callable|array|None): Filas a considerar
+
+        Returns:
+            DataFrame: Llaves, total, se, cv (%), ic_inf, ic_sup, n
+        """
+        y = self._valores(variable)
+        grupos, codes, n_dom = self._dominios(by, filter, y)
+        influencia = self.pesos * y
+        estimacion = self._suma(codes, n_dom, influencia)
+        return self._resultado(grupos, codes, n_dom, estimacion,
+                               self.varianza(codes, n_dom, influencia), 'total')
+
+    def ratio(self, numerator, denominator, by=None, filter=None, scale=1.0):
+        """
+        Razón de totales ponderados sum(w*y) / sum(w*x) por dominio.
+
+        Returns:
+            DataFrame: Llaves, ratio, se, cv (%), ic_inf, ic_sup, n
+        """
+        y = self._valores(numerator)
+        x = self._valores(denominator)
+        grupos, codes, n_dom = self._dominios(by, filter, y, x)
+        ty = self._suma(codes, n_dom, self.pesos * y)
+        tx = self._suma(codes, n_dom, self.pesos * x)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = ty / tx
+        d = np.maximum(codes, 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            influencia = np.where(codes >= 0, self.pesos * (y - r[d] * x) / tx[d], 0.0)
+        varianza = self.varianza(codes, n_dom, influencia)
+        return self._resultado(grupos, codes, n_dom, r * scale, varianza * scale ** 2, 'ratio')
+
+    def mean(self, variable, by=None, filter=None):
+        """
+        Media ponderada por dominio (razón con denominador 1).
+
+        Returns:
+            DataFrame: Llaves, media, se, cv (%), ic_inf, ic_sup, n
+        """
+        y = self._valores(variable)
+        resultado = self.ratio(y, np.ones_like(y), by, filter)
+        return resultado.rename(columns={'ratio': 'media'})
+
+    def proportion(self, variable, by=None, filter=None, valor=None, scale=1.0):
+        """
+        Proporción ponderada por dominio.
+
+        Args:
+            variable (str|array): Variable 0/1, o variable a comparar con `valor`
+            valor: Si se indica, se estima la proporción de variable == valor
+
+        Returns:
+            DataFrame: Llaves, proporcion, se, cv (%), ic_inf, ic_sup, n
+        """
+        y = self._valores(variable)
+        if valor is not None:
+            y = np.where(np.isnan(y), np.nan, (y == valor).astype(np.float64))
+        resultado = self.ratio(y, np.ones_like(y), by, filter, scale)
+        return resultado.rename(columns={'ratio': 'proporcion'})
+
+    def quantile(self, variable, q=0.5, by=None, filter=None):
+        """
+        Cuantil ponderado por dominio con intervalo de Woodruff: el
+        intervalo de la proporción F(q) se transforma con la función de
+        distribución ponderada del dominio.
+
+        Returns:
+            DataFrame: Llaves, cuantil, se, cv (%), ic_inf, ic_sup, n
+        """
+        y = self._valores(variable)
+        grupos, codes, n_dom = self._dominios(by, filter, y)
+        filas = np.flatnonzero(codes >= 0)
+        orden = filas[np.lexsort((y[filas], codes[filas]))]
+        dominio = codes[orden]
+        valores = y[orden]
+        pesos = self.pesos[orden]
+
+        # Distribución acumulada ponderada dentro de cada dominio
+        acumulado = np.cumsum(pesos)
+        totales = np.bincount(dominio, weights=pesos, minlength=n_dom)
+        previo = np.concatenate([[0.0], np.cumsum(totales)])[:-1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            F = (acumulado - previo[dominio]) / totales[dominio]
+        clave = dominio + np.minimum(F, 1.0)
+        inicio = np.searchsorted(dominio, np.arange(n_dom), side='left')
+        fin = np.searchsorted(dominio, np.arange(n_dom), side='right')
+
+        def cuantil(p):
+            # Primer valor del dominio con F >= p
+            p = np.clip(p, 1e-12, 1.0)
+            i = np.searchsorted(clave, np.arange(n_dom) + p - 1e-12, side='left')
+            i = np.clip(i, inicio, np.maximum(fin - 1, inicio))
+            return np.where(fin > inicio, valores[np.minimum(i, max(len(valores) - 1, 0))], np.nan)
+
+        estimacion = cuantil(np.full(n_dom, q))
+
+        # Error estándar de la proporción por debajo del cuantil estimado
+        d = np.maximum(codes, 0)
+        debajo = np.where(codes >= 0, (y <= estimacion[d]).astype(np.float64), 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tot_dom = self._suma(codes, n_dom, self.pesos)
+            p_hat = self._suma(codes, n_dom, self.pesos * debajo) / tot_dom
+            influencia = np.where(codes >= 0, self.pesos * (debajo - p_hat[d]) / tot_dom[d], 0.0)
+        se_p = np.sqrt(np.maximum(self.varianza(codes, n_dom, influencia), 0))
+
+        inferior = cuantil(q - self.z * se_p)
+        superior = cuantil(q + self.z * se_p)
+        se = (superior - inferior) / (2 * self.z)
+
+        resultado = self._resultado(grupos, codes, n_dom, estimacion, se ** 2, 'cuantil')
+        seleccion = np.flatnonzero(np.bincount(codes[codes >= 0], minlength=n_dom) > 0)
+        resultado['ic_inf'] = inferior[seleccion]
+        resultado['ic_sup'] = superior[seleccion]
+        return resultado
+
+
+ESTIMADORES = ('total', 'mean', 'proportion', 'ratio', 'quantile')
@@ -0,0 +1,213 @@
+"""
+Generador de datos ENAHO sintéticos
+
+Produce los cinco módulos de MODULES_MAPPING como archivos .dta con la
+estructura de llaves de la encuesta (conglome/vivienda/hogar/codperso),
+factores de expansión, códigos de valor faltante de INEI (999...) y el
+mismo esquema de carpetas que lee ENAHOLoader:
+
+    {base_path}/data/1. raw/{año}/DTA/enaho01-{año}-100.dta ...
+
+Los datos no provienen de microdatos reales: sirven para pruebas,
+benchmarks y para compartir el pipeline sin la información de INEI.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyreadstat
+
+from config.modules_config import MODULES_MAPPING
+from src.indicators_config import DEPARTAMENTOS
+
+# Tamaño aproximado de un año real (hogares encuestados)
+HOGARES_POR_AÑO = 34000
+
+# Columnas de relleno por módulo para acercarse al ancho real de los .dta
+ANCHO_MODULOS = {
+    'vivienda': 40,
+    'personas': 20,
+    'educacion': 60,
+    'empleo_ingresos': 120,
+    'sumarias': 60
+}
+
+
+class SyntheticENAHO:
+    def __init__(self, hogares=HOGARES_POR_AÑO, escala=1.0, ancho=None,
+                 proporcion_missing=0.02, seed=0):
+        """
+        Args:
+            hogares (int): Hogares de un año a escala 1
+            escala (float): Multiplicador de filas (hasta 10x un año real)
+            ancho (dict|float|None): Columnas de relleno por módulo, o un
+                multiplicador de ANCHO_MODULOS (None = ANCHO_MODULOS)
+            proporcion_missing (float): Proporción de valores con código
+                faltante (999...) en las variables que los admiten
+            seed (int): Semilla base; cada año usa seed + año
+        """
+        if escala <= 0:
+            raise ValueError("La escala debe ser positiva")
+        self.hogares = max(int(hogares * escala), 1)
+        if ancho is None:
+            ancho = ANCHO_MODULOS
+        elif not isinstance(ancho, dict):
+            ancho = {modulo: int(n * ancho) for modulo, n in ANCHO_MODULOS.items()}
+        self.ancho = ancho
+        self.proporcion_missing = proporcion_missing
+        self.seed = seed
+
+    def _faltantes(self, rng, valores, codigo):
+        """Reemplaza una proporción de valores por un código faltante de INEI."""
+        valores = np.asarray(valores, dtype=np.float64).copy()
+        valores[rng.random(len(valores)) < self.proporcion_missing] = codigo
+        return valores
+
+    def _relleno(self, rng, df, modulo, prefijo):
+        """Agrega columnas numéricas de relleno hasta el ancho del módulo."""
+        n = len(df)
+        columnas = {
+            f'{prefijo}{i:03d}': rng.integers(0, 10, n).astype(np.float64)
+            for i in range(self.ancho.get(modulo, 0))
+        }
+        return pd.concat([df, pd.DataFrame(columnas, index=df.index)], axis=1) if columnas else df
+
+    def hogares_año(self, rng, año):
+        """Llaves, ubicación y factores de los hogares de un año."""
+        n = self.hogares
+        # 3 a 8 viviendas por conglomerado, y casi siempre un hogar por vivienda
+        por_conglomerado = rng.integers(3, 9, n // 3 + 2)
+        conglome = np.repeat(np.arange(1, len(por_conglomerado) + 1), por_conglomerado)[:n]
+        inicio = np.r_[0, np.flatnonzero(np.diff(conglome)) + 1]
+        vivienda = np.arange(n) - np.repeat(inicio, np.diff(np.r_[inicio, n])) + 1
+
+        estrato_conglome = rng.integers(1, 9, conglome.max() + 1)
+        dominio_conglome = rng.integers(1, 9, conglome.max() + 1)
+        ubigeo_conglome = (
+            rng.integers(1, len(DEPARTAMENTOS) + 1, conglome.max() + 1) * 10000
+            + rng.integers(1, 20, conglome.max() + 1) * 100 + rng.integers(1, 15, conglome.max() + 1)
+        )
+        return pd.DataFrame({
+            'conglome': pd.Series(conglome).map('{:06d}'.format),
+            'vivienda': pd.Series(vivienda).map('{:03d}'.format),
+            'hogar': np.where(rng.random(n) < 0.02, '12', '11'),
+            'aÑo': str(año),
+            'mes': pd.Series(rng.integers(1, 13, n)).map('{:02d}'.format),
+            'ubigeo': pd.Series(ubigeo_conglome[conglome]).map('{:06d}'.format),
+            'dominio': dominio_conglome[conglome].astype(np.float64),
+            'estrato': estrato_conglome[conglome].astype(np.float64),
+            'factor07': rng.lognormal(5, 0.5, n),
+            'mieperho': rng.choice(np.arange(1, 11), n, p=[.12, .18, .2, .19, .13, .08, .05, .03, .01, .01])
+                        .astype(np.float64)
+        })
+
+    def modulos_año(self, año):
+        """
+        Genera los cinco módulos de un año.
+
+        Returns:
+            dict: módulo -> DataFrame (nombres de columnas como en los .dta)
+        """
+        rng = np.random.default_rng(self.seed + año)
+        hogares = self.hogares_año(rng, año)
+        n = len(hogares)
+        llaves_hogar = ['conglome', 'vivienda', 'hogar']
+        ubicacion = ['aÑo', 'mes', 'ubigeo', 'dominio', 'estrato']
+
+        sumarias = hogares.copy()
+        sumarias['factora07'] = sumarias['factor07']
+        sumarias['pobreza'] = rng.choice([1, 2, 3], n, p=[.05, .15, .8]).astype(np.float64)
+        sumarias['gashog2d'] = rng.lognormal(9.8, 0.7, n)
+        sumarias['inghog2d'] = sumarias['gashog2d'] * rng.uniform(0.8, 1.6, n)
+        sumarias['factor'] = 1.0
+        sumarias = self._relleno(rng, sumarias, 'sumarias', 'sg')
+
+        vivienda = hogares[llaves_hogar + ubicacion + ['factor07']].copy()
+        vivienda['p101'] = rng.integers(1, 8, n).astype(np.float64)
+        vivienda['p102'] = self._faltantes(rng, rng.integers(1, 9, n), 9)
+        vivienda['p103'] = rng.integers(1, 9, n).astype(np.float64)
+        vivienda['p103a'] = rng.integers(1, 8, n).astype(np.float64)
+        vivienda['p104'] = self._faltantes(rng, rng.integers(1, 7, n), 99)
+        vivienda['p105'] = rng.integers(1, 7, n).astype(np.float64)
+        vivienda['p105a'] = self._faltantes(rng, rng.lognormal(5, 1, n).round(), 99999)
+        vivienda['p110'] = rng.integers(1, 8, n).astype(np.float64)
+        vivienda['nconglome'] = vivienda['conglome'].str.lstrip('0')
+        vivienda = self._relleno(rng, vivienda, 'vivienda', 'p1')
+
+        # Personas: mieperho miembros por hogar, el primero es el jefe
+        por_hogar = hogares['mieperho'].to_numpy(dtype=np.int64)
+        fila_hogar = np.repeat(np.arange(n), por_hogar)
+        m = len(fila_hogar)
+        inicio = np.repeat(np.cumsum(por_hogar) - por_hogar, por_hogar)
+        orden = np.arange(m) - inicio + 1
+        parentesco = np.where(orden == 1, 1, rng.choice([2, 3, 4, 5, 6, 7, 8, 9], m,
+                                                       p=[.25, .45, .1, .08, .04, .04, .02, .02]))
+        edad = np.where(orden == 1, rng.integers(20, 90, m), rng.integers(0, 90, m))
+        personas = hogares[llaves_hogar + ubicacion + ['factor07']].iloc[fila_hogar].reset_index(drop=True)
+        personas.insert(3, 'codperso', pd.Series(orden).map('{:02d}'.format))
+        personas['codinfor'] = np.where(rng.random(m) < 0.03, '00',
+                                        pd.Series(rng.integers(1, 4, m)).map('{:02d}'.format))
+        personas['p203'] = parentesco.astype(np.float64)
+        personas['p204'] = np.where(rng.random(m) < 0.95, 1.0, 2.0)
+        personas['p205'] = np.where(rng.random(m) < 0.9, 2.0, 1.0)
+        personas['p206'] = self._faltantes(rng, rng.integers(1, 3, m), 9)
+        personas['p207'] = rng.integers(1, 3, m).astype(np.float64)
+        personas['p208a'] = edad.astype(np.float64)
+        personas['facpob07'] = personas['factor07'] * rng.uniform(0.9, 1.1, m)
+        personas['factora07'] = personas['facpob07']
+        personas = self._relleno(rng, personas, 'personas', 'p2')
+
+        llaves_persona = llaves_hogar + ['codperso']
+        educacion = personas[llaves_persona + ubicacion + ['factor07', 'factora07']].copy()
+        educacion['p300a'] = rng.choice([4, 1, 2, 3], m, p=[.8, .1, .05, .05]).astype(np.float64)
+        educacion['p301a'] = self._faltantes(rng, np.minimum(edad // 4, 11) + 1, 99)
+        educacion['p306'] = rng.integers(1, 3, m).astype(np.float64)
+        educacion['p307'] = rng.integers(1, 3, m).astype(np.float64)
+        educacion['p308a'] = rng.integers(1, 6, m).astype(np.float64)
+        educacion = self._relleno(rng, educacion, 'educacion', 'p3')
+
+        # Empleo: solo personas de 14 años o más
+        mayores = edad >= 14
+        k = int(mayores.sum())
+        empleo = personas.loc[mayores, llaves_persona + ubicacion + ['factor07']].reset_index(drop=True)
+        empleo['fac500a'] = empleo['factor07'] * rng.uniform(0.9, 1.1, k)
+        empleo['factora07'] = empleo['fac500a']
+        empleo['ocu500'] = rng.choice([1, 2, 3, 4], k, p=[.7, .05, .05, .2]).astype(np.float64)
+        empleo['p501'] = rng.integers(1, 3, k).astype(np.float64)
+        empleo['p507'] = rng.integers(1, 8, k).astype(np.float64)
+        empleo['p524a1'] = self._faltantes(rng, rng.lognormal(7, 0.8, k).round(2), 999999)
+        empleo['i524a1'] = self._faltantes(rng, rng.lognormal(8.5, 0.9, k).round(2), 999999)
+        empleo = self._relleno(rng, empleo, 'empleo_ingresos', 'p5')
+
+        return {
+            'vivienda': vivienda,
+            'personas': personas,
+            'educacion': educacion,
+            'empleo_ingresos': empleo,
+            'sumarias': sumarias
+        }
+
+    def escribir_año(self, base_path, año):
+        """
+        Escribe los .dta de un año en la estructura de carpetas del pipeline.
+
+        Args:
+            base_path (str|Path): Raíz del proyecto (contiene la carpeta data)
+            año (int): Año a generar
+
+        Returns:
+            dict: módulo -> ruta del archivo escrito
+        """
+        destino = Path(base_path) / "data" / "1. raw" / str(año) / "DTA"
+        destino.mkdir(parents=True, exist_ok=True)
+        rutas = {}
+        for modulo, df in self.modulos_año(año).items():
+            ruta = destino / MODULES_MAPPING[modulo].format(año=año)
+            pyreadstat.write_dta(df, str(ruta))
+            rutas[modulo] = ruta
+            print(f"   {modulo}: {df.shape} -> {ruta.name}")
+        return rutas
+
+    def escribir(self, base_path, años):
+        """Escribe varios años. Returns: dict año -> {módulo: ruta}."""
+        return {año: self.escribir_año(base_path, año) for año in años}
@@ -0,0 +1,38 @@
+"""
+Pruebas del almacén de indicadores (src/indicator_store.py).
+"""
+
+import sys
+import os
+import shutil
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.indicator_store import IndicatorStore
+
+
+def _resultado(valor):
+    return pd.DataFrame({'año': [2024, 2024], 'dominio': [1, 2], 'tasa': [valor, valor + 1]})
+
+
+def test_almacen_movido_se_sigue_leyendo(tmp_path):
+    store = IndicatorStore(tmp_path / "ind")
+    store.write_many({'a': _resultado(1.0), 'b': _resultado(5.0)}, 2024, {'a': 'v1', 'b': 'v1'})
+    shutil.move(str(tmp_path / "ind"), str(tmp_path / "movido"))
+
+    movido = IndicatorStore(tmp_path / "movido")
+    assert len(movido.cells()) == 2
+    assert len(movido.load()) == 4
+    assert not os.path.isabs(movido.index()['ruta'].iloc[0])
+
+
+def test_reemplazo_de_un_año(tmp_path):
+    store = IndicatorStore(tmp_path)
+    store.write('a', 2024, _resultado(1.0), 'v1')
+    store.write('a', 2024, _resultado(3.0), 'v2')
+
+    ancho = store.load_wide('a')
+    assert ancho['tasa'].tolist() == [3.0, 4.0]
+    assert store.cells()['version'].tolist() == ['v2']
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['_index.parquet', 'indicador=a']
@@ -0,0 +1,35 @@
+"""
+Pruebas de equivalencia entre las funciones de los indicadores base y sus
+declaraciones (BASE_INDICATOR_SPECS) sobre datos sintéticos.
+"""
+
+import sys
+import os
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.indicators import IndicatorCalculator
+from src.base_indicators import BASE_INDICATOR_SPECS, calcular_tamano_hogar
+
+
+@pytest.mark.parametrize('indicador', sorted(BASE_INDICATOR_SPECS))
+def test_declaracion_igual_a_funcion(datos_sinteticos, indicador):
+    calculator = IndicatorCalculator(datos_sinteticos)
+    por_funcion = calculator.calculate_all([indicador])[indicador]
+    por_lotes = calculator.calculate_all([indicador], batched=True)[indicador]
+
+    assert por_funcion is not None and por_lotes is not None
+    columnas = [c for c in por_funcion.columns if c in por_lotes.columns]
+    assert columnas == list(por_lotes.columns)
+    pd.testing.assert_frame_equal(
+        por_funcion[columnas].reset_index(drop=True),
+        por_lotes.reset_index(drop=True),
+        check_dtype=False
+    )
+
+
+def test_tamano_hogar_usa_factor_indicado(datos_sinteticos):
+    assert 'factor07_per' in datos_sinteticos.columns
+    assert calcular_tamano_hogar(datos_sinteticos).columns[-1] == 'factor07_sum'
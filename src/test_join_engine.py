@@ -0,0 +1,58 @@
+"""
+Los motores de empalme 'indices' y 'perezoso' (src/join_engine.py) deben
+dar el mismo año empalmado que el motor pandas.
+"""
+
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.modules_config import KEY_COLUMNS
+from src.preprocessor import ENAHOPreprocessor
+
+
+def _empalmar(modulos, motor):
+    datos = ENAHOPreprocessor().empalmar_modulos_año(
+        {modulo: df.copy() for modulo, df in modulos.items()}, motor=motor
+    )
+    if hasattr(datos, 'materialize'):
+        datos = datos.materialize()
+    return datos.reset_index(drop=True)
+
+
+def _con_llaves_nulas(modulos):
+    """
+    Copia de los módulos con llaves nulas: una persona con codperso nulo en
+    personas y en educacion (la misma llave en ambos lados), y registros
+    con llaves nulas solo en educacion y en empleo_ingresos.
+    """
+    modulos = dict(modulos)
+    llaves = KEY_COLUMNS['personas']
+    persona = tuple(modulos['personas'][llaves].iloc[0])
+    for modulo in ('personas', 'educacion'):
+        df = modulos[modulo].copy()
+        fila = np.flatnonzero((df[llaves] == persona).all(axis=1))[0]
+        df.loc[df.index[fila], 'codperso'] = np.nan
+        modulos[modulo] = df
+    for modulo, columna in (('educacion', 'conglome'), ('empleo_ingresos', 'codperso')):
+        df = modulos[modulo].copy()
+        df.loc[df.index[-1], columna] = np.nan
+        modulos[modulo] = df
+    return modulos
+
+
+@pytest.mark.parametrize('motor', ['indices', 'perezoso'])
+@pytest.mark.parametrize('llaves_nulas', [False, True])
+def test_motor_igual_a_pandas(modulos_sinteticos, motor, llaves_nulas):
+    modulos = _con_llaves_nulas(modulos_sinteticos) if llaves_nulas else modulos_sinteticos
+    esperado = _empalmar(modulos, 'pandas')
+    resultado = _empalmar(modulos, motor)
+
+    assert list(resultado.columns) == list(esperado.columns)
+    if llaves_nulas:
+        assert esperado['codperso'].isna().any()
+    pd.testing.assert_frame_equal(resultado, esperado, check_dtype=False)
@@ -9,6 +9,7 @@ from pathlib import Path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.data_loader import ENAHOLoader
 from src.preprocessor import ENAHOPreprocessor
+from config.modules_config import KEY_COLUMNS
 
 def test_preprocessor():
     """
@@ -54,23 +55,14 @@ def test_preprocessor():
         for factor in factor_columns:
             print(f" - {factor}")
 
-        # 5. Verificar columnas clave
-        print("\nVerificando columnas clave (incluyendo sufijos)...")
-        key_columns_to_check = ['conglome', 'vivienda', 'hogar', 'codperso']
-        suffixes = ['', '_sum', '_viv', '_per', '_edu', '_emp', '_x', '_y']
-    
-        all_keys_found = True
+        # 5. Verificar columnas clave (los nombres ya vienen armonizados
+        # desde la carga, config/harmonization.py)
+        print("\nVerificando columnas clave...")
+        key_columns_to_check = KEY_COLUMNS['personas']
+        missing_keys = [col for col in key_columns_to_check if col not in datos_empalmados.columns]
         for col in key_columns_to_check:
-            found = False
-            for suffix in suffixes:
-                full_col_name = f"{col}{suffix}" if suffix else col
-                if full_col_name in datos_empalmados.columns:
-                    print(f"   - {full_col_name}: check")
-                    found = True
-                    break
-            if not found:
-                print(f"   - {col}: (no encontrada con ningún sufijo)")
-                all_keys_found = False
+            print(f"   - {col}: {'(no encontrada)' if col in missing_keys else 'check'}")
+        all_keys_found = not missing_keys
 
         # 6. Mostrar primeras columnas para debugging
         print("\nPrimeras 20 columnas del dataset:")
@@ -0,0 +1,49 @@
+"""
+Pruebas de la instrumentación por etapas (src/profiling.py).
+"""
+
+import sys
+import os
+import json
+import threading
+import time
+
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.profiling import PipelineProfiler
+
+
+def test_pico_de_etapa_bajo_el_pico_del_proceso():
+    profiler = PipelineProfiler()
+    # Pico de toda la vida del proceso más alto que el de la etapa
+    previo = np.ones(40_000_000)
+    del previo
+    with profiler.span('etapa'):
+        datos = np.ones(10_000_000)
+        time.sleep(0.2)
+        del datos
+    registro = profiler.spans[-1]
+    assert registro['pico_rss_delta_mb'] > 40
+
+
+def test_traza_solo_del_año(tmp_path):
+    profiler = PipelineProfiler()
+    for año in (2023, 2024):
+        with profiler.span('procesar', año=año):
+            with profiler.span('carga', año=año):
+                pass
+    ruta = profiler.write_trace(tmp_path / "trace_2024.json", 2024)
+    eventos = json.loads(ruta.read_text())['traceEvents']
+    assert len(eventos) == 2
+    assert {e['args']['año'] for e in eventos} == {2024}
+
+
+def test_pipeline_sin_perfilar_no_registra(tmp_path):
+    from src.main import ENAHOPipeline
+    pipeline = ENAHOPipeline(base_path=tmp_path)
+    with pipeline.profiler.span('carga', año=2024) as span:
+        span.salida({})
+    assert pipeline.profiler.spans == []
+    assert not any(h.name == 'muestreo-rss' for h in threading.enumerate())
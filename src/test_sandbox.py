@@ -0,0 +1,57 @@
+"""
+Pruebas de la ejecución aislada de indicadores (src/sandbox.py).
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.indicators import IndicatorCalculator
+from src.sandbox import directorio_compartido
+
+
+def indicador_mutador(df, **kwargs):
+    """Modifica su frame en el lugar, como los indicadores de analistas."""
+    df.loc[df.index[:3], 'p207'] = 99
+    df['p207'] = df['p207'] * 1
+    return df.groupby('p207').size().reset_index(name='n')
+
+
+def indicador_conteo(df, **kwargs):
+    return df.groupby('p207').size().reset_index(name='n')
+
+
+def _datos():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'año': 2024,
+        'dominio': rng.integers(1, 9, 200),
+        'p207': rng.integers(1, 3, 200).astype(float),
+        'factor07_emp': rng.uniform(50, 150, 200)
+    })
+
+
+def test_indicador_que_modifica_sus_datos():
+    datos = _datos()
+    original = datos.copy()
+    calculator = IndicatorCalculator(datos)
+    calculator.register_indicator('mutador', indicador_mutador, columns=['p207'])
+    calculator.register_indicator('conteo', indicador_conteo, columns=['p207'])
+
+    resultados = calculator.calculate_sandboxed(['mutador', 'conteo'], workers=2, timeout=60)
+
+    reporte = calculator.sandbox_report.set_index('indicador')
+    assert reporte.loc['mutador', 'estado'] == 'ok', reporte.loc['mutador', 'error']
+    assert resultados['mutador'].set_index('p207')['n'].get(99) == 3
+    # Los datos del proceso principal y los de otros indicadores no cambian
+    pd.testing.assert_frame_equal(datos, original)
+    pd.testing.assert_frame_equal(resultados['conteo'], indicador_conteo(original))
+
+
+def test_directorio_sin_espacio_usa_temporal():
+    assert directorio_compartido(10**18) == Path(tempfile.gettempdir())
@@ -0,0 +1,97 @@
+"""
+Errores estándar de src/survey.py contra un ejemplo estratificado por
+conglomerados calculado a mano.
+"""
+
+import sys
+import os
+import math
+from statistics import NormalDist
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.survey import SurveyDesign
+
+# Estrato 1 con dos conglomerados y estrato 2 con tres
+DATOS = pd.DataFrame({
+    'estrato':  [1, 1, 1, 2, 2, 2, 2],
+    'conglome': [1, 1, 2, 3, 3, 4, 5],
+    'factor':   [2., 2., 1., 1., 1., 3., 2.],
+    'y':        [1., 3., 4., 2., 2., 1., 5.],
+    'grupo':    [1, 2, 1, 2, 2, 2, 1]
+})
+
+
+def _varianza_manual(valores):
+    """
+    sum_h n_h / (n_h - 1) * sum_j (t_hj - media_h)^2 con los totales por
+    conglomerado de `valores` (una lista por fila de DATOS).
+    """
+    totales = {}
+    for estrato, psu, v in zip(DATOS['estrato'], DATOS['conglome'], valores):
+        totales.setdefault(estrato, {}).setdefault(psu, 0.0)
+        totales[estrato][psu] += v
+    varianza = 0.0
+    for por_psu in totales.values():
+        t = list(por_psu.values())
+        n, media = len(t), sum(t) / len(t)
+        varianza += n / (n - 1) * sum((x - media) ** 2 for x in t)
+    return varianza
+
+
+def _diseño():
+    return SurveyDesign(DATOS, 'factor', strata='estrato', psu='conglome')
+
+
+def test_total():
+    resultado = _diseño().total('y')
+    # Totales por conglomerado: estrato 1 -> 8, 4; estrato 2 -> 4, 3, 10
+    # var = 2 * (2^2 + 2^2) + 3/2 * ((5/3)^2 + (8/3)^2 + (13/3)^2) = 16 + 43
+    assert resultado['total'].iloc[0] == pytest.approx(29)
+    assert resultado['se'].iloc[0] == pytest.approx(math.sqrt(59))
+
+
+def test_total_por_dominio_con_conglomerados_sin_casos():
+    resultado = _diseño().total('y', by=['grupo']).set_index('grupo')
+    # Grupo 1: estrato 1 -> 2, 4; estrato 2 -> 0, 0, 10
+    # var = 2 * (1 + 1) + 3/2 * ((10/3)^2 * 2 + (20/3)^2) = 4 + 100
+    assert resultado.loc[1, 'total'] == pytest.approx(16)
+    assert resultado.loc[1, 'se'] == pytest.approx(math.sqrt(104))
+    assert resultado.loc[2, 'n'] == 4
+
+
+def test_media_linealizada():
+    resultado = _diseño().mean('y')
+    W = DATOS['factor'].sum()
+    r = (DATOS['factor'] * DATOS['y']).sum() / W
+    influencia = [w * (y - r) / W for w, y in zip(DATOS['factor'], DATOS['y'])]
+    assert resultado['media'].iloc[0] == pytest.approx(29 / 12)
+    assert resultado['se'].iloc[0] == pytest.approx(math.sqrt(_varianza_manual(influencia)))
+
+
+def test_mediana_woodruff():
+    resultado = _diseño().quantile('y', 0.5)
+    W = DATOS['factor'].sum()
+    # F ponderada: y=1 -> 5/12, y=2 -> 7/12, y=3 -> 9/12, y=4 -> 10/12, y=5 -> 1
+    acumulada = sorted(
+        (y, DATOS.loc[DATOS['y'] <= y, 'factor'].sum() / W) for y in DATOS['y'].unique()
+    )
+
+    def cuantil(p):
+        return next(y for y, F in acumulada if F >= p)
+
+    mediana = cuantil(0.5)
+    debajo = (DATOS['y'] <= mediana).astype(float)
+    p = (DATOS['factor'] * debajo).sum() / W
+    influencia = [w * (d - p) / W for w, d in zip(DATOS['factor'], debajo)]
+    se_p = math.sqrt(_varianza_manual(influencia))
+    z = NormalDist().inv_cdf(0.975)
+    inferior, superior = cuantil(0.5 - z * se_p), cuantil(min(0.5 + z * se_p, 1.0))
+
+    assert mediana == 2
+    assert resultado['cuantil'].iloc[0] == mediana
+    assert resultado['ic_inf'].iloc[0] == inferior
+    assert resultado['ic_sup'].iloc[0] == superior
+    assert resultado['se'].iloc[0] == pytest.approx((superior - inferior) / (2 * z))